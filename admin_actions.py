@@ -0,0 +1,43 @@
+import io
+import os
+from datetime import datetime
+import blob_store
+import db
+import job_queue
+import metrics
+import schema
+import signals
+
+# Single-item admin writes (the "Upload New Resources" tab) without any Streamlit calls,
+# so the admin panel, benchmarks and scripts share one code path. Each write commits in
+# one transaction and then publishes its signal. Uploads return once the file is stored;
+# validation and processing run later as a background job (job_queue.py).
+
+# Function to add a resource from an uploaded file; returns the new resource id
+def add_resource(category, name, uploaded_file, file_name=None):
+    with metrics.request("admin_upload", category=category):
+        # Store the file under its content digest; re-uploading identical content writes nothing
+        extension = os.path.splitext(file_name or uploaded_file.name)[1]
+        with metrics.span("blob_store"):
+            digest, save_path, size, _ = blob_store.store(uploaded_file, extension)
+        with db.transaction() as cursor:
+            save_path = blob_store.acquire(cursor, digest, save_path, size, lambda: io.BytesIO(uploaded_file.getbuffer()))
+            cursor.execute("INSERT INTO resources (category, name, file_path, blob_digest) VALUES (%s, %s, %s, %s)",
+                           (category, name, save_path, digest))
+            resource_id = cursor.lastrowid
+            job_queue.enqueue(cursor, "process_upload", resource_id, {"name": name})
+        job_queue.notify()
+        signals.publish("resource_added", id=resource_id, category=category, name=name, file_path=save_path)
+    return resource_id
+
+# Function to add a classroom
+def add_classroom(room_number, details):
+    db.execute_write("INSERT INTO classrooms (room_number, details, room_key) VALUES (%s, %s, %s)",
+                     (room_number, details, schema.normalize_room_number(room_number)))
+    signals.publish("classrooms_changed")
+
+# Function to add a calendar event; raises ValueError unless the date is YYYY-MM-DD
+def add_calendar_event(date_text, event):
+    datetime.strptime(date_text, '%Y-%m-%d')
+    db.execute_write("INSERT INTO calendar (date, event) VALUES (%s, %s)", (date_text, event))
+    signals.publish("calendar_changed")
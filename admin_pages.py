@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+import db
+import schema
+import signals
+
+# Keyset-paged, cached reads for the admin "Manage Existing Resources" tab.
+# Each page is fetched with "WHERE key > last key ORDER BY key LIMIT n+1", so the cost
+# of a page does not depend on how deep into the table it is, and the extra row tells
+# us whether a next page exists. Pages are cached per (table, category, search, cursor)
+# and the cache is dropped whenever an admin write is published through signals.
+
+PAGE_SIZE = 25
+PAGE_CACHE_SIZE = 256
+
+# (table, searching) -> SQL. Resources and classrooms page on id, calendar on (date, id).
+# The calendar key is spelled out as "date > d OR (date = d AND id > i)" rather than a
+# row-value comparison, which MySQL may not read as an index range; the extra "date >= d"
+# gives every backend (SQLite included, which scans on a bare OR) the range to seek to.
+PAGE_QUERIES = {
+    ("resources", False): "SELECT id, name, file_path FROM resources WHERE category=%s AND id > %s ORDER BY id LIMIT %s",
+    ("resources", True): "SELECT id, name, file_path FROM resources WHERE category=%s AND id > %s AND name LIKE %s ESCAPE '!' ORDER BY id LIMIT %s",
+    ("classrooms", False): "SELECT id, room_number, details FROM classrooms WHERE id > %s ORDER BY id LIMIT %s",
+    ("classrooms", True): "SELECT id, room_number, details FROM classrooms WHERE id > %s AND room_key LIKE %s ESCAPE '!' ORDER BY id LIMIT %s",
+    ("calendar", False): "SELECT id, date, event FROM calendar WHERE date >= %s AND (date > %s OR (date = %s AND id > %s)) "
+                         "ORDER BY date, id LIMIT %s",
+    ("calendar", True): "SELECT id, date, event FROM calendar WHERE date >= %s AND (date > %s OR (date = %s AND id > %s)) "
+                        "AND event LIKE %s ESCAPE '!' ORDER BY date, id LIMIT %s",
+}
+
+# Cursor that sorts before every calendar row
+CALENDAR_START = ("1000-01-01", 0)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+# Function to build the SQL parameters for one page
+def _page_params(table, after, search, category, limit):
+    if table == "resources":
+        params = [category, after or 0]
+        if search:
+            params.append(f"%{db.like_prefix(search)}")
+    elif table == "classrooms":
+        params = [after or 0]
+        if search:
+            params.append(db.like_prefix(schema.normalize_room_number(search)))
+    else:
+        date, row_id = after or CALENDAR_START
+        params = [date, date, date, row_id]
+        if search:
+            params.append(f"%{db.like_prefix(search)}")
+    params.append(limit)
+    return tuple(params)
+
+# Function to get one page of rows and the cursor for the next page (None on the last page)
+def fetch_page(table, after=None, search="", category=None, page_size=PAGE_SIZE):
+    search = search.strip()
+    cache_key = (table, category, search, after, page_size)
+    with _cache_lock:
+        cached = _cache.get(cache_key)
+        if cached is not None:
+            _cache.move_to_end(cache_key)
+            _stats["hits"] += 1
+            return cached
+        _stats["misses"] += 1
+
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(PAGE_QUERIES[(table, bool(search))], _page_params(table, after, search, category, page_size + 1))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = (last[1], last[0]) if table == "calendar" else last[0]
+
+    page = (rows, next_cursor)
+    with _cache_lock:
+        _cache[cache_key] = page
+        while len(_cache) > PAGE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return page
+
+# Function to drop cached pages (for one table or all of them)
+def invalidate(table=None):
+    with _cache_lock:
+        if table is None:
+            _cache.clear()
+        else:
+            for key in [key for key in _cache if key[0] == table]:
+                del _cache[key]
+
+def cache_stats():
+    with _cache_lock:
+        return dict(_stats, pages=len(_cache))
+
+signals.subscribe("resource_added", lambda **_: invalidate("resources"))
+signals.subscribe("resource_updated", lambda **_: invalidate("resources"))
+signals.subscribe("resource_deleted", lambda **_: invalidate("resources"))
+signals.subscribe("resources_reloaded", lambda **_: invalidate("resources"))
+signals.subscribe("classrooms_changed", lambda **_: invalidate("classrooms"))
+signals.subscribe("calendar_changed", lambda **_: invalidate("calendar"))
+signals.subscribe("caches_stale", lambda **_: invalidate())
@@ -0,0 +1,401 @@
+import io
+import os
+from datetime import datetime
+import streamlit as st
+import admin_actions
+import admin_pages
+import blob_store
+import bulk_import
+import db
+import file_server
+import gemini_gateway
+import job_queue
+import lookup_cache
+import metrics
+import schema
+import signals
+from db import get_pool_metrics
+from storage import get_storage
+
+# Admin page (app1.py?admin): uploads, management of existing rows, bulk import and
+# the health panels. app1.py imports this module only for the admin page, so chat
+# sessions never load it; it does not import the chat pipeline or the Gemini SDK either.
+
+CATEGORIES = ["PDFs", "Class Timetables", "Event Schedules", "Exam Timetables", "Classroom Numbers", "Working Days & Holidays"]
+RESOURCE_CATEGORIES = ["PDFs", "Class Timetables", "Event Schedules", "Exam Timetables"]
+# Storage and job counters scan shared tables, so the health panels reuse them this long
+HEALTH_STATS_TTL = int(os.getenv("ADMIN_HEALTH_STATS_TTL", "30"))
+
+# Function to render Previous/Next buttons for the keyset-paged admin lists
+def render_pager(next_cursor):
+    cursors = st.session_state.manage_page_cursors
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("◀ Previous", key="page_previous"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if next_cursor is not None and st.button("Next ▶", key="page_next"):
+            cursors.append(next_cursor)
+            st.rerun()
+
+# Function to render the upload form
+def render_upload_tab():
+    category = st.selectbox("Select Category", CATEGORIES)
+    name = st.text_input("Enter Name/Title")
+
+    # Allow different file types based on category
+    if category in ["Class Timetables", "Exam Timetables"]:
+        uploaded_file = st.file_uploader("Upload File", type=["jpg", "jpeg", "png", "pdf"])
+    else:
+        uploaded_file = st.file_uploader("Upload File", type=["pdf"])
+
+    details = st.text_area("Enter Details (Optional)")
+
+    if st.button("Upload") and name:
+        if category in RESOURCE_CATEGORIES and uploaded_file:
+            admin_actions.add_resource(category, name, uploaded_file)
+        elif category == "Classroom Numbers":
+            admin_actions.add_classroom(name, details)
+        elif category == "Working Days & Holidays":
+            try:
+                admin_actions.add_calendar_event(name, details)
+            except ValueError:
+                st.error("Date must be in YYYY-MM-DD format")
+                st.stop()
+        st.success(f"{name} uploaded successfully!")
+
+# Function to render the paged list of uploaded resources with their update form
+def render_resources(session, manage_category, page_cursor, search):
+    resources, next_cursor = admin_pages.fetch_page("resources", page_cursor, search, manage_category)
+    if not resources:
+        st.info(f"No {manage_category} found in the database.")
+        return
+
+    st.write(f"### Existing {manage_category}")
+    # Background processing state of each listed upload (no job: uploaded before the queue existed)
+    resource_jobs = job_queue.latest_jobs([res_id for res_id, _, _ in resources])
+    for res_id, res_name, res_path in resources:
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            st.write(f"**{res_name}**")
+            job = resource_jobs.get(res_id)
+            if job and job["status"] in ("queued", "running"):
+                st.caption(f"Processing ({job['status']}, attempt {max(job['attempts'], 1)})")
+            elif job and job["status"] == "failed":
+                st.caption(f"⚠️ Processing failed after {job['attempts']} attempts: {(job['last_error'] or '')[:120]}")
+        with col2:
+            if st.button(f"Update", key=f"update_{res_id}"):
+                session.set("resource_edit", {"id": res_id, "name": res_name, "path": res_path,
+                                              "category": manage_category})
+        with col3:
+            if st.button(f"Delete", key=f"delete_{res_id}"):
+                # Drop the blob reference with the row; unreferenced blobs are garbage-collected later
+                with db.transaction() as cursor:
+                    blob_store.release_for_resource(cursor, res_id)
+                    cursor.execute("DELETE FROM resources WHERE id=%s", (res_id,))
+                # Files uploaded before the blob store are owned by their row
+                if not blob_store.is_blob_path(res_path):
+                    get_storage().delete(res_path)
+                signals.publish("resource_deleted", id=res_id, category=manage_category)
+                st.success(f"Deleted {res_name}")
+                st.rerun()
+    render_pager(next_cursor)
+
+    # Handle update operation (the edit form lives in the state backend, not in this worker)
+    resource_edit = session.get("resource_edit")
+    if resource_edit:
+        st.write("### Update Resource")
+        new_name = st.text_input("New Name", value=resource_edit["name"])
+        new_file = st.file_uploader("Upload New File", key="update_file")
+
+        if st.button("Save Changes"):
+            if new_file:
+                # Store the new content, then move the row's reference from the old blob to the new one
+                digest, save_path, size, _ = blob_store.store(new_file, os.path.splitext(new_file.name)[1])
+                with db.transaction() as cursor:
+                    blob_store.release_for_resource(cursor, resource_edit["id"])
+                    save_path = blob_store.acquire(cursor, digest, save_path, size, lambda: io.BytesIO(new_file.getbuffer()))
+                    cursor.execute("UPDATE resources SET name=%s, file_path=%s, blob_digest=%s WHERE id=%s",
+                                   (new_name, save_path, digest, resource_edit["id"]))
+                    # The new file is validated and processed in the background, like an upload
+                    job_queue.enqueue(cursor, "process_upload", resource_edit["id"], {"name": new_name})
+                job_queue.notify()
+
+                if not blob_store.is_blob_path(resource_edit["path"]):
+                    get_storage().delete(resource_edit["path"])
+            else:
+                save_path = resource_edit["path"]
+                db.execute_write("UPDATE resources SET name=%s WHERE id=%s",
+                                 (new_name, resource_edit["id"]))
+
+            # The row's own category: the form stays open when the admin switches categories
+            signals.publish("resource_updated", id=resource_edit["id"],
+                            category=resource_edit["category"], name=new_name, file_path=save_path)
+            st.success("Resource updated successfully!")
+            # Clear the edit form
+            session.clear("resource_edit")
+            st.rerun()
+
+# Function to render the paged list of classrooms with their update form
+def render_classrooms(session, page_cursor, search):
+    classrooms, next_cursor = admin_pages.fetch_page("classrooms", page_cursor, search)
+    if not classrooms:
+        st.info("No classrooms found in the database.")
+        return
+
+    st.write("### Existing Classrooms")
+    for room_id, room_number, details in classrooms:
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            st.write(f"**{room_number}**: {details[:50]}...")
+        with col2:
+            if st.button(f"Update", key=f"update_room_{room_id}"):
+                session.set("classroom_edit", {"id": room_id, "room_number": room_number, "details": details})
+        with col3:
+            if st.button(f"Delete", key=f"delete_room_{room_id}"):
+                db.execute_write("DELETE FROM classrooms WHERE id=%s", (room_id,))
+                signals.publish("classrooms_changed")
+                st.success(f"Deleted classroom {room_number}")
+                st.rerun()
+    render_pager(next_cursor)
+
+    # Handle update operation for classrooms
+    classroom_edit = session.get("classroom_edit")
+    if classroom_edit:
+        st.write("### Update Classroom")
+        new_room_number = st.text_input("New Room Number", value=classroom_edit["room_number"])
+        new_details = st.text_area("New Details", value=classroom_edit["details"])
+
+        if st.button("Save Classroom Changes"):
+            db.execute_write("UPDATE classrooms SET room_number=%s, details=%s, room_key=%s WHERE id=%s",
+                             (new_room_number, new_details, schema.normalize_room_number(new_room_number),
+                              classroom_edit["id"]))
+            signals.publish("classrooms_changed")
+            st.success("Classroom updated successfully!")
+            # Clear the edit form
+            session.clear("classroom_edit")
+            st.rerun()
+
+# Function to render the paged list of calendar events with their update form
+def render_calendar(session, page_cursor, search):
+    calendar_events, next_cursor = admin_pages.fetch_page("calendar", page_cursor, search)
+    if not calendar_events:
+        st.info("No calendar events found in the database.")
+        return
+
+    st.write("### Existing Calendar Events")
+    for event_id, date, event_desc in calendar_events:
+        col1, col2, col3 = st.columns([3, 1, 1])
+        with col1:
+            st.write(f"**{date}**: {event_desc[:50]}...")
+        with col2:
+            if st.button(f"Update", key=f"update_event_{event_id}"):
+                session.set("event_edit", {"id": event_id, "date": str(date), "event": event_desc})
+        with col3:
+            if st.button(f"Delete", key=f"delete_event_{event_id}"):
+                db.execute_write("DELETE FROM calendar WHERE id=%s", (event_id,))
+                signals.publish("calendar_changed")
+                st.success(f"Deleted event on {date}")
+                st.rerun()
+    render_pager(next_cursor)
+
+    # Handle update operation for calendar events
+    event_edit = session.get("event_edit")
+    if event_edit:
+        st.write("### Update Calendar Event")
+        new_date = st.text_input("New Date (YYYY-MM-DD)", value=event_edit["date"])
+        new_event_desc = st.text_area("New Event Description", value=event_edit["event"])
+
+        if st.button("Save Event Changes"):
+            try:
+                # Validate date format
+                datetime.strptime(new_date, '%Y-%m-%d')
+            except ValueError:
+                st.error("Date must be in YYYY-MM-DD format")
+                st.stop()
+            db.execute_write("UPDATE calendar SET date=%s, event=%s WHERE id=%s",
+                             (new_date, new_event_desc, event_edit["id"]))
+            signals.publish("calendar_changed")
+            st.success("Calendar event updated successfully!")
+            # Clear the edit form
+            session.clear("event_edit")
+            st.rerun()
+
+# Function to render the management tab for the selected category
+def render_manage_tab(session):
+    manage_category = st.selectbox("Select Category to Manage", CATEGORIES, key="manage_category")
+    search = st.text_input("Search", key="manage_search",
+                           placeholder="Filter by name, room number or event text")
+
+    # Keyset paging: a stack of page cursors, reset whenever the category or search changes
+    paging_key = (manage_category, search.strip())
+    if st.session_state.get("manage_paging_key") != paging_key:
+        st.session_state.manage_paging_key = paging_key
+        st.session_state.manage_page_cursors = [None]
+    page_cursor = st.session_state.manage_page_cursors[-1]
+
+    if manage_category in RESOURCE_CATEGORIES:
+        render_resources(session, manage_category, page_cursor, search)
+    elif manage_category == "Classroom Numbers":
+        render_classrooms(session, page_cursor, search)
+    elif manage_category == "Working Days & Holidays":
+        render_calendar(session, page_cursor, search)
+
+# Function to render the bulk import form and its report
+def render_bulk_import_tab():
+    import_kind = st.radio("What are you importing?",
+                           ["Resources (ZIP + manifest)", "Classrooms (CSV)", "Calendar (CSV)"])
+    skip_invalid = st.checkbox("Skip invalid rows instead of cancelling the import")
+
+    if import_kind == "Resources (ZIP + manifest)":
+        st.caption("The ZIP must contain the files plus a manifest.csv or manifest.json with "
+                   "columns category, name, file (file = path inside the ZIP).")
+        default_category = st.selectbox("Category for rows without one", bulk_import.RESOURCE_CATEGORIES)
+        import_file = st.file_uploader("Upload ZIP", type=["zip"], key="bulk_zip")
+    elif import_kind == "Classrooms (CSV)":
+        st.caption("Columns: room_number, details")
+        import_file = st.file_uploader("Upload CSV", type=["csv"], key="bulk_classrooms")
+    else:
+        st.caption("Columns: date (YYYY-MM-DD), event")
+        import_file = st.file_uploader("Upload CSV", type=["csv"], key="bulk_calendar")
+
+    if st.button("Import") and import_file:
+        try:
+            if import_kind == "Resources (ZIP + manifest)":
+                report = bulk_import.import_resources_zip(import_file, default_category, skip_invalid)
+            elif import_kind == "Classrooms (CSV)":
+                report = bulk_import.import_table_csv(import_file, "classrooms", skip_invalid)
+            else:
+                report = bulk_import.import_table_csv(import_file, "calendar", skip_invalid)
+        except ValueError as error:
+            st.error(str(error))
+            st.stop()
+
+        if report["imported"]:
+            st.success(f"Imported {report['imported']} of {report['rows_total']} rows in "
+                       f"{report['seconds']:.2f} s ({report['rows_per_second']:.0f} rows/s)")
+        elif report["errors"]:
+            st.error("Nothing was imported. Fix the rows below or tick \"Skip invalid rows\".")
+        else:
+            st.info("The file contained no rows.")
+        if report["errors"]:
+            st.write(f"### {len(report['errors'])} row error(s)")
+            st.dataframe(report["errors"], use_container_width=True)
+
+# Function to read the blob and job counters for the health panels; cached, as every admin rerun renders them
+@st.cache_data(ttl=HEALTH_STATS_TTL, show_spinner=False)
+def shared_health_stats():
+    return {"storage": blob_store.blob_stats(), "jobs": job_queue.queue_stats(), "problems": job_queue.problem_jobs()}
+
+# Function to render the health panels below the tabs
+def render_health():
+    health = shared_health_stats()
+    # Shared connection pool health
+    with st.expander("Database Connection Pool"):
+        pool_metrics = get_pool_metrics()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Pool Size", pool_metrics["pool_size"])
+        col2.metric("In Use", pool_metrics["connections_in_use"])
+        col3.metric("Failed Checkouts", pool_metrics["failed_checkouts"])
+        st.write(f"Checkouts: {pool_metrics['checkouts']} | "
+                 f"Avg wait: {pool_metrics['checkout_wait_avg'] * 1000:.2f} ms | "
+                 f"Max wait: {pool_metrics['checkout_wait_max'] * 1000:.2f} ms | "
+                 f"Recycled: {pool_metrics['recycled_connections']} | "
+                 f"Idle pings: {pool_metrics['health_pings']}")
+
+    # Gemini gateway latency and cache behaviour (not created just to show this panel)
+    with st.expander("AI Gateway"):
+        gateway_stats = gemini_gateway.gateway_stats()
+        if not gateway_stats:
+            st.info("This worker has not called Gemini yet.")
+        else:
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Time to First Token (p50)", f"{gateway_stats['time_to_first_token_p50_ms']:.0f} ms")
+            col2.metric("Total Latency (p50)", f"{gateway_stats['total_latency_p50_ms']:.0f} ms")
+            col3.metric("Cache Hits", gateway_stats["cache_hits"])
+            st.write(f"TTFT p95: {gateway_stats['time_to_first_token_p95_ms']:.0f} ms | "
+                     f"Total p95: {gateway_stats['total_latency_p95_ms']:.0f} ms | "
+                     f"Upstream calls: {gateway_stats['upstream_calls']} | "
+                     f"Coalesced: {gateway_stats['coalesced']} | "
+                     f"Timeouts: {gateway_stats['timeouts']} | Errors: {gateway_stats['errors']}")
+
+    with st.expander("Lookup Cache"):
+        lookup_stats = lookup_cache.cache_stats()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Calendar Hits", lookup_stats["calendar_hits"])
+        col2.metric("Classroom Hits", lookup_stats["classroom_hits"])
+        col3.metric("Classrooms Cached", lookup_stats["classrooms"])
+        st.write(f"Calendar misses: {lookup_stats['calendar_misses']} | "
+                 f"Classroom misses: {lookup_stats['classroom_misses']} | "
+                 f"Cached dates: {lookup_stats['cached_dates']}")
+        if st.button("Clear Lookup Cache"):
+            lookup_cache.invalidate()
+
+    with st.expander("File Storage"):
+        storage_stats = health["storage"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Stored Files", storage_stats["blobs"])
+        col2.metric("Stored Size", f"{storage_stats['blob_stored_bytes'] / 1e6:.1f} MB")
+        col3.metric("Saved by Deduplication", f"{storage_stats['blob_saved_bytes'] / 1e6:.1f} MB")
+        st.write(f"References: {storage_stats['blob_references']} | "
+                 f"Awaiting cleanup: {storage_stats['blob_unreferenced']}")
+        if st.button("Remove Unreferenced Files"):
+            st.success(f"Freed {blob_store.collect_garbage() / 1e6:.2f} MB")
+            shared_health_stats.clear()
+
+    # Upload post-processing queue shared by every app process
+    with st.expander("Background Jobs"):
+        job_stats = health["jobs"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Queued", job_stats["queued"])
+        col2.metric("Running", job_stats["running"])
+        col3.metric("Failed", job_stats["failed"])
+        st.write(f"Done: {job_stats['done']} | Rejected: {job_stats['rejected']} | "
+                 f"Running in this process: {job_stats['running_here']} of {job_queue.JOB_WORKERS} workers")
+        if health["problems"]:
+            st.dataframe(health["problems"], use_container_width=True)
+        if job_stats["failed"] and st.button("Retry Failed Jobs"):
+            st.success(f"Queued {job_queue.retry_failed()} job(s) again")
+            shared_health_stats.clear()
+        if st.button("Refresh Storage & Job Counts"):
+            shared_health_stats.clear()
+            st.rerun()
+
+    # Prometheus metrics and an on-demand sampling profiler for this worker process
+    with st.expander("Metrics & Profiler"):
+        file_server.start()
+        st.write(f"Prometheus metrics: port {file_server.FILE_SERVER_PORT} of this host, path /metrics"
+                 + (f" ({file_server.FILE_SERVER_URL}/metrics)" if file_server.links_enabled() else ""))
+        profiling = st.checkbox("Sampling profiler", value=metrics.profiler.running(),
+                                help="Samples every thread's stack in this worker; adds a little CPU overhead while on")
+        if profiling and not metrics.profiler.running():
+            metrics.profiler.start()
+        elif not profiling and metrics.profiler.running():
+            metrics.profiler.stop()
+
+        hot_functions = metrics.profiler.top()
+        if hot_functions:
+            st.dataframe([{"function": function, "own samples": own, "total samples": total}
+                          for function, own, total in hot_functions], use_container_width=True)
+            st.download_button("Download collapsed stacks", metrics.profiler.collapsed(),
+                               file_name="campus_buddy_profile.txt", mime="text/plain")
+        elif profiling:
+            st.info("Collecting samples; rerun the page to see the busiest functions.")
+
+# Function to render the whole admin page for this browser session
+def render(session):
+    st.title("📂 Admin Panel - Manage Campus Resources")
+
+    # Create tabs for different admin functions
+    tab1, tab2, tab3 = st.tabs(["Upload New Resources", "Manage Existing Resources", "Bulk Import"])
+    with tab1:
+        render_upload_tab()
+    with tab2:
+        render_manage_tab(session)
+    with tab3:
+        render_bulk_import_tab()
+
+    render_health()
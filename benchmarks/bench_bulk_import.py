@@ -0,0 +1,65 @@
+import csv
+import io
+import os
+import sys
+import tempfile
+import zipfile
+
+# Runs against a throwaway SQLite stand-in unless DB_BACKEND is already set
+WORK_DIR = tempfile.mkdtemp(prefix="campus_bulk_")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(WORK_DIR, "campus.sqlite3"))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blob_store
+import bulk_import
+import schema
+
+# Bulk import throughput benchmark.
+# Usage: python benchmarks/bench_bulk_import.py [items] [file_kb]
+# Builds a ZIP of `items` synthetic timetables plus manifest, and classroom/calendar
+# CSVs of the same size, then reports rows/s for each import path.
+
+def build_zip(path, items, file_kb):
+    payload = b"\xff\xd8" + os.urandom(file_kb * 1024)
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(["category", "name", "file"])
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as archive:
+        for position in range(items):
+            member = f"timetables/tt_{position}.jpg"
+            # Distinct content per file so the blob store has to write every one
+            archive.writestr(member, payload + position.to_bytes(4, "big"))
+            writer.writerow(["Class Timetables", f"CSE Semester {position % 8 + 1} Section {position}", member])
+        archive.writestr("manifest.csv", manifest.getvalue())
+
+def build_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+def show(label, report):
+    print(f"{label:<11} {report['imported']:>7} rows in {report['seconds']:6.2f} s "
+          f"= {report['rows_per_second']:10,.0f} rows/s  ({report['bytes_written'] / 1e6:.1f} MB written, "
+          f"{len(report['errors'])} errors)")
+
+if __name__ == "__main__":
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    file_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    blob_store.BLOB_DIR = os.path.join(WORK_DIR, "uploads", "blobs")
+    schema.migrate()
+
+    zip_path = os.path.join(WORK_DIR, "resources.zip")
+    build_zip(zip_path, items, file_kb)
+    show("resources", bulk_import.import_resources_zip(zip_path))
+
+    classrooms_path = os.path.join(WORK_DIR, "classrooms.csv")
+    build_csv(classrooms_path, ["room_number", "details"], [(f"B-{n}", f"Floor {n % 5}") for n in range(items)])
+    show("classrooms", bulk_import.import_table_csv(classrooms_path, "classrooms"))
+
+    calendar_path = os.path.join(WORK_DIR, "calendar.csv")
+    build_csv(calendar_path, ["date", "event"],
+              [(f"{2025 + n // 336}-{n // 28 % 12 + 1:02d}-{n % 28 + 1:02d}", f"Event {n}") for n in range(items)])
+    show("calendar", bulk_import.import_table_csv(calendar_path, "calendar"))
+    print(f"(work files in {WORK_DIR})")
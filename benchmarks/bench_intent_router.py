@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intent_router
+from intent_router import (INTENT_CLASSROOM, INTENT_EDUCATIONAL, INTENT_LLM, INTENT_RESOURCE,
+                           INTENT_TODAYS_EVENTS)
+from tests.test_intent_router import ROUTING_CORPUS
+
+# Throughput benchmark for intent_router.
+# Usage: python benchmarks/bench_intent_router.py [messages]
+# The router and the old if/elif keyword chain are timed over the messages of the
+# routing table in tests/test_intent_router.py (python -m pytest checks the routes).
+
+# The keyword chain (and query extraction) the chat handler used before the router, for comparison
+LEGACY_CATEGORIES = {
+    "pdf": "PDFs", "timetable": "Class Timetables", "time table": "Class Timetables",
+    "class schedule": "Class Timetables", "schedule": "Class Timetables",
+    "event schedule": "Event Schedules", "event": "Event Schedules",
+    "exam timetable": "Exam Timetables", "exam schedule": "Exam Timetables",
+    "exam time table": "Exam Timetables", "examination": "Exam Timetables",
+    "classroom": "Classroom Numbers", "room": "Classroom Numbers", "class": "Classroom Numbers",
+    "holidays": "Working Days & Holidays", "holiday": "Working Days & Holidays",
+    "working days": "Working Days & Holidays", "calendar": "Working Days & Holidays",
+}
+
+def legacy_route(user_input):
+    if "today" in user_input.lower() and ("event" in user_input.lower() or "schedule" in user_input.lower()):
+        return INTENT_TODAYS_EVENTS, None, user_input
+    if any(keyword in user_input.lower() for keyword in ["classroom", "room", "class"]):
+        query = user_input.lower()
+        for keyword in ["classroom", "room", "class"]:
+            query = query.replace(keyword, "")
+        return INTENT_CLASSROOM, None, query.strip()
+    for key, category in LEGACY_CATEGORIES.items():
+        if key in user_input.lower():
+            return INTENT_RESOURCE, category, user_input.lower().replace(key, "").strip()
+    educational_terms = ["semester", "sem", "year", "course", "branch", "department", "cse", "it", "ece", "mech", "civil"]
+    if any(term in user_input.lower() for term in educational_terms):
+        if any(term in user_input.lower() for term in ["exam", "final", "mid", "test"]):
+            return INTENT_EDUCATIONAL, "Exam Timetables", user_input
+        return INTENT_EDUCATIONAL, "Class Timetables", user_input
+    return INTENT_LLM, None, user_input
+
+def throughput(func, messages):
+    started = time.perf_counter()
+    for message in messages:
+        func(message)
+    return len(messages) / (time.perf_counter() - started)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    messages = [ROUTING_CORPUS[i % len(ROUTING_CORPUS)][0] for i in range(count)]
+    print(f"router:       {throughput(intent_router.route, messages):12,.0f} messages/s")
+    print(f"legacy chain: {throughput(legacy_route, messages):12,.0f} messages/s")
@@ -0,0 +1,178 @@
+import argparse
+import io
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Runs against a throwaway SQLite stand-in, file store and stub Gemini backend unless configured otherwise
+WORK_DIR = tempfile.mkdtemp(prefix="campus_pipeline_")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(WORK_DIR, "campus.sqlite3"))
+os.environ.setdefault("STORAGE_ROOT", WORK_DIR)
+os.environ.setdefault("RAG_INDEX_DIR", os.path.join(WORK_DIR, "rag_index"))
+os.environ.setdefault("GEMINI_BACKEND", "stub")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Headless load test of the chat pipeline and the admin upload path.
+# Usage: python benchmarks/bench_pipeline.py [--resources N --classrooms N --calendar N]
+#            [--requests N] [--concurrency N] [--llm-latency SECONDS] [--llm-chunk-latency SECONDS]
+#            [--upload-kb KB] [--output results.json] [--compare baseline.json --threshold 0.2]
+# Seeds the database, then sends REQUESTS messages per route (today's events, classroom
+# lookup, resource match, LLM fallback) through chat_pipeline.respond, REQUESTS LLM
+# questions through the streaming path the chat page uses (llm_stream, which also records
+# time to first token) and REQUESTS synthetic files through admin_actions.add_resource.
+# Prints p50/p95/p99 latency and throughput per route as JSON; with --compare it exits 1
+# when any route's p95, time-to-first-token p95 or throughput is worse than the baseline
+# by more than --threshold.
+
+LLM_QUESTIONS = ["explain normalization with an example", "what is a deadlock",
+                 "how do I prepare for placements", "difference between tcp and udp"]
+
+# Function to build each route's messages from the seeded rows
+def route_messages(count, classrooms, rng):
+    import seed
+    rooms = [row[0] for row in seed.classroom_rows(classrooms, random.Random(0))]
+    return {
+        "events": ["what are today's events"] * count,
+        "classroom": [f"classroom {rng.choice(rooms)}" for _ in range(count)],
+        "resource": [f"{rng.choice(seed.BRANCHES).lower()} semester {rng.randint(1, 8)} timetable" for _ in range(count)],
+        # Numbered so the gateway's response cache never answers them
+        "llm_fallback": [f"{rng.choice(LLM_QUESTIONS)} ({position})" for position in range(count)],
+    }
+
+# Function to answer a message the way the chat page does, consuming the LLM answer as a
+# stream; returns the seconds until the first chunk arrived (the whole call for campus data)
+def stream_respond(message):
+    import chat_pipeline
+    started = time.perf_counter()
+    ai_response, _ = chat_pipeline.answer_from_campus_data(message)
+    if ai_response:
+        return time.perf_counter() - started
+    first_chunk = None
+    for _ in chat_pipeline.get_gemini_response(chat_pipeline.ai_prompt(message), stream=True):
+        if first_chunk is None:
+            first_chunk = time.perf_counter() - started
+    return first_chunk if first_chunk is not None else time.perf_counter() - started
+
+# Function to time each call of handler over items; returns (latencies in seconds, wall time)
+def timed(handler, items, concurrency):
+    latencies, _, wall = timed_stream(handler, items, concurrency)
+    return latencies, wall
+
+# Function to time each call of handler over items, keeping what each call returns
+# (the time to first token for stream_respond); returns (latencies, returned values, wall time)
+def timed_stream(handler, items, concurrency):
+    def run(item):
+        started = time.perf_counter()
+        value = handler(item)
+        return time.perf_counter() - started, value
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = list(executor.map(run, items))
+    wall = time.perf_counter() - started
+    return [latency for latency, _ in timings], [value for _, value in timings], wall
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(round(fraction * (len(ordered) - 1))), len(ordered) - 1)]
+
+def summarize(latencies, wall, first_tokens=None):
+    summary = {
+        "requests": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "throughput_rps": round(len(latencies) / wall, 1),
+    }
+    if first_tokens:
+        summary["ttft_p50_ms"] = round(percentile(first_tokens, 0.50) * 1000, 3)
+        summary["ttft_p95_ms"] = round(percentile(first_tokens, 0.95) * 1000, 3)
+        summary["ttft_p99_ms"] = round(percentile(first_tokens, 0.99) * 1000, 3)
+    return summary
+
+# Function to list the regressions of results against a baseline run
+def compare(results, baseline, threshold):
+    regressions = []
+    for route, current in results["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if not previous:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: p95 {previous['p95_ms']} ms -> {current['p95_ms']} ms")
+        if "ttft_p95_ms" in current and "ttft_p95_ms" in previous \
+                and current["ttft_p95_ms"] > previous["ttft_p95_ms"] * (1 + threshold):
+            regressions.append(f"{route}: time to first token p95 {previous['ttft_p95_ms']} ms -> {current['ttft_p95_ms']} ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{route}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} req/s")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the campus_buddy chat pipeline and admin uploads")
+    parser.add_argument("--resources", type=int, default=5000)
+    parser.add_argument("--classrooms", type=int, default=500)
+    parser.add_argument("--calendar", type=int, default=365)
+    parser.add_argument("--requests", type=int, default=500, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="stub Gemini delay in seconds")
+    parser.add_argument("--llm-chunk-latency", type=float, default=0.005,
+                        help="stub Gemini delay between streamed chunks in seconds")
+    parser.add_argument("--upload-kb", type=int, default=256)
+    parser.add_argument("--output")
+    parser.add_argument("--compare")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+    os.environ.setdefault("GEMINI_STUB_LATENCY", str(args.llm_latency))
+    os.environ.setdefault("GEMINI_STUB_CHUNK_LATENCY", str(args.llm_chunk_latency))
+
+    import admin_actions
+    import chat_pipeline
+    import rag_index
+    import seed
+
+    seed.seed(args.resources, args.classrooms, args.calendar)
+    # Seeded PDF rows point at placeholder paths; index them (as empty) up front, quietly,
+    # so background syncs after each upload only see the new rows
+    logging.getLogger("rag_index").setLevel(logging.ERROR)
+    rag_index.sync()
+    rng = random.Random(7)
+    messages = route_messages(args.requests, args.classrooms, rng)
+    # Warm imports, indexes and caches before the clock starts, as a long-running worker would be
+    for route_items in messages.values():
+        chat_pipeline.respond(route_items[0])
+    # Streamed LLM answers, as the chat page renders them; numbered apart from llm_fallback's
+    stream_items = [f"{rng.choice(LLM_QUESTIONS)} (stream {position})" for position in range(args.requests + 1)]
+    stream_respond(stream_items.pop())
+
+    results = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "routes": {},
+    }
+    for route, route_items in messages.items():
+        results["routes"][route] = summarize(*timed(chat_pipeline.respond, route_items, args.concurrency))
+    latencies, first_tokens, wall = timed_stream(stream_respond, stream_items, args.concurrency)
+    results["routes"]["llm_stream"] = summarize(latencies, wall, first_tokens)
+
+    # Distinct synthetic images (not PDFs, which would also queue RAG indexing), so every upload writes a new blob
+    def upload(position):
+        payload = position.to_bytes(8, "big") + rng.randbytes(args.upload_kb * 1024)
+        admin_actions.add_resource("Event Schedules", f"Bench schedule {position}", io.BytesIO(payload), f"bench_{position}.jpg")
+    results["routes"]["admin_upload"] = summarize(*timed(upload, range(args.requests), args.concurrency))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,79 @@
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rag_index import RagIndex
+
+# Query latency of the PDF retrieval index against corpus size.
+# Usage: python benchmarks/bench_rag_index.py [chunk counts...]   (default 1000 10000 50000)
+# Builds a synthetic corpus of course-like chunks in a temporary directory, then times
+# single queries and batches of BATCH queries scored in one matrix product.
+
+TOPICS = {
+    "DBMS": "relation schema tuple attribute key normalization normal form transaction acid lock index query join sql",
+    "COA": "cache memory register pipeline instruction cpu bus addressing interrupt microprogram alu cycle",
+    "FAI": "search heuristic agent state goal minimax pruning knowledge inference logic planning learning",
+    "SE": "requirement design testing waterfall model agile sprint module coupling cohesion maintenance risk",
+    "WPAI": "python list dictionary function class object file exception loop module package library",
+}
+FILLER = "the of and a to in is for that with as on by this are be from".split()
+QUERIES = ["what is normalization", "explain cache memory", "minimax with alpha beta pruning",
+           "waterfall model phases", "python dictionary methods", "acid properties of a transaction",
+           "instruction pipeline hazards", "heuristic search example"]
+LOOKUPS = 200
+BATCH = 32
+CHUNK_WORDS = 160
+
+# Function to generate synthetic chunks grouped by resource: {resource_id: (name, path, texts)}
+def synthetic_corpus(chunks, seed=11):
+    rng = random.Random(seed)
+    topics = list(TOPICS.items())
+    corpus = {}
+    for position in range(chunks):
+        name, vocabulary = topics[position % len(topics)]
+        words = vocabulary.split()
+        text = " ".join(rng.choice(words) if rng.random() < 0.4 else rng.choice(FILLER) for _ in range(CHUNK_WORDS))
+        resource_id = str(position // 200)
+        corpus.setdefault(resource_id, (f"{name} {resource_id}", f"uploads/{name}_{resource_id}.pdf", []))[2].append(text)
+    return corpus
+
+def percentile(latencies, fraction):
+    return sorted(latencies)[min(int(len(latencies) * fraction), len(latencies) - 1)]
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f"{'chunks':>8} {'build s':>8} {'index MB':>9} {'single p50':>11} {'single p95':>11} {f'batch/{BATCH} per query':>20}")
+    for size in sizes:
+        index_dir = tempfile.mkdtemp(prefix="campus_rag_")
+        try:
+            started = time.perf_counter()
+            index = RagIndex(index_dir)
+            index.apply_changes(added=synthetic_corpus(size))
+            build_seconds = time.perf_counter() - started
+            # Reopen so searches run against the memory-mapped file, as in the app
+            index = RagIndex(index_dir)
+
+            latencies = []
+            for lookup in range(LOOKUPS):
+                started = time.perf_counter()
+                index.search(QUERIES[lookup % len(QUERIES)])
+                latencies.append((time.perf_counter() - started) * 1000)
+
+            batch = [QUERIES[position % len(QUERIES)] for position in range(BATCH)]
+            batch_latencies = []
+            for _ in range(max(LOOKUPS // BATCH, 3)):
+                started = time.perf_counter()
+                index.search_many(batch)
+                batch_latencies.append((time.perf_counter() - started) * 1000 / BATCH)
+
+            print(f"{size:>8} {build_seconds:>8.1f} {index.stats()['index_bytes'] / 1e6:>9.1f} "
+                  f"{statistics.median(latencies):>9.2f}ms {percentile(latencies, 0.95):>9.2f}ms "
+                  f"{statistics.median(batch_latencies):>18.3f}ms")
+        finally:
+            shutil.rmtree(index_dir, ignore_errors=True)
@@ -0,0 +1,87 @@
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from resource_index import CategoryIndex
+
+# Benchmark for the in-memory resource index used by find_resource.
+# Usage: python benchmarks/bench_resource_index.py [sizes...]   (default 10000 100000 1000000)
+# The legacy linear scan is only timed up to LEGACY_LIMIT rows; past that it is too slow to be useful.
+
+BRANCHES = ["CSE", "CSM", "CSIT", "ECE", "EEE", "MECH", "CIVIL", "MCA", "MBA", "IT", "Computer Science", "Data Science"]
+KINDS = ["Timetable", "Semester", "Sem", "Year", "Lab Schedule", "Section"]
+QUERIES = ["csm semester 3", "mca sem 1", "ece 7th sem", "computer science semester 1", "cse 2nd year", "civil timetable 5"]
+LEGACY_LIMIT = 100000
+LOOKUPS = 200
+
+# Function to generate synthetic resource names like the ones admins upload
+def synthetic_rows(count, seed=7):
+    rng = random.Random(seed)
+    rows = []
+    for res_id in range(1, count + 1):
+        name = f"{rng.choice(BRANCHES)} {rng.choice(KINDS)} {rng.randint(1, 8)} Batch {rng.randint(2018, 2026)} {res_id}"
+        rows.append((res_id, name, f"uploads/{name.replace(' ', '_')}.jpg"))
+    return rows
+
+# The scoring loop find_resource used before the index, kept here for comparison
+def legacy_scan(rows, name):
+    search_terms = name.lower().split()
+    best_match = None
+    highest_score = 0
+    for res_id, res_name, res_path in rows:
+        res_name_lower = res_name.lower()
+        score = 0
+        for term in search_terms:
+            if term in res_name_lower:
+                score += 1
+            elif term.isdigit() and (f"semester {term}" in res_name_lower or f"sem {term}" in res_name_lower):
+                score += 1
+            elif term.isdigit() and (f"year {term}" in res_name_lower or f"{term}rd year" in res_name_lower or f"{term}nd year" in res_name_lower or f"{term}st year" in res_name_lower or f"{term}th year" in res_name_lower):
+                score += 1
+            elif term.endswith(('st', 'nd', 'rd', 'th')) and term[:-2].isdigit():
+                num = term[:-2]
+                if num in res_name_lower or f"semester {num}" in res_name_lower or f"year {num}" in res_name_lower:
+                    score += 1
+        if score > highest_score and score > 0:
+            highest_score = score
+            best_match = res_path
+    return best_match
+
+# Function to time repeated calls and return latencies in milliseconds
+def time_calls(func, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        func(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def run(size):
+    rows = synthetic_rows(size)
+
+    started = time.perf_counter()
+    index = CategoryIndex(rows)
+    build_seconds = time.perf_counter() - started
+
+    queries = [QUERIES[i % len(QUERIES)] for i in range(LOOKUPS)]
+    indexed = time_calls(lambda query: index.search(query, limit=1), queries)
+    line = (f"{size:>9,} rows | build {build_seconds:7.2f} s | index p50 {statistics.median(indexed):8.3f} ms "
+            f"p95 {percentile(indexed, 0.95):8.3f} ms")
+
+    if size <= LEGACY_LIMIT:
+        legacy = time_calls(lambda query: legacy_scan(rows, query), queries[:20])
+        line += f" | legacy scan p50 {statistics.median(legacy):9.3f} ms"
+    print(line)
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000]
+    for size in sizes:
+        run(size)
@@ -0,0 +1,163 @@
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Process, Queue
+from multiprocessing.managers import BaseManager
+
+# Runs against a throwaway SQLite stand-in and the stub Gemini backend unless configured otherwise
+WORK_DIR = tempfile.mkdtemp(prefix="campus_scale_")
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(WORK_DIR, "campus.sqlite3"))
+os.environ.setdefault("RAG_INDEX_DIR", os.path.join(WORK_DIR, "rag_index"))
+os.environ.setdefault("GEMINI_BACKEND", "stub")
+os.environ.setdefault("GEMINI_STUB_LATENCY", "0.05")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chat_history
+import seed
+import state_backend
+
+# Load test for the stateless multi-worker setup.
+# Usage: python benchmarks/bench_scale_out.py [max_workers] [messages] [clients]
+# Starts 1, 2, 4, ... max_workers worker processes that share one FakeRedis (served by a
+# multiprocessing manager, so every state call is a round trip like a real Redis) and
+# one database. CLIENTS closed-loop clients each own a session and send their next
+# message to a random worker as soon as the previous reply arrives, so consecutive
+# messages of a session land on different workers. Afterwards every session history is
+# checked for completeness and order.
+
+THREADS_PER_WORKER = 4
+MESSAGES = [
+    "what are today's events",
+    "classroom A-104",
+    "room B-105 details",
+    "cse semester 3 timetable",
+    "mca sem 1",
+    "exam timetable ece 7th sem",
+    "dbms notes unit 2",
+    "explain normalization with an example {n}",
+    "what is a deadlock {n}",
+    "how do I prepare for placements {n}",
+]
+
+
+class SharedStateManager(BaseManager):
+    pass
+
+SharedStateManager.register("FakeRedis", state_backend.FakeRedis)
+
+# Function run by each worker process: answer messages from its queue with THREADS_PER_WORKER threads
+def worker(jobs, results, redis_proxy):
+    import chat_pipeline
+    import signals
+    backend = state_backend.RedisStateBackend(redis_proxy)
+    signals.set_bus(backend)
+    # Warm imports, indexes and caches before the clock starts, as a long-running worker would be
+    for message in MESSAGES:
+        chat_pipeline.answer_from_campus_data(message)
+    results.put(None)
+
+    def serve():
+        while True:
+            job = jobs.get()
+            if job is None:
+                return
+            session_id, sequence, message = job
+            # What one Streamlit rerun does: catch up on other workers' writes, load the history, answer
+            signals.poll()
+            history = chat_history.ChatHistory(state_backend.SessionState(session_id, backend))
+            history.recent()
+            conversation = history.prompt_context()
+            history.add({"role": "user", "content": message, "sequence": sequence})
+            response, attachment = chat_pipeline.respond(message, conversation)
+            history.add({"role": "assistant", "content": response, "attachment": attachment, "sequence": sequence})
+            results.put(session_id)
+
+    threads = [threading.Thread(target=serve) for _ in range(THREADS_PER_WORKER)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+# Function to wait for the next answered session, failing fast if a worker died
+def _next_result(results, processes):
+    while True:
+        try:
+            return results.get(timeout=1)
+        except queue.Empty:
+            if any(not process.is_alive() for process in processes):
+                for process in processes:
+                    process.terminate()
+                sys.exit("A worker process exited early; see its traceback above")
+
+# Function to run one load test; returns (messages per second, sessions with a broken history)
+def run(worker_count, total_messages, clients, redis_proxy, rng):
+    job_queues = [Queue() for _ in range(worker_count)]
+    results = Queue()
+    processes = [Process(target=worker, args=(job_queues[position], results, redis_proxy)) for position in range(worker_count)]
+    for process in processes:
+        process.start()
+
+    run_id = f"{worker_count}w{rng.random():.6f}"
+    per_client = total_messages // clients
+    sent = {f"{run_id}-{client}": 0 for client in range(clients)}
+
+    def send(session_id):
+        sequence = sent[session_id]
+        message = rng.choice(MESSAGES).format(n=rng.randint(0, 10 ** 6))
+        rng.choice(job_queues).put((session_id, sequence, message))
+        sent[session_id] += 1
+
+    for _ in processes:
+        _next_result(results, processes)
+
+    started = time.perf_counter()
+    for session_id in sent:
+        send(session_id)
+    for _ in range(per_client * clients):
+        session_id = _next_result(results, processes)
+        if sent[session_id] < per_client:
+            send(session_id)
+    elapsed = time.perf_counter() - started
+
+    for job_queue in job_queues:
+        for _ in range(THREADS_PER_WORKER):
+            job_queue.put(None)
+    for process in processes:
+        process.join()
+
+    broken = 0
+    for session_id in sent:
+        history = chat_history.ChatHistory(state_backend.SessionState(session_id, state_backend.RedisStateBackend(redis_proxy)))
+        history = history.archived(history.archived_page_count()) + history.recent()
+        expected = [(sequence, role) for sequence in range(per_client) for role in ("user", "assistant")]
+        if [(message["sequence"], message["role"]) for message in history] != expected:
+            broken += 1
+    return per_client * clients / elapsed, broken
+
+if __name__ == "__main__":
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    total_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 800
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 64
+    seed.seed(resources=5000, classrooms=500, calendar=365)
+
+    manager = SharedStateManager()
+    manager.start()
+    redis_proxy = manager.FakeRedis()
+    rng = random.Random(5)
+
+    print(f"{os.cpu_count()} CPUs, {clients} clients, {THREADS_PER_WORKER} threads per worker, "
+          f"stub Gemini latency {float(os.environ['GEMINI_STUB_LATENCY']) * 1000:.0f} ms")
+    baseline = None
+    worker_count = 1
+    while worker_count <= max_workers:
+        throughput, broken = run(worker_count, total_messages, clients, redis_proxy, rng)
+        baseline = baseline or throughput
+        print(f"{worker_count} workers: {throughput:8.1f} msg/s  ({throughput / baseline:4.2f}x)  "
+              f"sessions with broken history: {broken}")
+        worker_count *= 2
+    manager.shutdown()
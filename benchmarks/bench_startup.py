@@ -0,0 +1,76 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Cold start and rerun time of the Streamlit entry point, for the chat page and ?admin.
+# Usage: python benchmarks/bench_startup.py [--app app1.py] [--reruns 20]
+# Each page runs in a fresh interpreter through Streamlit's AppTest, against a seeded
+# SQLite stand-in and the stub Gemini backend:
+#   cold    the first script run, including every module import and one-time setup
+#   rerun   median of the following runs (what each widget interaction costs)
+# It also reports how many modules the page loaded and whether the Gemini SDK was imported.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Function run in the child interpreter: time the page's runs and print the result as JSON
+def measure(app, page, reruns):
+    from streamlit.testing.v1 import AppTest
+    modules_before = len(sys.modules)
+    app_test = AppTest.from_file(app, default_timeout=120)
+    if page == "admin":
+        app_test.query_params["admin"] = "1"
+
+    started = time.perf_counter()
+    app_test.run()
+    cold = time.perf_counter() - started
+    if app_test.exception:
+        sys.exit(f"{page} page raised: {app_test.exception[0].message}")
+
+    timings = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app_test.run()
+        timings.append(time.perf_counter() - started)
+    print(json.dumps({
+        "page": page,
+        "cold_ms": round(cold * 1000, 1),
+        "rerun_p50_ms": round(statistics.median(timings) * 1000, 1),
+        "modules_loaded": len(sys.modules) - modules_before,
+        "gemini_sdk_imported": "google.generativeai" in sys.modules,
+    }))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time cold start and reruns of the campus_buddy app")
+    parser.add_argument("--app", default=os.path.join(ROOT, "app1.py"))
+    parser.add_argument("--reruns", type=int, default=20)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        measure(args.app, args.child, args.reruns)
+        sys.exit(0)
+
+    work_dir = tempfile.mkdtemp(prefix="campus_startup_")
+    env = dict(os.environ, DB_BACKEND="sqlite", SQLITE_PATH=os.path.join(work_dir, "campus.sqlite3"),
+               STORAGE_ROOT=work_dir, RAG_INDEX_DIR=os.path.join(work_dir, "rag_index"),
+               GEMINI_BACKEND="stub", FILE_SERVER_PORT="0", JOB_RUN_IN_APP="0")
+    app_dir = os.path.dirname(os.path.abspath(args.app))
+    env["PYTHONPATH"] = app_dir
+    # Seed in a separate interpreter so the measured ones start cold
+    subprocess.run([sys.executable, os.path.join(app_dir, "seed.py"), "--resources", "2000"],
+                   env=env, cwd=work_dir, check=True, stdout=subprocess.DEVNULL)
+
+    results = []
+    for page in ("chat", "admin"):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), "--app", os.path.abspath(args.app),
+                                 "--reruns", str(args.reruns), "--child", page],
+                                env=env, cwd=work_dir, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    for result in results:
+        print(f"{result['page']:>5}: cold {result['cold_ms']:8.1f} ms   rerun p50 {result['rerun_p50_ms']:7.1f} ms   "
+              f"modules {result['modules_loaded']:4d}   Gemini SDK imported: {result['gemini_sdk_imported']}")
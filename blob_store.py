@@ -0,0 +1,291 @@
+import hashlib
+import os
+import shutil
+import sys
+import time
+import db
+from storage import get_storage
+
+# Content-addressed storage for uploaded files.
+# Files are hashed (SHA-256) while they stream in and stored once under
+# uploads/blobs/<first two hex digits>/<digest><extension>. The blobs table keeps a
+# reference count per digest; resources rows point at their blob through
+# resources.blob_digest, and their file_path is the blob path so readers are unchanged.
+# The extension is the one of the first upload: the same content uploaded later under
+# another extension (a.jpg, then b.jpeg) reuses the path already recorded for its digest.
+# Reference counts change in the same transaction as the resources row, and blobs
+# that drop to zero are removed by collect_garbage() after a grace period, together with
+# their derived display copy (uploads/.display/, written by upload_processing.py).
+# An upload that reuses an existing file can race the collector, so acquire() checks the
+# file again once its upsert holds the row (the collector deletes row and file under that
+# lock) and writes the content back if it was removed; reusing a file also refreshes its
+# mtime, which keeps the sweep for orphaned files off it until the reference commits.
+# All file access goes through storage.py, so every app worker shares the same blobs.
+#
+#   python blob_store.py report     duplicate report for uploads/ and the blob table
+#   python blob_store.py migrate    move legacy per-upload files into the store
+#   python blob_store.py gc         remove unreferenced blobs
+
+UPLOADS_DIR = "uploads"
+BLOB_DIR = os.path.join(UPLOADS_DIR, "blobs")
+DISPLAY_DIR = os.path.join(UPLOADS_DIR, ".display")
+CHUNK_SIZE = 1024 * 1024
+# Unreferenced blobs are kept this long so an upload racing a release can still claim them
+GC_GRACE_SECONDS = int(os.getenv("BLOB_GC_GRACE_SECONDS", "3600"))
+
+# Function to map a digest to its blob path
+def blob_path(digest, extension):
+    return os.path.join(BLOB_DIR, digest[:2], f"{digest}{extension.lower()}")
+
+# Function to map a stored file to its derived display copy (same relative path under uploads/.display/)
+def display_path(file_path):
+    return os.path.join(DISPLAY_DIR, os.path.relpath(file_path, UPLOADS_DIR))
+
+# Function to check whether a stored path lives in the blob store
+def is_blob_path(file_path):
+    return os.path.normpath(file_path).startswith(BLOB_DIR + os.sep)
+
+# Function to hash a stream without writing it anywhere
+def _hash_stream(stream):
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+# Function to look up the path recorded for a digest; None for content not in the blobs table
+def recorded_path(digest):
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_path FROM blobs WHERE digest=%s", (digest,))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else None
+
+# Function to reuse a stored file, refreshing its mtime; returns False if it is gone
+def _reuse(path):
+    try:
+        get_storage().touch(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+# Function to store a file-like object; returns (digest, path, size, created).
+# In-memory uploads (Streamlit's UploadedFile) are hashed in place first, so re-uploading
+# existing content costs no write at all; other streams (ZIP members, open files) are
+# hashed while being copied to a temporary file that is renamed onto the digest path.
+def store(stream, extension):
+    files = get_storage()
+    if hasattr(stream, "getbuffer"):
+        data = stream.getbuffer()
+        digest = hashlib.sha256(data).hexdigest()
+        path = recorded_path(digest) or blob_path(digest, extension)
+        if _reuse(path):
+            return digest, path, len(data), False
+        files.write(path, lambda target: target.write(data))
+        return digest, path, len(data), True
+
+    hasher = hashlib.sha256()
+    written = []
+
+    def copy(target):
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            written.append(len(chunk))
+            target.write(chunk)
+
+    temp_path = files.write_temp(BLOB_DIR, copy)
+    digest = hasher.hexdigest()
+    path = recorded_path(digest) or blob_path(digest, extension)
+    if _reuse(path):
+        files.delete(temp_path)
+        return digest, path, sum(written), False
+    files.move(temp_path, path)
+    return digest, path, sum(written), True
+
+# Upsert that adds one reference to a blob, creating its row on first use
+ACQUIRE_SQL = {
+    "mysql": "INSERT INTO blobs (digest, file_path, size, ref_count) VALUES (%s, %s, %s, 1) "
+             "ON DUPLICATE KEY UPDATE ref_count = ref_count + 1, released_at = NULL",
+    "sqlite": "INSERT INTO blobs (digest, file_path, size, ref_count) VALUES (%s, %s, %s, 1) "
+              "ON CONFLICT(digest) DO UPDATE SET ref_count = ref_count + 1, released_at = NULL",
+}
+
+# Function to put a blob's file back if collect_garbage() removed it; source() opens its content again
+def _restore(path, source):
+    if get_storage().exists(path):
+        return
+    if source is None:
+        raise FileNotFoundError(f"{path} was removed by garbage collection while being referenced")
+    with source() as stream:
+        get_storage().write(path, lambda target: shutil.copyfileobj(stream, target, CHUNK_SIZE))
+
+# Function to add a reference to a blob inside the caller's transaction; source is a
+# callable that opens the content again, in case the blob was collected meanwhile.
+# Returns the path recorded for the digest, which is what the resources row must point at:
+# a concurrent first upload of the same content under another extension may have won the row.
+def acquire(cursor, digest, path, size, source=None):
+    cursor.execute(ACQUIRE_SQL[db.DB_BACKEND], (digest, path, size))
+    cursor.execute("SELECT file_path FROM blobs WHERE digest=%s", (digest,))
+    path = cursor.fetchone()[0]
+    _restore(path, source)
+    return path
+
+# Function to add one reference per stored entry (digest, path, size, created) in one round trip;
+# sources holds one callable per entry, as for acquire(). Returns the recorded path per entry.
+def acquire_many(cursor, entries, sources=None):
+    cursor.executemany(ACQUIRE_SQL[db.DB_BACKEND], [(digest, path, size) for digest, path, size, _ in entries])
+    digests = sorted({digest for digest, _, _, _ in entries})
+    cursor.execute(f"SELECT digest, file_path FROM blobs WHERE digest IN ({', '.join(['%s'] * len(digests))})", digests)
+    recorded = dict(cursor.fetchall())
+    paths = [recorded[digest] for digest, _, _, _ in entries]
+    for position, path in enumerate(paths):
+        _restore(path, sources[position] if sources else None)
+    return paths
+
+# Function to remove blobs created by a write that was rolled back, unless something else now references them
+def discard_new_blobs(entries):
+    created = {digest: path for digest, path, _, was_created in entries if was_created}
+    if not created:
+        return
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for digest, path in created.items():
+            cursor.execute("SELECT COUNT(*) FROM blobs WHERE digest=%s", (digest,))
+            if cursor.fetchone()[0] == 0:
+                get_storage().delete(path)
+    finally:
+        conn.close()
+
+# Function to drop the blob reference held by a resources row (call before deleting/repointing it)
+def release_for_resource(cursor, resource_id):
+    cursor.execute("UPDATE blobs SET ref_count = ref_count - 1, released_at = %s "
+                   "WHERE digest = (SELECT blob_digest FROM resources WHERE id=%s)",
+                   (int(time.time()), resource_id))
+
+# Function to delete blobs nobody references any more, plus orphaned files; returns bytes freed
+def collect_garbage(grace_seconds=GC_GRACE_SECONDS):
+    files = get_storage()
+    cutoff = int(time.time()) - grace_seconds
+    freed = 0
+    with db.transaction() as cursor:
+        cursor.execute("SELECT digest, file_path FROM blobs WHERE ref_count <= 0 AND released_at <= %s", (cutoff,))
+        candidates = cursor.fetchall()
+        for digest, path in candidates:
+            # The file goes while this transaction holds the row, so a concurrent acquire()
+            # either keeps the blob alive or finds the file gone once its upsert gets the row
+            cursor.execute("DELETE FROM blobs WHERE digest=%s AND ref_count <= 0", (digest,))
+            if cursor.rowcount:
+                freed += files.delete(path) + files.delete(display_path(path))
+        cursor.execute("SELECT file_path FROM blobs")
+        known = {os.path.normpath(row[0]) for row in cursor.fetchall()}
+
+    # Files written by an upload whose transaction never committed
+    for path in list(files.walk(BLOB_DIR)):
+        if path not in known and files.modified(path) <= cutoff:
+            freed += files.delete(path)
+    return freed
+
+# Function to hash every file under uploads/ and report duplicate content and blob savings
+def dedup_report():
+    files = get_storage()
+    groups = {}
+    for path in files.walk(UPLOADS_DIR):
+        # Skip the blob store itself and generated folders such as .thumbnails
+        if is_blob_path(path) or any(part.startswith(".") for part in path.split(os.sep)):
+            continue
+        with files.open(path) as f:
+            digest, size = _hash_stream(f)
+        groups.setdefault(digest, {"size": size, "files": []})["files"].append(path)
+
+    duplicates = [{"digest": digest, "size": group["size"], "files": sorted(group["files"])}
+                  for digest, group in groups.items() if len(group["files"]) > 1]
+    report = {
+        "legacy_files": sum(len(group["files"]) for group in groups.values()),
+        "legacy_unique": len(groups),
+        "legacy_duplicate_groups": sorted(duplicates, key=lambda group: -group["size"] * len(group["files"])),
+        "legacy_wasted_bytes": sum(group["size"] * (len(group["files"]) - 1) for group in duplicates),
+    }
+
+    report.update(blob_stats())
+    return report
+
+# Function to summarize the blob table (cheap; used by the admin panel)
+def blob_stats():
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(size * ref_count), 0), "
+                       "COALESCE(SUM(ref_count), 0) FROM blobs WHERE ref_count > 0")
+        blobs, stored_bytes, referenced_bytes, references = cursor.fetchone()
+        cursor.execute("SELECT COUNT(*) FROM blobs WHERE ref_count <= 0")
+        unreferenced = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    return {
+        "blobs": blobs,
+        "blob_references": int(references),
+        "blob_stored_bytes": int(stored_bytes),
+        "blob_saved_bytes": int(referenced_bytes) - int(stored_bytes),
+        "blob_unreferenced": unreferenced,
+    }
+
+# Function to move resources that still point at per-upload files into the blob store
+def migrate_legacy_files():
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, file_path FROM resources WHERE blob_digest IS NULL")
+        legacy_rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    files = get_storage()
+    migrated = 0
+    legacy_paths = set()
+    for resource_id, file_path in legacy_rows:
+        if not file_path or is_blob_path(file_path) or not files.exists(file_path):
+            continue
+        with files.open(file_path) as f:
+            digest, path, size, _ = store(f, os.path.splitext(file_path)[1])
+        with db.transaction() as cursor:
+            path = acquire(cursor, digest, path, size, lambda: files.open(file_path))
+            cursor.execute("UPDATE resources SET file_path=%s, blob_digest=%s WHERE id=%s", (path, digest, resource_id))
+        legacy_paths.add(file_path)
+        migrated += 1
+
+    # Remove the old copies only once no row refers to them any more
+    removed = 0
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        for file_path in legacy_paths:
+            cursor.execute("SELECT COUNT(*) FROM resources WHERE file_path=%s", (file_path,))
+            if cursor.fetchone()[0] == 0:
+                files.delete(file_path)
+                removed += 1
+    finally:
+        conn.close()
+    return migrated, removed
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command == "report":
+        report = dedup_report()
+        print(f"uploads/: {report['legacy_files']} files, {report['legacy_unique']} unique, "
+              f"{report['legacy_wasted_bytes'] / 1e6:.2f} MB in duplicates")
+        for group in report["legacy_duplicate_groups"]:
+            print(f"  {group['digest'][:12]} {group['size']:>10} B x{len(group['files'])}: {', '.join(group['files'])}")
+        print(f"blob store: {report['blobs']} blobs, {report['blob_references']} references, "
+              f"{report['blob_stored_bytes'] / 1e6:.2f} MB stored, {report['blob_saved_bytes'] / 1e6:.2f} MB saved by dedup")
+    elif command == "migrate":
+        migrated, removed = migrate_legacy_files()
+        print(f"Moved {migrated} resources into the blob store; removed {removed} legacy files")
+    elif command == "gc":
+        print(f"Freed {collect_garbage() / 1e6:.2f} MB")
+    else:
+        sys.exit(f"Unknown command {command!r}; expected report, migrate or gc")
@@ -0,0 +1,216 @@
+import csv
+import io
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import blob_store
+import db
+import job_queue
+import schema
+import signals
+
+# Bulk import for the admin panel:
+#   - a ZIP of resource files plus a manifest.csv / manifest.json (category, name, file)
+#   - a CSV of classrooms (room_number, details)
+#   - a CSV of calendar dates (date, event)
+# Every row is validated before anything is written. Files are streamed in parallel into
+# the content-addressed blob store (identical files are stored once) and rows plus their
+# blob references go in with a single transaction, together with one process_upload job per
+# imported resource (validation, image processing and PDF text extraction, as for admin
+# uploads); if the insert fails the blobs this import created are removed again.
+
+RESOURCE_CATEGORIES = ["PDFs", "Class Timetables", "Event Schedules", "Exam Timetables"]
+IMAGE_CATEGORIES = ["Class Timetables", "Exam Timetables"]
+MANIFEST_NAMES = ("manifest.csv", "manifest.json")
+WRITE_WORKERS = min(8, (os.cpu_count() or 2) * 2)
+
+# Function to list the file extensions the admin panel accepts for a category
+def allowed_extensions(category):
+    if category in IMAGE_CATEGORIES:
+        return {".jpg", ".jpeg", ".png", ".pdf"}
+    return {".pdf"}
+
+# Function to start an import report
+def _new_report(rows_total):
+    return {"rows_total": rows_total, "imported": 0, "errors": [], "bytes_written": 0,
+            "seconds": 0.0, "rows_per_second": 0.0}
+
+# Function to stamp timing and throughput on a finished report
+def _finish_report(report, started):
+    report["seconds"] = time.perf_counter() - started
+    report["rows_per_second"] = report["imported"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+# Function to normalize parsed rows into dicts with lower-cased keys and stripped text values
+# (values past the header of a CSV row, which DictReader files under None, are dropped)
+def _clean_rows(rows):
+    return [{str(key).strip().lower(): str(value or "").strip() for key, value in row.items() if key is not None}
+            for row in rows]
+
+# Function to read manifest rows (dicts with lower-cased keys) from a ZIP archive;
+# raises ValueError when the manifest is missing, unreadable or not a list of rows
+def read_manifest(archive):
+    names = {os.path.basename(member).lower(): member for member in archive.namelist()}
+    for manifest_name in MANIFEST_NAMES:
+        if manifest_name in names:
+            try:
+                with archive.open(names[manifest_name]) as raw:
+                    text = io.TextIOWrapper(raw, encoding="utf-8-sig")
+                    if manifest_name.endswith(".json"):
+                        rows = json.load(text)
+                    else:
+                        rows = list(csv.DictReader(text))
+            except (ValueError, csv.Error, zipfile.BadZipFile) as error:
+                raise ValueError(f"{manifest_name} could not be read: {error}") from None
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError(f"{manifest_name} must be a list of objects with category, name and file")
+            return _clean_rows(rows)
+    raise ValueError("The ZIP must contain a manifest.csv or manifest.json")
+
+# Function to validate manifest rows against the archive; returns (valid rows, errors)
+def validate_resource_rows(rows, archive, default_category=None):
+    members = {member for member in archive.namelist() if not member.endswith("/")}
+    valid = []
+    errors = []
+    for row_number, row in enumerate(rows, start=1):
+        category = row.get("category") or default_category
+        name = row.get("name", "")
+        member = row.get("file", "")
+        extension = os.path.splitext(member)[1].lower()
+
+        if category not in RESOURCE_CATEGORIES:
+            errors.append({"row": row_number, "error": f"Unknown category {category!r}"})
+        elif not name:
+            errors.append({"row": row_number, "error": "Missing name"})
+        elif member not in members:
+            errors.append({"row": row_number, "error": f"File {member!r} not found in the ZIP"})
+        elif extension not in allowed_extensions(category):
+            errors.append({"row": row_number, "error": f"{extension or 'No extension'} is not allowed for {category}"})
+        else:
+            valid.append({"row": row_number, "category": category, "name": name, "member": member, "extension": extension})
+    return valid, errors
+
+# Function to stream one archive member into the blob store; returns (digest, path, size, created)
+def _extract(archive, member, extension):
+    try:
+        with archive.open(member) as source:
+            return blob_store.store(source, extension)
+    except zipfile.BadZipFile as error:
+        raise ValueError(f"{member} could not be extracted: {error}") from None
+
+# Function to import a ZIP of resources; all-or-nothing unless skip_invalid is set
+def import_resources_zip(zip_file, default_category=None, skip_invalid=False):
+    started = time.perf_counter()
+    try:
+        archive = zipfile.ZipFile(zip_file)
+    except zipfile.BadZipFile:
+        raise ValueError("The upload is not a ZIP archive") from None
+    with archive:
+        rows = read_manifest(archive)
+        valid, errors = validate_resource_rows(rows, archive, default_category)
+        report = _new_report(len(rows))
+        report["errors"] = errors
+        if (errors and not skip_invalid) or not valid:
+            return _finish_report(report, started)
+
+        stored = []
+        try:
+            # ZipFile supports concurrent reads of different members
+            with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+                stored = list(executor.map(lambda row: _extract(archive, row["member"], row["extension"]), valid))
+
+            with db.transaction() as cursor:
+                paths = blob_store.acquire_many(cursor, stored, [lambda member=row["member"]: archive.open(member) for row in valid])
+                # The rows go in with one executemany and their jobs with one INSERT ... SELECT over
+                # the ids above the current maximum, so neither costs a round trip per row
+                cursor.execute("SELECT COALESCE(MAX(id), 0) FROM resources")
+                after_id = cursor.fetchone()[0]
+                cursor.executemany("INSERT INTO resources (category, name, file_path, blob_digest) VALUES (%s, %s, %s, %s)",
+                                   [(row["category"], row["name"], path, digest)
+                                    for row, (digest, _, _, _), path in zip(valid, stored, paths)])
+                job_queue.enqueue_for_resources(cursor, "process_upload", after_id, [digest for digest, _, _, _ in stored])
+        except Exception:
+            # Leave no orphaned files behind when extraction or the insert fails
+            blob_store.discard_new_blobs(stored)
+            raise
+
+    job_queue.notify()
+    report["imported"] = len(valid)
+    # Duplicate content (within the ZIP or already in the store) is not written again
+    report["bytes_written"] = sum({digest: size for digest, _, size, created in stored if created}.values())
+    signals.publish("resources_reloaded", categories=sorted({row["category"] for row in valid}))
+    return _finish_report(report, started)
+
+# Function to read CSV rows (dicts with lower-cased keys) from an uploaded file or path
+def read_csv_rows(csv_file):
+    try:
+        if isinstance(csv_file, (str, os.PathLike)):
+            with open(csv_file, encoding="utf-8-sig", newline="") as f:
+                rows = list(csv.DictReader(f))
+        else:
+            rows = list(csv.DictReader(io.TextIOWrapper(csv_file, encoding="utf-8-sig", newline="")))
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise ValueError(f"The CSV could not be read: {error}") from None
+    return _clean_rows(rows)
+
+# Function to validate classroom rows; returns (insert parameters, errors)
+def validate_classroom_rows(rows):
+    params = []
+    errors = []
+    seen = set()
+    for row_number, row in enumerate(rows, start=1):
+        room_number = row.get("room_number", "")
+        room_key = schema.normalize_room_number(room_number)
+        if not room_key:
+            errors.append({"row": row_number, "error": "Missing room_number"})
+        elif room_key in seen:
+            errors.append({"row": row_number, "error": f"Duplicate room {room_number!r} in this file"})
+        else:
+            seen.add(room_key)
+            params.append((room_number, row.get("details", ""), room_key))
+    return params, errors
+
+# Function to validate calendar rows; returns (insert parameters, errors)
+def validate_calendar_rows(rows):
+    params = []
+    errors = []
+    for row_number, row in enumerate(rows, start=1):
+        date_text = row.get("date", "")
+        try:
+            datetime.strptime(date_text, "%Y-%m-%d")
+        except ValueError:
+            errors.append({"row": row_number, "error": f"Date {date_text!r} must be in YYYY-MM-DD format"})
+            continue
+        if not row.get("event"):
+            errors.append({"row": row_number, "error": "Missing event"})
+            continue
+        params.append((date_text, row["event"]))
+    return params, errors
+
+# Function to validate and insert CSV rows into classrooms or calendar in one transaction
+def import_table_csv(csv_file, table, skip_invalid=False):
+    started = time.perf_counter()
+    rows = read_csv_rows(csv_file)
+    if table == "classrooms":
+        params, errors = validate_classroom_rows(rows)
+        sql = "INSERT INTO classrooms (room_number, details, room_key) VALUES (%s, %s, %s)"
+    elif table == "calendar":
+        params, errors = validate_calendar_rows(rows)
+        sql = "INSERT INTO calendar (date, event) VALUES (%s, %s)"
+    else:
+        raise ValueError(f"Unsupported table {table!r}")
+
+    report = _new_report(len(rows))
+    report["errors"] = errors
+    if (errors and not skip_invalid) or not params:
+        return _finish_report(report, started)
+
+    with db.transaction() as cursor:
+        cursor.executemany(sql, params)
+
+    report["imported"] = len(params)
+    signals.publish(f"{table}_changed")
+    return _finish_report(report, started)
@@ -0,0 +1,88 @@
+import base64
+import json
+import os
+import re
+import zlib
+
+# Bounded chat history for one session (stored through state_backend.SessionState).
+# Only the newest HISTORY_WINDOW messages are kept as plain entries and rendered on
+# every rerun. When the window overflows, its oldest SPILL_BATCH messages are packed
+# into one zlib-compressed page in the session's archive, and folded into a short
+# rolling summary. The archive is only decoded when the student asks for earlier
+# messages, and Gemini gets the summary plus the last few turns instead of the raw log.
+
+HISTORY_WINDOW = max(int(os.getenv("CHAT_HISTORY_WINDOW", "20")), 2)
+SPILL_BATCH = max(HISTORY_WINDOW // 2, 1)
+# Raw turns sent to Gemini after the summary, and how much of each
+PROMPT_RECENT_MESSAGES = 4
+PROMPT_MESSAGE_CHARS = 300
+SUMMARY_LINE_CHARS = 120
+SUMMARY_MAX_CHARS = 1200
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+# Function to pack a list of messages into one compact archive page
+def pack_page(messages):
+    raw = json.dumps(messages, separators=(",", ":")).encode()
+    return base64.b64encode(zlib.compress(raw, 6)).decode("ascii")
+
+def unpack_page(page):
+    return json.loads(zlib.decompress(base64.b64decode(page)))
+
+# Function to fold messages into the rolling summary, keeping the newest lines within SUMMARY_MAX_CHARS
+def summarize(summary, messages):
+    lines = summary.splitlines() if summary else []
+    for message in messages:
+        text = " ".join(str(message.get("content") or "").split())
+        if message["role"] == "user":
+            lines.append(f"Student asked: {text[:SUMMARY_LINE_CHARS]}")
+        else:
+            # The first sentence of an answer is usually enough to recall what was said
+            lines.append(f"Assistant: {SENTENCE_END_RE.split(text, 1)[0][:SUMMARY_LINE_CHARS]}")
+    while lines and len("\n".join(lines)) > SUMMARY_MAX_CHARS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ChatHistory:
+    def __init__(self, session):
+        self.session = session
+
+    # Function to get the messages in the live window (what a rerun renders)
+    def recent(self):
+        return self.session.items("messages")
+
+    # Function to append a message, spilling the oldest batch once the window overflows
+    def add(self, message):
+        self.session.append("messages", message)
+        if self.session.length("messages") > HISTORY_WINDOW:
+            spilled = self.session.items("messages", 0, SPILL_BATCH - 1)
+            self.session.append("archive", pack_page(spilled))
+            self.session.trim("messages", SPILL_BATCH, -1)
+            self.session.set("summary", summarize(self.session.get("summary", ""), spilled))
+
+    def archived_page_count(self):
+        return self.session.length("archive")
+
+    # Function to decode the newest `pages` archive pages, oldest message first
+    def archived(self, pages):
+        if pages <= 0:
+            return []
+        messages = []
+        for page in self.session.items("archive", -pages, -1):
+            messages.extend(unpack_page(page))
+        return messages
+
+    # Function to describe the conversation for an AI prompt ("" for a new conversation)
+    def prompt_context(self):
+        summary = self.session.get("summary", "")
+        recent = self.recent()[-PROMPT_RECENT_MESSAGES:]
+        parts = []
+        if summary:
+            parts.append(f"Earlier in this conversation (summary):\n{summary}")
+        if recent:
+            lines = [f"{'Student' if message['role'] == 'user' else 'Assistant'}: "
+                     f"{' '.join(str(message.get('content') or '').split())[:PROMPT_MESSAGE_CHARS]}"
+                     for message in recent]
+            parts.append("Most recent messages:\n" + "\n".join(lines))
+        return "\n\n".join(parts)
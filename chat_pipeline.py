@@ -0,0 +1,178 @@
+import os
+import re
+import blob_store
+import db
+from db import fetch_one
+import file_server
+import intent_router
+import lookup_cache
+import metrics
+import rag_index
+import resource_index
+import schema
+from gemini_gateway import get_gateway
+
+# The chat's answering logic without any Streamlit calls, so chat_ui.py renders it and
+# worker processes, load tests and benchmarks can drive it headlessly.
+
+AI_TIMEOUT_MESSAGE = "Sorry, the AI assistant is taking too long to respond. Please try again in a moment."
+# Words that make a question lean on earlier messages ("explain it again", "what about the second one")
+FOLLOW_UP_WORDS = {"it", "its", "that", "this", "these", "those", "they", "them", "their", "he", "she",
+                   "him", "her", "his", "above", "previous", "earlier", "again", "more", "else", "one", "ones"}
+
+# Function to stream AI response chunks, ending with an apology if the stream times out
+def stream_gemini_response(prompt):
+    with metrics.span("gemini", mode="stream"):
+        try:
+            yield from get_gateway().stream(prompt)
+        except TimeoutError:
+            yield AI_TIMEOUT_MESSAGE
+
+# Function to get AI response (through the shared, cached Gemini gateway)
+# With stream=True it returns a generator of text chunks instead of the full text.
+def get_gemini_response(prompt, stream=False):
+    if stream:
+        return stream_gemini_response(prompt)
+    with metrics.span("gemini", mode="generate"):
+        try:
+            return get_gateway().generate(prompt)
+        except TimeoutError:
+            return AI_TIMEOUT_MESSAGE
+
+# Function to find matching resource with enhanced search capabilities
+def find_resource(category, name):
+    # First try a name prefix match (range scan on the (category, name) index)
+    result = fetch_one("resource_by_name_prefix", (category, db.like_prefix(name)))
+
+    # Then require every word through the FULLTEXT index (MySQL/MariaDB only)
+    if not result and name and db.DB_BACKEND == "mysql":
+        words = db.fulltext_query(name)
+        if words:
+            result = fetch_one("resource_by_fulltext", (category, words))
+
+    # If no exact match, rank the category's resources through the in-memory index
+    if not result and name:
+        with metrics.span("resource_index_lookup"):
+            best_match = resource_index.lookup(category, name)
+        if best_match:
+            result = (best_match,)
+
+    return result[0] if result else None
+
+# Function to get today's events (cached per day, shared by all sessions)
+def get_todays_events():
+    return lookup_cache.events_on() or None
+
+# Function to get classroom details (exact, then prefix match on the normalized room key, or on the
+# room number without its block letters, from the shared classroom map)
+def get_classroom_details(room_number):
+    room_key = schema.normalize_room_number(room_number)
+    if not room_key:
+        return None
+    return lookup_cache.classroom_details(room_key)
+
+# Function to determine file type and MIME type
+def get_file_mime_type(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == '.pdf':
+        return "application/pdf"
+    elif extension == '.jpg' or extension == '.jpeg':
+        return "image/jpeg"
+    elif extension == '.png':
+        return "image/png"
+    else:
+        return "application/octet-stream"
+
+# Function to describe a stored file as links served by the file server (no bytes held here)
+def build_attachment(file_path, title=None):
+    file_name = os.path.basename(file_path)
+    # Blob files are named by their digest, so give the user a readable name instead
+    if title and blob_store.is_blob_path(file_path):
+        file_name = title.replace(" ", "_") + os.path.splitext(file_path)[1]
+    attachment = {"file_name": file_name, "mime_type": get_file_mime_type(file_path)}
+    if not file_server.links_enabled():
+        # No public address for the file server: chat_ui.py sends the file through Streamlit
+        attachment["file_path"] = file_path
+        return attachment
+    attachment["url"] = file_server.file_url(file_path)
+    attachment["download_url"] = file_server.file_url(file_path, download=True, file_name=file_name)
+    if attachment["mime_type"].startswith("image/"):
+        # Viewing uses the downscaled display copy; the download stays the original upload
+        attachment["url"] = file_server.display_url(file_path)
+        attachment["thumbnail_url"] = file_server.thumbnail_url(file_path)
+    return attachment
+
+# Function to answer a message from campus data; returns (response, attachment) with an
+# empty response when the message has to go to the AI
+def answer_from_campus_data(user_input):
+    ai_response = ""
+    attachment = None
+
+    # Resolve the intent in a single pass over the message
+    chat_route = intent_router.route(user_input)
+    metrics.set_route(chat_route.intent)
+
+    # Check for today's events
+    if chat_route.intent == intent_router.INTENT_TODAYS_EVENTS:
+        events = get_todays_events()
+        if events:
+            ai_response = f"Today's events:\n" + "\n".join([f"• {event}" for event in events])
+        else:
+            ai_response = "There are no events scheduled for today."
+
+    # Check for classroom details
+    elif chat_route.intent == intent_router.INTENT_CLASSROOM:
+        # The router has already stripped the classroom keywords
+        query = chat_route.query
+
+        # First try to find rooms with numbers
+        for word in query.split():
+            if any(c.isdigit() for c in word):
+                room_details = get_classroom_details(word)
+                if room_details:
+                    ai_response = f"Classroom {word} details:\n{room_details}"
+                    break
+
+        # If no room found by number, try the whole query
+        if not ai_response:
+            room_details = get_classroom_details(query)
+            if room_details:
+                ai_response = f"Classroom details:\n{room_details}"
+            else:
+                ai_response = "Sorry, I couldn't find details for that classroom."
+
+    # Check for resources, either by category phrase or by educational terms (semester, branch, ...)
+    elif chat_route.intent in (intent_router.INTENT_RESOURCE, intent_router.INTENT_EDUCATIONAL):
+        matched_category = chat_route.category
+        query_name = chat_route.query
+
+        resource_path = find_resource(matched_category, query_name)
+        if resource_path:
+            attachment = build_attachment(resource_path, f"{matched_category} {query_name}")
+            ai_response = f"Here is the {matched_category.lower()} for {query_name}:"
+        else:
+            ai_response = f"Sorry, I couldn't find the requested {matched_category.lower()}"
+
+    return ai_response, attachment
+
+# Function to tell whether a question only makes sense with the conversation before it
+def depends_on_conversation(user_input):
+    return any(word in FOLLOW_UP_WORDS for word in re.findall(r"[a-z]+", user_input.lower()))
+
+# Function to build the AI prompt: the question grounded in matching course material, after the
+# (summarized) conversation so far only when the question refers back to it. The gateway caches
+# and coalesces on the whole prompt, so a standalone question is sent without the conversation:
+# its shared answer then never carries one student's messages into another session.
+def ai_prompt(user_input, conversation=""):
+    prompt = rag_index.grounded_prompt(user_input)
+    if conversation and depends_on_conversation(user_input):
+        return f"{conversation}\n\n{prompt}"
+    return prompt
+
+# Function to answer a message end to end, without streaming; returns (response, attachment)
+def respond(user_input, conversation=""):
+    with metrics.request("chat"):
+        ai_response, attachment = answer_from_campus_data(user_input)
+        if not ai_response:
+            ai_response = get_gemini_response(ai_prompt(user_input, conversation))
+    return ai_response, attachment
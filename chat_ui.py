@@ -0,0 +1,98 @@
+import os
+import pathlib
+import streamlit as st
+import chat_history
+import file_server
+import metrics
+import rag_index
+from chat_pipeline import answer_from_campus_data, ai_prompt, get_gemini_response
+from storage import get_storage
+
+# Chat page: the message history and the input box, rendering what chat_pipeline.py
+# answers. app1.py imports this module only for the chat page. Messages answered
+# from campus data never touch the Gemini SDK; it is loaded by the gateway the first
+# time a question falls through to the model.
+
+# Function to send an attachment through a Streamlit download button, when no file route is
+# reachable (app1.py run directly, without FILE_SERVER_URL). The file is read only when the
+# button is clicked, not on every rerun; key tells apart buttons of the same file in different messages.
+def render_streamlit_attachment(attachment, key):
+    local_path = get_storage().local_path(attachment["file_path"])
+    if not os.path.exists(local_path):
+        st.caption(f"{attachment['file_name']} is no longer available.")
+        return
+    if attachment["mime_type"].startswith("image/"):
+        st.image(file_server.get_thumbnail(local_path), caption=attachment["file_name"])
+        label = "🔍 Download full size"
+    else:
+        label = f"📄 Download {attachment['file_name']}"
+    st.download_button(label, pathlib.Path(local_path).read_bytes, file_name=attachment["file_name"],
+                       mime=attachment["mime_type"], on_click="ignore", key=f"attachment_{key}")
+
+# Function to render an attachment inside a chat message
+def render_attachment(attachment, key):
+    if "file_path" in attachment:
+        render_streamlit_attachment(attachment, key)
+    elif "thumbnail_url" in attachment:
+        # Images show as a server-side thumbnail, with the display copy and the original on demand
+        # (markdown, since the URL is relative to the app when serve.py mounts the file routes)
+        st.markdown(f"![{attachment['file_name']}]({attachment['thumbnail_url']})")
+        st.caption(attachment["file_name"])
+        st.markdown(f"[🔍 View full size]({attachment['url']}) · [📥 Download original]({attachment['download_url']})")
+    else:
+        # For PDFs and other files, provide a download link
+        st.link_button(f"📄 Download {attachment['file_name']}", attachment["download_url"])
+
+# Function to render the chat page for this browser session
+def render(session):
+    # Serve uploads/ to the browser directly, when configured (started once per process)
+    file_server.start()
+    # Index uploaded PDFs for grounded answers (background, once per process)
+    rag_index.start()
+
+    # Set up Streamlit UI
+    st.set_page_config(page_title="CODE AVENGERS", layout="wide")
+    st.title("🤖 Campus Buddy - AI Powered Chatbot for Smart Learning")
+
+    # Display chat history (kept in the state backend, so any worker can render it).
+    # Only the recent window renders on each rerun; archived pages are decoded on request.
+    history = chat_history.ChatHistory(session)
+    earlier_pages = min(st.session_state.get("earlier_pages_shown", 0), history.archived_page_count())
+    if earlier_pages < history.archived_page_count() and st.button("Show earlier messages"):
+        st.session_state.earlier_pages_shown = earlier_pages + 1
+        st.rerun()
+
+    shown = history.archived(earlier_pages) + history.recent()
+    for position, msg in enumerate(shown):
+        with st.chat_message(msg["role"]):
+            st.write(msg["content"])
+            if msg.get("attachment"):
+                render_attachment(msg["attachment"], position)
+
+    # User input
+    user_input = st.chat_input("Ask me anything...")
+    if not user_input:
+        return
+
+    # Summarize the conversation before this message is added, for the AI prompt
+    conversation = history.prompt_context()
+    history.add({"role": "user", "content": user_input})
+    with st.chat_message("user"):
+        st.write(user_input)
+
+    # One structured log line per message, with the time spent in each span
+    with metrics.request("chat", session=session.session_id):
+        # Answer from events, classrooms and resources first
+        ai_response, attachment = answer_from_campus_data(user_input)
+
+        with st.chat_message("assistant"):
+            if ai_response:
+                st.write(ai_response)
+                if attachment:
+                    render_attachment(attachment, len(shown) + 1)
+            else:
+                # Ground the question in matching course material, then render the answer as it arrives
+                prompt = ai_prompt(user_input, conversation)
+                ai_response = st.write_stream(get_gemini_response(prompt, stream=True))
+
+    history.add({"role": "assistant", "content": ai_response, "attachment": attachment})
@@ -0,0 +1,362 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import metrics
+
+# mysql-connector is optional when running against the SQLite stand-in
+try:
+    import mysql.connector
+    from mysql.connector import errors, pooling
+except ImportError:
+    mysql = None
+
+# "mysql" for the real database, "sqlite" for the local stand-in used by seeding and benchmarks
+DB_BACKEND = os.getenv("DB_BACKEND", "mysql").lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "campus_buddy.sqlite3")
+
+# Database settings (overridable from the environment)
+DB_CONFIG = {
+    "host": os.getenv("DB_HOST", "localhost"),
+    "user": os.getenv("DB_USER", "root"),
+    "password": os.getenv("DB_PASSWORD", "Babiazees@123"),
+    "database": os.getenv("DB_NAME", "campus_buddy"),
+}
+
+# Pool settings. mysql.connector caps a pool at 32 connections.
+POOL_NAME = "campus_buddy"
+POOL_SIZE = min(int(os.getenv("DB_POOL_SIZE", "10")), 32)
+POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "5"))
+MAX_CONNECTION_AGE = float(os.getenv("DB_MAX_CONNECTION_AGE", "1800"))
+# A checked-out connection is pinged only when it sat idle in the pool longer than this
+# (or its last statement failed); one used moments ago is handed out without a round trip
+POOL_PING_IDLE_SECONDS = float(os.getenv("DB_POOL_PING_IDLE_SECONDS", "30"))
+
+# Hot queries run through server-side prepared statements. Each one is served by an
+# index from schema.py; the LIKE patterns are prefixes built with like_prefix().
+PREPARED_QUERIES = {
+    "resource_by_name_prefix": "SELECT file_path FROM resources WHERE category=%s AND name LIKE %s ESCAPE '!' ORDER BY id LIMIT 1",
+    "resource_by_fulltext": "SELECT file_path FROM resources WHERE category=%s AND MATCH(name) AGAINST (%s IN BOOLEAN MODE) ORDER BY id LIMIT 1",
+    "resources_in_category": "SELECT id, name, file_path FROM resources WHERE category=%s",
+    "events_on_date": "SELECT event FROM calendar WHERE date=%s",
+    "classroom_by_key": "SELECT details FROM classrooms WHERE room_key=%s LIMIT 1",
+    "classroom_by_key_prefix": "SELECT details FROM classrooms WHERE room_key LIKE %s ESCAPE '!' ORDER BY room_key LIMIT 1",
+    # One upload, for its background processing job
+    "resource_by_id": "SELECT category, name, file_path, blob_digest FROM resources WHERE id=%s",
+    # Whole table, loaded once by lookup_cache
+    "all_classrooms": "SELECT room_key, details FROM classrooms WHERE room_key IS NOT NULL ORDER BY room_key, id",
+}
+
+# The pool lives in this module so it is shared by every Streamlit session in the process
+_pool = None
+_pool_lock = threading.Lock()
+
+# Per physical connection: when it was opened, when it was last handed back, and its prepared cursors
+_connection_state = {}
+_connection_state_lock = threading.Lock()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "checkouts": 0,
+    "failed_checkouts": 0,
+    "recycled_connections": 0,
+    "health_pings": 0,
+    # Checked out right now (incremented on checkout, decremented when the connection is closed)
+    "connections_in_use": 0,
+    "checkout_wait_total": 0.0,
+    "checkout_wait_max": 0.0,
+}
+
+# Function to escape LIKE wildcards in user text and turn it into a prefix pattern
+def like_prefix(text):
+    escaped = text.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+    return f"{escaped}%"
+
+
+# Function to turn user text into a FULLTEXT boolean query requiring every word as a prefix.
+# Words shorter than InnoDB's default minimum token size (3) are left out; returns "" if none remain.
+def fulltext_query(text):
+    words = [word for word in re.findall(r"[a-z0-9]+", text.lower()) if len(word) >= 3]
+    return " ".join(f"+{word}*" for word in words)
+
+
+# Thin DB-API adapters so SQLite accepts the same %s-style SQL as mysql.connector
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, operation, params=()):
+        self._cursor.execute(operation.replace("%s", "?"), params)
+
+    def executemany(self, operation, seq_params):
+        self._cursor.executemany(operation.replace("%s", "?"), seq_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=POOL_CHECKOUT_TIMEOUT, check_same_thread=False)
+
+    def cursor(self, prepared=False):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN")
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._conn.close()
+
+# Wrappers that time every statement (span "db_execute", labelled by its first keyword)
+# and forward everything else to the real cursor / connection
+class InstrumentedCursor:
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, operation, *args, **kwargs):
+        with metrics.span("db_execute", statement=operation.split(None, 1)[0].lower()):
+            try:
+                return self._cursor.execute(operation, *args, **kwargs)
+            except Exception:
+                self._connection.failed = True
+                raise
+
+    def executemany(self, operation, *args, **kwargs):
+        with metrics.span("db_execute", statement=operation.split(None, 1)[0].lower()):
+            try:
+                return self._cursor.executemany(operation, *args, **kwargs)
+            except Exception:
+                self._connection.failed = True
+                raise
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+        self._closed = False
+        # Set when a statement raised, so the next checkout pings this connection first
+        self.failed = False
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self)
+
+    # Function to hand the connection back (to the pool, or close it for SQLite); later calls do nothing
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if DB_BACKEND != "sqlite":
+            _state_for(self._conn)["released"] = 0.0 if self.failed else time.monotonic()
+        with _metrics_lock:
+            _metrics["connections_in_use"] -= 1
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+# Function to create the process-wide connection pool on first use
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Session reset is disabled because COM_RESET_CONNECTION would
+                # deallocate the prepared statements cached on each connection.
+                # Autocommit keeps reads from pinning a REPEATABLE READ snapshot that would
+                # outlive the checkout; multi-statement writes open one in transaction().
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name=POOL_NAME,
+                    pool_size=POOL_SIZE,
+                    pool_reset_session=False,
+                    autocommit=True,
+                    **DB_CONFIG
+                )
+    return _pool
+
+# Function to record checkout wait time and outcome
+def _record_checkout(started, failed=False):
+    waited = time.perf_counter() - started
+    with _metrics_lock:
+        if failed:
+            _metrics["failed_checkouts"] += 1
+        else:
+            _metrics["checkouts"] += 1
+            _metrics["connections_in_use"] += 1
+        _metrics["checkout_wait_total"] += waited
+        _metrics["checkout_wait_max"] = max(_metrics["checkout_wait_max"], waited)
+
+# Function to look up the bookkeeping for the physical connection behind a pooled one
+def _state_for(conn):
+    raw = getattr(conn, "_cnx", conn)
+    with _connection_state_lock:
+        state = _connection_state.get(id(raw))
+        if state is None or state["raw"] is not raw:
+            state = {"raw": raw, "born": time.monotonic(), "released": time.monotonic(), "cursors": {}}
+            _connection_state[id(raw)] = state
+    return state
+
+# Function to recycle a checked-out connection once it gets too old, and ping it
+# (is_connected() is a server round trip) only when it has been idle for a while
+def _ensure_healthy(conn):
+    state = _state_for(conn)
+    now = time.monotonic()
+    if now - state["born"] > MAX_CONNECTION_AGE:
+        state["cursors"].clear()
+        conn.reconnect(attempts=2, delay=0)
+        state["born"] = time.monotonic()
+        with _metrics_lock:
+            _metrics["recycled_connections"] += 1
+    elif now - state["released"] > POOL_PING_IDLE_SECONDS:
+        with _metrics_lock:
+            _metrics["health_pings"] += 1
+        if not conn.is_connected():
+            state["cursors"].clear()
+            conn.ping(reconnect=True, attempts=2, delay=0)
+            state["born"] = time.monotonic()
+
+# Database connection (checked out from the shared pool; close() hands it back)
+def get_db_connection(timeout=POOL_CHECKOUT_TIMEOUT):
+    with metrics.span("db_connect"):
+        return InstrumentedConnection(_checkout(timeout))
+
+# Function to check out (or, for SQLite, open) a healthy connection
+def _checkout(timeout):
+    started = time.perf_counter()
+    if DB_BACKEND == "sqlite":
+        # Opening a SQLite file is cheap enough that the stand-in does not pool
+        conn = SQLiteConnection(SQLITE_PATH)
+        _record_checkout(started)
+        return conn
+
+    pool = get_pool()
+    deadline = started + timeout
+
+    # The pool raises straight away when exhausted, so wait for a free slot here
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except errors.PoolError:
+            if time.perf_counter() >= deadline:
+                _record_checkout(started, failed=True)
+                raise
+            time.sleep(0.01)
+
+    try:
+        _ensure_healthy(conn)
+    except errors.Error:
+        conn.close()
+        _record_checkout(started, failed=True)
+        raise
+
+    _record_checkout(started)
+    return conn
+
+# Function to get (or prepare) the cached cursor for a hot query on this connection. The raw
+# cursor is cached per physical connection and wrapped for the current checkout, so a failure
+# marks the connection handed out now (and the next checkout pings it).
+def _prepared_cursor(conn, query_name):
+    if DB_BACKEND == "sqlite":
+        return conn.cursor()
+    cursors = _state_for(conn)["cursors"]
+    cursor = cursors.get(query_name)
+    if cursor is None:
+        cursor = conn._conn.cursor(prepared=True)
+        cursors[query_name] = cursor
+    return InstrumentedCursor(cursor, conn)
+
+# Function to run a prepared hot query and return all rows
+def fetch_all(query_name, params):
+    conn = get_db_connection()
+    try:
+        cursor = _prepared_cursor(conn, query_name)
+        cursor.execute(PREPARED_QUERIES[query_name], params)
+        return cursor.fetchall()
+    except Exception:
+        # A failed statement may leave the cached cursor unusable; prepare it again next time
+        if DB_BACKEND != "sqlite":
+            _state_for(conn)["cursors"].pop(query_name, None)
+        raise
+    finally:
+        conn.close()
+
+# Function to run a prepared hot query and return the first row (or None)
+def fetch_one(query_name, params):
+    rows = fetch_all(query_name, params)
+    return rows[0] if rows else None
+
+# Function to run a single write statement, commit it and return the new row id (if any)
+def execute_write(sql, params):
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        conn.commit()
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+# Context manager for multi-statement writes: yields a cursor, commits on success, rolls back on error
+@contextmanager
+def transaction():
+    conn = get_db_connection()
+    try:
+        conn.start_transaction()
+        cursor = conn.cursor()
+        yield cursor
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# Function to report pool metrics for the admin panel
+def get_pool_metrics():
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+
+    attempts = snapshot["checkouts"] + snapshot["failed_checkouts"]
+    snapshot["checkout_wait_avg"] = snapshot["checkout_wait_total"] / attempts if attempts else 0.0
+    snapshot["pool_size"] = POOL_SIZE
+
+    # In-use connections are counted by _record_checkout / InstrumentedConnection.close, not read from the pool
+    snapshot["idle_connections"] = POOL_SIZE - snapshot["connections_in_use"] if _pool is not None else 0
+    return snapshot
+
+metrics.register_collector("db_pool", get_pool_metrics,
+                           counters=("checkouts", "failed_checkouts", "recycled_connections", "health_pings"))
@@ -0,0 +1,321 @@
+import email.utils
+import logging
+import mimetypes
+import mmap
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, unquote, urlencode, urlsplit
+import metrics
+from storage import get_storage
+
+# Small static file endpoint for uploads/. Streamlit's download_button and image
+# widgets need the whole file in Python memory; links to this server let the
+# browser fetch files directly, with ETag revalidation and HTTP range requests.
+# Bodies are sent with os.sendfile (or an mmap where that is unavailable), so the
+# worker never holds full file contents. Files in the content-addressed blob store
+# (uploads/blobs/) never change under their name, so they use the digest as ETag and
+# are marked immutable for a year. Images are viewed through /display/, which serves the
+# downscaled copy upload_processing.py keeps next to an oversized original (uploads/.display/)
+# and the original itself otherwise; /files/ always serves the original upload.
+# Links to it are only handed out when FILE_SERVER_URL says how browsers reach it (a
+# public host:port, or a path the reverse proxy forwards here). There is no default, as
+# a guessed localhost URL only works on the machine running the app. The same routes can
+# instead be mounted on the Streamlit server itself (streamlit run serve.py, see
+# app_routes()), which serves them on the app's own origin under /uploads-files/; with
+# neither, chat_ui.py falls back to Streamlit download buttons.
+# The server has no authentication, so it listens on 127.0.0.1 unless FILE_SERVER_HOST
+# says otherwise, is only started when FILE_SERVER_URL or FILE_SERVER_PORT is set, and
+# never serves generated folders (.text/, .thumbnails/, ...) or partial writes (.part).
+# GET /metrics returns this process's metrics (metrics.py) in the Prometheus text format.
+# When several workers share a host only the one holding FILE_SERVER_PORT answers it, so
+# give each worker its own FILE_SERVER_PORT when every worker should be scraped.
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_DIR = os.path.abspath(os.getenv("UPLOADS_DIR") or get_storage().local_path("uploads"))
+THUMBNAIL_DIR = os.path.join(UPLOADS_DIR, ".thumbnails")
+THUMBNAIL_SIZE = (640, 640)
+DISPLAY_DIR = os.path.join(UPLOADS_DIR, ".display")
+
+FILE_SERVER_HOST = os.getenv("FILE_SERVER_HOST", "127.0.0.1")
+FILE_SERVER_PORT = int(os.getenv("FILE_SERVER_PORT", "8502"))
+# Public address browsers use to reach this server, e.g. https://campus.example.edu/uploads-server
+FILE_SERVER_URL = os.getenv("FILE_SERVER_URL", "").rstrip("/")
+# Path of the same routes on the Streamlit server when serve.py mounts them (relative, so
+# it resolves against the app's own URL)
+APP_ROUTE_PREFIX = "uploads-files"
+
+CHUNK_SIZE = 1024 * 1024
+CACHE_MAX_AGE = 3600
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+_server = None
+_server_lock = threading.Lock()
+# Set by app_routes() when the routes are mounted on the Streamlit server in this process
+_app_routes_mounted = False
+_thumbnail_lock = threading.Lock()
+
+# Function to map a stored path like uploads/x.pdf to its path relative to uploads/
+def _relative_path(file_path):
+    return os.path.relpath(get_storage().local_path(file_path), UPLOADS_DIR).replace(os.sep, "/")
+
+# Function to tell whether browsers can be sent to these routes (FILE_SERVER_URL is set, or serve.py mounted them)
+def links_enabled():
+    return bool(FILE_SERVER_URL) or _app_routes_mounted
+
+def _public_url():
+    if FILE_SERVER_URL:
+        return FILE_SERVER_URL
+    if _app_routes_mounted:
+        return APP_ROUTE_PREFIX
+    raise RuntimeError("FILE_SERVER_URL is not set, so browsers have no address for the file server")
+
+# Function to build the browser URL for a stored file (file_name sets the download name)
+def file_url(file_path, download=False, file_name=None):
+    url = f"{_public_url()}/files/{quote(_relative_path(file_path))}"
+    query = {}
+    if download:
+        query["download"] = "1"
+    if file_name:
+        query["name"] = file_name
+    return f"{url}?{urlencode(query)}" if query else url
+
+# Function to build the browser URL for an image thumbnail
+def thumbnail_url(file_path):
+    return f"{_public_url()}/thumbnails/{quote(_relative_path(file_path))}"
+
+# Function to build the browser URL for viewing an image (its display copy when it has one)
+def display_url(file_path):
+    return f"{_public_url()}/display/{quote(_relative_path(file_path))}"
+
+# Function to resolve a request path inside uploads/, refusing anything that escapes it,
+# generated folders (.text/, .display/, .thumbnails/, ...) and partial writes (.part)
+def _resolve(relative):
+    full_path = os.path.realpath(os.path.join(UPLOADS_DIR, unquote(relative)))
+    if not full_path.startswith(UPLOADS_DIR + os.sep) or not os.path.isfile(full_path):
+        return None
+    parts = os.path.relpath(full_path, UPLOADS_DIR).split(os.sep)
+    if any(part.startswith(".") for part in parts) or full_path.endswith(".part"):
+        return None
+    return full_path
+
+# Function to find the file a route serves for a request path; returns (full path, immutable) or None
+def _lookup(route, relative):
+    full_path = _resolve(relative) if route in ("files", "thumbnails", "display") else None
+    if full_path is None:
+        return None
+    if route == "thumbnails":
+        full_path = get_thumbnail(full_path)
+    elif route == "display":
+        full_path = get_display(full_path)
+    # /display/ falls back to the original until the copy is written, so only the copy is final
+    immutable = relative.startswith("blobs/") and (route != "display" or full_path.startswith(DISPLAY_DIR + os.sep))
+    return full_path, immutable
+
+# Function to build the ETag of a served file: blob names are content digests (thumbnails
+# of blobs are derived from them), other files change with their size and mtime
+def _etag(full_path, immutable, stat):
+    if immutable:
+        return f'"{os.path.splitext(os.path.basename(full_path))[0]}"'
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+def _cache_control(immutable):
+    if immutable:
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={CACHE_MAX_AGE}"
+
+# Function to get the display copy of an image when upload processing made one, else the original
+def get_display(full_path):
+    display_path = os.path.join(DISPLAY_DIR, os.path.relpath(full_path, UPLOADS_DIR))
+    return display_path if os.path.isfile(display_path) else full_path
+
+# Function to create (once) a downscaled JPEG copy of an image; falls back to the original
+def get_thumbnail(full_path):
+    relative = os.path.relpath(full_path, UPLOADS_DIR)
+    thumb_path = os.path.join(THUMBNAIL_DIR, os.path.splitext(relative)[0] + ".jpg")
+    # Decoding the display copy is much cheaper than a full-size phone photo
+    source_path = get_display(full_path)
+    if os.path.exists(thumb_path) and os.path.getmtime(thumb_path) >= os.path.getmtime(source_path):
+        return thumb_path
+
+    try:
+        from PIL import Image
+    except ImportError:
+        return source_path
+
+    with _thumbnail_lock:
+        os.makedirs(os.path.dirname(thumb_path), exist_ok=True)
+        with Image.open(source_path) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            image.convert("RGB").save(thumb_path + ".tmp", "JPEG", quality=80, optimize=True)
+        os.replace(thumb_path + ".tmp", thumb_path)
+    return thumb_path
+
+# Function to parse a single "bytes=" range header into (start, end) or "invalid"
+def _parse_range(header, size):
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            start = max(size - int(end_text), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        return "invalid"
+    return start, min(end, size - 1)
+
+
+class UploadRequestHandler(BaseHTTPRequestHandler):
+    server_version = "CampusBuddyFiles/1.0"
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _serve(self, send_body):
+        url = urlsplit(self.path)
+        if url.path == "/metrics":
+            self._serve_metrics(send_body)
+            return
+        route, _, relative = url.path.lstrip("/").partition("/")
+        found = _lookup(route, relative)
+        if found is None:
+            self.send_error(404)
+            return
+
+        full_path, immutable = found
+        stat = os.stat(full_path)
+        etag = _etag(full_path, immutable, stat)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        size = stat.st_size
+        byte_range = _parse_range(self.headers.get("Range"), size)
+        if byte_range == "invalid":
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.end_headers()
+            return
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            start, end = 0, size - 1
+            self.send_response(200)
+
+        content_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+        query = parse_qs(url.query)
+        disposition = "attachment" if "download" in query else "inline"
+        download_name = query.get("name", [os.path.basename(full_path)])[0].replace('"', "")
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.send_header("Content-Disposition", f"{disposition}; filename=\"{download_name.encode('ascii', 'replace').decode()}\"; filename*=UTF-8''{quote(download_name)}")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(stat.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", _cache_control(immutable))
+        self.end_headers()
+
+        if send_body and size:
+            try:
+                with metrics.span("file_serve", route=route):
+                    self._send_bytes(full_path, start, end - start + 1)
+            except (BrokenPipeError, ConnectionResetError):
+                # Browsers routinely abort range requests for PDFs they already have
+                pass
+
+    def _serve_metrics(self, send_body):
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _send_bytes(self, full_path, offset, count):
+        self.wfile.flush()
+        with open(full_path, "rb") as f:
+            if hasattr(os, "sendfile"):
+                while count > 0:
+                    sent = os.sendfile(self.connection.fileno(), f.fileno(), offset, min(count, CHUNK_SIZE))
+                    if sent == 0:
+                        break
+                    offset += sent
+                    count -= sent
+                return
+
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    while count > 0:
+                        chunk = min(count, CHUNK_SIZE)
+                        self.wfile.write(view[offset:offset + chunk])
+                        offset += chunk
+                        count -= chunk
+                finally:
+                    view.release()
+
+
+# Function to build Starlette routes serving /files/, /display/ and /thumbnails/ on the Streamlit
+# server's own origin (serve.py passes them to st.App). FileResponse streams the file from disk
+# in chunks and answers range requests, so nothing is read into memory up front.
+def app_routes():
+    global _app_routes_mounted
+    from starlette.responses import FileResponse, Response
+    from starlette.routing import Route
+
+    def serve_upload(request):
+        found = _lookup(request.path_params["route"], request.path_params["path"])
+        if found is None:
+            return Response(status_code=404)
+        full_path, immutable = found
+        stat = os.stat(full_path)
+        headers = {"ETag": _etag(full_path, immutable, stat), "Cache-Control": _cache_control(immutable)}
+        if request.headers.get("If-None-Match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+        return FileResponse(full_path, headers=headers, stat_result=stat,
+                            media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+                            filename=request.query_params.get("name", os.path.basename(full_path)),
+                            content_disposition_type="attachment" if "download" in request.query_params else "inline")
+
+    _app_routes_mounted = True
+    return [Route(f"/{APP_ROUTE_PREFIX}/{{route}}/{{path:path}}", serve_upload, methods=["GET", "HEAD"])]
+
+# Function to start the file server once per process (Streamlit re-runs the script, not the module);
+# it only runs when configured, as the routes may be served by the Streamlit server instead
+def start():
+    global _server
+    with _server_lock:
+        if _server is not None:
+            return _server
+        if not FILE_SERVER_URL and "FILE_SERVER_PORT" not in os.environ:
+            _server = False
+            return _server
+        try:
+            _server = ThreadingHTTPServer((FILE_SERVER_HOST, FILE_SERVER_PORT), UploadRequestHandler)
+        except OSError:
+            # Another worker on this host already serves uploads/ on the port
+            logger.info("File server port %s in use; assuming it is served elsewhere", FILE_SERVER_PORT)
+            _server = False
+            return _server
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="file-server", daemon=True).start()
+        return _server
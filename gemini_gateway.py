@@ -0,0 +1,356 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import metrics
+
+# Gateway in front of the Gemini API shared by every session in the process:
+#   - one configured model client, reused for every call
+#   - a bounded thread pool, so generations run off the Streamlit script thread
+#     with a timeout and at most GEMINI_MAX_CONCURRENCY calls upstream at once
+#   - an LRU+TTL cache keyed on the normalized prompt
+#   - coalescing: identical prompts already in flight share one upstream call,
+#     both for generate() and for stream()
+#   - streaming: chunks are handed to the caller as they arrive, with
+#     time-to-first-token tracked separately from total latency
+# The google.generativeai SDK takes about a second to import, so it is only loaded
+# when the first real backend is created (the first question that needs the model).
+# Set GEMINI_BACKEND=stub to run against a local stand-in instead of the real API.
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-1.5-pro")
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "60"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "4"))
+GEMINI_CACHE_SIZE = int(os.getenv("GEMINI_CACHE_SIZE", "512"))
+GEMINI_CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+
+# Number of recent calls kept for the latency percentiles
+TIMING_WINDOW = 500
+
+# Function to count the tokens one upstream call used (exported as gemini_tokens_total)
+def record_token_usage(prompt_tokens, output_tokens):
+    metrics.inc("gemini_tokens_total", prompt_tokens, kind="prompt")
+    metrics.inc("gemini_tokens_total", output_tokens, kind="output")
+
+# Function to read the usage metadata of a Gemini response, if the API returned it
+def _record_response_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        record_token_usage(getattr(usage, "prompt_token_count", 0) or 0,
+                           getattr(usage, "candidates_token_count", 0) or 0)
+
+
+class GeminiBackend:
+    def __init__(self, api_key, model_name=GEMINI_MODEL):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt):
+        response = self.model.generate_content(prompt)
+        _record_response_usage(response)
+        return response.text
+
+    def stream(self, prompt):
+        response = self.model.generate_content(prompt, stream=True)
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        # Usage covers the whole answer once the stream has been drained
+        _record_response_usage(response)
+
+
+# Local stand-in for the Gemini API: answers after an optional delay and counts calls
+class StubBackend:
+    def __init__(self, latency=0.0, responder=None, chunk_latency=0.0):
+        self.latency = latency
+        self.chunk_latency = chunk_latency
+        self.responder = responder or (lambda prompt: f"[stub answer] {prompt}")
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate(self, prompt):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        text = self.responder(prompt)
+        # Words stand in for tokens, so load tests exercise the usage metric
+        record_token_usage(len(prompt.split()), len(text.split()))
+        return text
+
+    # Streams the same answer word by word: first chunk after `latency`, then one per `chunk_latency`
+    def stream(self, prompt):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        words = self.responder(prompt).split(" ")
+        record_token_usage(len(prompt.split()), len(words))
+        for position, word in enumerate(words):
+            if position and self.chunk_latency:
+                time.sleep(self.chunk_latency)
+            yield word if position == len(words) - 1 else word + " "
+
+
+class TTLCache:
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# One upstream stream shared by every caller streaming the same prompt: the chunks so far,
+# how many callers are still reading, and how it ended
+class _SharedStream:
+    def __init__(self):
+        self.chunks = []
+        self.consumers = 0
+        self.done = False
+        self.abandoned = False
+        self.error = None
+        self.condition = threading.Condition()
+
+
+# Function to normalize a prompt into a cache key ("What is DBMS? " -> "what is dbms")
+def normalize_prompt(prompt):
+    return " ".join(prompt.lower().split()).rstrip("?!. ")
+
+
+class GeminiGateway:
+    def __init__(self, backend, max_concurrency=GEMINI_MAX_CONCURRENCY, timeout=GEMINI_TIMEOUT,
+                 cache_size=GEMINI_CACHE_SIZE, cache_ttl=GEMINI_CACHE_TTL):
+        self.backend = backend
+        self.timeout = timeout
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="gemini")
+        self._inflight = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._stats = {"cache_hits": 0, "cache_misses": 0, "coalesced": 0, "upstream_calls": 0, "errors": 0, "timeouts": 0}
+        self._timings = {"time_to_first_token": deque(maxlen=TIMING_WINDOW), "total_latency": deque(maxlen=TIMING_WINDOW)}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _record(self, timing, started):
+        with self._lock:
+            self._timings[timing].append(time.perf_counter() - started)
+
+    def _finish(self, key, future):
+        # Cache and retire the in-flight entry together so no caller slips in between
+        with self._lock:
+            if not future.cancelled() and future.exception() is None:
+                self.cache.set(key, future.result())
+            elif not future.cancelled():
+                self._stats["errors"] += 1
+            self._inflight.pop(key, None)
+
+    def _call(self, prompt):
+        self._count("upstream_calls")
+        started = time.perf_counter()
+        text = self.backend.generate(prompt)
+        self._record("total_latency", started)
+        return text
+
+    # Function to start (or join) a generation and return a Future for its text
+    def submit(self, prompt):
+        key = normalize_prompt(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            future = Future()
+            future.set_result(cached)
+            return future
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                return future
+            self._stats["cache_misses"] += 1
+            future = self._executor.submit(self._call, prompt)
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    # Blocking call with a timeout; the upstream call keeps running for other waiters
+    def generate(self, prompt, timeout=None):
+        try:
+            return self.submit(prompt).result(timeout=timeout or self.timeout)
+        except FutureTimeoutError:
+            self._count("timeouts")
+            raise TimeoutError(f"Gemini did not answer within {timeout or self.timeout} s") from None
+
+    # asyncio entry point for callers running an event loop. The shield keeps a timeout
+    # here from cancelling a call that coalesced callers are still waiting on.
+    async def agenerate(self, prompt, timeout=None):
+        future = asyncio.wrap_future(self.submit(prompt))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._count("timeouts")
+            raise TimeoutError(f"Gemini did not answer within {timeout or self.timeout} s") from None
+
+    # Generator yielding text chunks as they arrive. The upstream stream is drained on
+    # the gateway's pool (so concurrency stays bounded) into a shared chunk buffer:
+    # identical prompts streamed at the same time read the same buffer instead of
+    # starting their own upstream call. The full text is cached once the stream completes.
+    def stream(self, prompt, timeout=None):
+        timeout = timeout or self.timeout
+        key = normalize_prompt(prompt)
+        started = time.perf_counter()
+
+        cached = self.cache.get(key)
+        if cached is not None:
+            self._count("cache_hits")
+            self._record("time_to_first_token", started)
+            self._record("total_latency", started)
+            yield cached
+            return
+
+        with self._lock:
+            shared = self._streams.get(key)
+            if shared is None:
+                self._stats["cache_misses"] += 1
+                shared = self._streams[key] = _SharedStream()
+                # Counted as a reader before the producer can look
+                shared.consumers = 1
+                self._executor.submit(self._produce, key, prompt, shared)
+            else:
+                self._stats["coalesced"] += 1
+                with shared.condition:
+                    shared.consumers += 1
+
+        deadline = started + timeout
+        position = 0
+        try:
+            while True:
+                with shared.condition:
+                    while position == len(shared.chunks) and not shared.done:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            self._count("timeouts")
+                            raise TimeoutError(f"Gemini did not finish within {timeout} s")
+                        shared.condition.wait(remaining)
+                    chunks = shared.chunks[position:]
+                    done = shared.done
+                if chunks and not position:
+                    self._record("time_to_first_token", started)
+                for chunk in chunks:
+                    yield chunk
+                position += len(chunks)
+                if done and position == len(shared.chunks):
+                    break
+            if shared.error is not None:
+                raise shared.error
+            self._record("total_latency", started)
+        finally:
+            # Timed out, failed, finished or abandoned by the caller: stop reading for it
+            with shared.condition:
+                shared.consumers -= 1
+
+    # Function run on the pool: drain one upstream stream into its shared buffer. Once every
+    # reader has gone, it stops at the next chunk so the pool slot is not held until the end.
+    def _produce(self, key, prompt, shared):
+        upstream = None
+        try:
+            with shared.condition:
+                # Every reader gave up while this call waited for a free slot
+                shared.abandoned = shared.consumers == 0
+            if shared.abandoned:
+                return
+            self._count("upstream_calls")
+            upstream = self.backend.stream(prompt)
+            for chunk in upstream:
+                with shared.condition:
+                    if shared.consumers == 0:
+                        shared.abandoned = True
+                        break
+                    shared.chunks.append(chunk)
+                    shared.condition.notify_all()
+        except Exception as error:
+            shared.error = error
+            self._count("errors")
+        finally:
+            if upstream is not None and hasattr(upstream, "close"):
+                upstream.close()
+            # Cache and retire the in-flight entry together so no caller slips in between
+            with self._lock:
+                if shared.error is None and not shared.abandoned:
+                    self.cache.set(key, "".join(shared.chunks))
+                self._streams.pop(key, None)
+            with shared.condition:
+                shared.done = True
+                shared.condition.notify_all()
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["in_flight"] = len(self._inflight) + len(self._streams)
+            timings = {name: sorted(samples) for name, samples in self._timings.items()}
+        snapshot["cached_prompts"] = len(self.cache)
+        for name, samples in timings.items():
+            for label, fraction in (("p50", 0.5), ("p95", 0.95)):
+                value = samples[min(len(samples) - 1, int(fraction * len(samples)))] if samples else 0.0
+                snapshot[f"{name}_{label}_ms"] = value * 1000
+        return snapshot
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+# Function to build the backend selected by GEMINI_BACKEND
+def create_backend():
+    if os.getenv("GEMINI_BACKEND", "gemini").lower() == "stub":
+        return StubBackend(latency=float(os.getenv("GEMINI_STUB_LATENCY", "0")),
+                           chunk_latency=float(os.getenv("GEMINI_STUB_CHUNK_LATENCY", "0")))
+    return GeminiBackend(os.getenv("GEMINI_API_KEY"))
+
+# Function to get the process-wide gateway, creating it on first use
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = GeminiGateway(create_backend())
+    return _gateway
+
+# Function to get the gateway's stats without creating it (empty until this process has called Gemini)
+def gateway_stats():
+    return _gateway.stats() if _gateway is not None else {}
+
+metrics.register_collector("gemini", gateway_stats,
+                           counters=("cache_hits", "cache_misses", "coalesced", "upstream_calls", "errors", "timeouts"))
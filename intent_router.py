@@ -0,0 +1,149 @@
+import re
+from collections import namedtuple
+
+# Precompiled intent router for chat messages.
+# The message is tokenized once and keyword phrases (at most three tokens) are found
+# in a single pass: at each token that can start a phrase, its 3-, 2- and 1-token
+# n-grams are looked up in a dict and the longest hit is kept. When several phrases
+# match, the longest one wins ("exam timetable" beats "timetable"), and because matching
+# is per token, "class" no longer fires inside "classroom" or "it" inside "with".
+
+INTENT_TODAYS_EVENTS = "todays_events"
+INTENT_CLASSROOM = "classroom"
+INTENT_RESOURCE = "resource"
+INTENT_EDUCATIONAL = "educational"
+INTENT_LLM = "llm"
+
+# intent, resource category (if any), text left over for the lookup, phrase that decided it
+Route = namedtuple("Route", ["intent", "category", "query", "matched"])
+# A phrase found in the message: its length in tokens and characters and its first token's position
+Match = namedtuple("Match", ["tokens", "chars", "position", "phrase"])
+
+CLASSROOM = "classroom"
+
+# Phrase -> resource category, or CLASSROOM for the classroom details lookup
+PHRASES = {
+    "pdf": "PDFs",
+    "pdfs": "PDFs",
+    "timetable": "Class Timetables",
+    "timetables": "Class Timetables",
+    "time table": "Class Timetables",
+    "time tables": "Class Timetables",
+    "class timetable": "Class Timetables",
+    "class time table": "Class Timetables",
+    "class schedule": "Class Timetables",
+    "schedule": "Class Timetables",
+    "schedules": "Class Timetables",
+    "event schedule": "Event Schedules",
+    "event schedules": "Event Schedules",
+    "event": "Event Schedules",
+    "events": "Event Schedules",
+    "exam timetable": "Exam Timetables",
+    "exam timetables": "Exam Timetables",
+    "exam schedule": "Exam Timetables",
+    "exam time table": "Exam Timetables",
+    "examination": "Exam Timetables",
+    "examinations": "Exam Timetables",
+    "classroom": CLASSROOM,
+    "classrooms": CLASSROOM,
+    "room": CLASSROOM,
+    "rooms": CLASSROOM,
+    "class": CLASSROOM,
+    "holidays": "Working Days & Holidays",
+    "holiday": "Working Days & Holidays",
+    "working days": "Working Days & Holidays",
+    "calendar": "Working Days & Holidays",
+}
+
+TODAY_TERMS = {"today", "todays"}
+TODAY_TOPIC_TERMS = {"event", "events", "schedule", "schedules"}
+
+# Messages without a category phrase but with these terms are treated as timetable requests
+EDUCATIONAL_TERMS = {"semester", "semesters", "sem", "year", "course", "branch", "department",
+                     "cse", "ece", "mech", "civil"}
+# The IT branch only counts when written in capitals, so the pronoun "it" does not
+IT_BRANCH_RE = re.compile(r"\bIT\b")
+EXAM_TERMS = {"exam", "exams", "final", "finals", "mid", "mids", "midterm", "midterms", "test", "tests"}
+
+# Tokens are runs of [a-z0-9]; splitting with a group keeps the separators between them
+# (at even positions) so matched tokens can be cut out of the message as written
+SPLIT_RE = re.compile(r"([a-z0-9]+)")
+
+# Phrase lengths in tokens (1 to 3, longest first) by the token each phrase starts with
+PHRASE_LENGTHS = {}
+for _phrase in PHRASES:
+    _tokens = _phrase.split()
+    PHRASE_LENGTHS.setdefault(_tokens[0], set()).add(len(_tokens))
+PHRASE_LENGTHS = {token: tuple(sorted(lengths, reverse=True)) for token, lengths in PHRASE_LENGTHS.items()}
+
+
+# Function to find the longest phrase starting at each token; returns a list of Match
+def find_phrases(tokens):
+    matches = []
+    token_count = len(tokens)
+    for position, token in enumerate(tokens):
+        lengths = PHRASE_LENGTHS.get(token)
+        if lengths is None:
+            continue
+        for length in lengths:
+            if length == 1:
+                matches.append(Match(1, len(token), position, token))
+                break
+            end = position + length
+            if end <= token_count:
+                phrase = " ".join(tokens[position:end])
+                if phrase in PHRASES:
+                    matches.append(Match(length, len(phrase), position, phrase))
+                    break
+    return matches
+
+# Function to rank a match: most tokens, then most characters, then the earliest in the message
+def _match_rank(match):
+    return match.tokens, match.chars, -match.position
+
+# Function to remove the given matches from the message, keeping everything else as written
+def _strip_matches(tokens, parts, matches):
+    if parts is None and len(matches) == 1:
+        # Only spaces between tokens, so the query is the tokens that are left
+        match = matches[0]
+        return " ".join(tokens[:match.position] + tokens[match.position + match.tokens:])
+    if parts is None:
+        pieces, step, offset, joiner = list(tokens), 1, 0, " "
+    else:
+        # Tokens sit at odd positions of parts; a phrase's inner separators go with it
+        pieces, step, offset, joiner = list(parts), 2, 1, ""
+    for match in matches:
+        start = step * match.position + offset
+        width = step * (match.tokens - 1) + 1
+        pieces[start:start + width] = [""] * width
+    return " ".join(joiner.join(pieces).split())
+
+# Function to resolve a chat message to a Route in one pass over its tokens
+def route(message):
+    text = message.lower()
+    # Most messages are plain words and spaces, which str.split tokenizes without the regex;
+    # parts (separators and tokens) is only needed when anything else sits between tokens
+    if text.isascii() and text.replace(" ", "").isalnum():
+        tokens, parts = text.split(), None
+    else:
+        parts = SPLIT_RE.split(text)
+        tokens = parts[1::2]
+
+    if "today" in text and not TODAY_TERMS.isdisjoint(tokens) and not TODAY_TOPIC_TERMS.isdisjoint(tokens):
+        return Route(INTENT_TODAYS_EVENTS, None, text.strip(), "today")
+
+    matches = find_phrases(tokens)
+    if matches:
+        best = max(matches, key=_match_rank)
+        phrase = best.phrase
+        category = PHRASES[phrase]
+        if category == CLASSROOM:
+            classroom_matches = [match for match in matches if PHRASES[match.phrase] == CLASSROOM]
+            return Route(INTENT_CLASSROOM, None, _strip_matches(tokens, parts, classroom_matches), phrase)
+        return Route(INTENT_RESOURCE, category, _strip_matches(tokens, parts, [best]), phrase)
+
+    if not EDUCATIONAL_TERMS.isdisjoint(tokens) or ("IT" in message and IT_BRANCH_RE.search(message)):
+        category = "Exam Timetables" if not EXAM_TERMS.isdisjoint(tokens) else "Class Timetables"
+        return Route(INTENT_EDUCATIONAL, category, message, None)
+
+    return Route(INTENT_LLM, None, message, None)
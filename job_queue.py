@@ -0,0 +1,301 @@
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import db
+import metrics
+import signals
+
+# Persistent background jobs for work that should not run inside a Streamlit request,
+# such as upload post-processing (upload_processing.py).
+# Jobs are rows in the jobs table (schema migration 5), so they survive restarts and
+# any number of processes can work the same queue. A process claims a job by moving
+# it from "queued" to "running" with a conditional UPDATE; only one claimer wins.
+# Claimed jobs run on a pool of JOB_WORKERS worker processes, so CPU-heavy steps
+# use every core. A job that raises is retried with exponential backoff, up to its
+# max_attempts, before it is marked failed. A handler raises JobRejected when a
+# retry cannot help (a file that fails validation). A job left "running" by a
+# process that died is queued again once its lease expires.
+#
+# Job statuses: queued -> running -> done | failed | rejected (or back to queued for a retry)
+#
+#   python job_queue.py work      work the queue in the foreground (extra or dedicated workers)
+#   python job_queue.py status    job counts by status
+#
+# The app works the queue from each of its processes unless JOB_RUN_IN_APP=0, which
+# leaves the jobs to dedicated `python job_queue.py work` processes.
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = max(int(os.getenv("JOB_WORKERS", str(os.cpu_count() or 2))), 1)
+JOB_RUN_IN_APP = os.getenv("JOB_RUN_IN_APP", "1") != "0"
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# First retry after this many seconds, doubling with every further attempt
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "2"))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "900"))
+# Finished (done) jobs are deleted after this long; failed and rejected jobs are kept for the admin
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+
+# Job kind -> "module.function" run in a worker process as function(resource_id, payload)
+HANDLERS = {
+    "process_upload": "upload_processing.process_upload",
+}
+
+WORKER_NAME = f"{socket.gethostname()}:{os.getpid()}"
+
+_wake = threading.Event()
+_running = {}
+_running_lock = threading.Lock()
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+class JobRejected(Exception):
+    # Raised by a handler when retrying cannot help; the job ends as "rejected".
+    # Both values travel in args so the exception survives the trip back from the worker process.
+    def __init__(self, reason, signals=()):
+        super().__init__(reason, list(signals))
+
+    @property
+    def signals(self):
+        return self.args[1]
+
+    def __str__(self):
+        return self.args[0]
+
+
+# Function to queue a job inside the caller's transaction (so it only exists if the write commits)
+def enqueue(cursor, kind, resource_id=None, payload=None, max_attempts=JOB_MAX_ATTEMPTS):
+    now = int(time.time())
+    cursor.execute("INSERT INTO jobs (kind, resource_id, payload, status, attempts, max_attempts, run_after, created_at, updated_at) "
+                   "VALUES (%s, %s, %s, 'queued', 0, %s, 0, %s, %s)",
+                   (kind, resource_id, json.dumps(payload or {}), max_attempts, now, now))
+    return cursor.lastrowid
+
+# Statement queueing one job per resources row inserted after a known id with one of the given
+# blob digests, with the row's name as payload ({"name": ...}, as enqueue() callers pass it)
+ENQUEUE_FOR_RESOURCES_SQL = ("INSERT INTO jobs (kind, resource_id, payload, status, attempts, max_attempts, run_after, created_at, updated_at) "
+                             "SELECT %s, id, {payload}, 'queued', 0, %s, 0, %s, %s FROM resources "
+                             "WHERE id > %s AND blob_digest IN ({digests})")
+JSON_PAYLOAD_SQL = {"mysql": "JSON_OBJECT('name', name)", "sqlite": "json_object('name', name)"}
+
+# Function to queue one job per resource a batch insert just added (rows after after_id holding
+# one of digests) in one statement, inside the caller's transaction; returns the number queued
+def enqueue_for_resources(cursor, kind, after_id, digests, max_attempts=JOB_MAX_ATTEMPTS):
+    now = int(time.time())
+    digests = sorted(set(digests))
+    sql = ENQUEUE_FOR_RESOURCES_SQL.format(payload=JSON_PAYLOAD_SQL[db.DB_BACKEND], digests=", ".join(["%s"] * len(digests)))
+    cursor.execute(sql, [kind, max_attempts, now, now, after_id] + digests)
+    return cursor.rowcount
+
+# Function to make this process's dispatcher look for new jobs now instead of at its next poll
+def notify():
+    _wake.set()
+
+# Function to claim up to `limit` due jobs for this process: [(id, kind, resource_id, payload, attempts, max_attempts)]
+def claim(limit):
+    if limit <= 0:
+        return []
+    now = int(time.time())
+    claimed = []
+    with db.transaction() as cursor:
+        cursor.execute("SELECT id, kind, resource_id, payload, attempts, max_attempts FROM jobs "
+                       "WHERE status='queued' AND run_after <= %s ORDER BY id LIMIT %s", (now, limit))
+        for job_id, kind, resource_id, payload, attempts, max_attempts in cursor.fetchall():
+            # Another process may have claimed it since the SELECT; the status condition settles it
+            cursor.execute("UPDATE jobs SET status='running', attempts=attempts+1, locked_by=%s, locked_at=%s, updated_at=%s "
+                           "WHERE id=%s AND status='queued'", (WORKER_NAME, now, now, job_id))
+            if cursor.rowcount == 1:
+                claimed.append((job_id, kind, resource_id, json.loads(payload or "{}"), attempts + 1, max_attempts))
+    return claimed
+
+# Function to put jobs whose lease expired (their process died mid-job) back in the queue
+def requeue_expired():
+    now = int(time.time())
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE jobs SET status='queued', locked_by=NULL, updated_at=%s "
+                       "WHERE status='running' AND locked_at < %s", (now, now - JOB_LEASE_SECONDS))
+        return cursor.rowcount
+
+# Function to delete done jobs older than JOB_RETENTION_SECONDS
+def purge_finished():
+    db.execute_write("DELETE FROM jobs WHERE status='done' AND updated_at < %s",
+                     (int(time.time()) - JOB_RETENTION_SECONDS,))
+
+# Function run in a worker process: import the handler and run it
+def run_job(kind, resource_id, payload):
+    module_name, _, function_name = HANDLERS[kind].rpartition(".")
+    handler = getattr(importlib.import_module(module_name), function_name)
+    return handler(resource_id, payload)
+
+# Function to record a job's outcome, schedule its retry, and announce what changed
+def _finish(job, future, started):
+    job_id, kind, resource_id, payload, attempts, max_attempts = job
+    now = int(time.time())
+    error = future.exception()
+    result = None
+    if error is None:
+        result = future.result() or {}
+        status = "done"
+        db.execute_write("UPDATE jobs SET status='done', locked_by=NULL, last_error=NULL, updated_at=%s WHERE id=%s",
+                         (now, job_id))
+    else:
+        message = "".join(traceback.format_exception_only(type(error), error)).strip()
+        if isinstance(error, JobRejected):
+            status = "rejected"
+            message = str(error)
+            result = {"signals": error.signals}
+        elif attempts < max_attempts:
+            status = "queued"
+        else:
+            status = "failed"
+        run_after = now + int(JOB_RETRY_DELAY * 2 ** (attempts - 1)) if status == "queued" else 0
+        db.execute_write("UPDATE jobs SET status=%s, locked_by=NULL, last_error=%s, run_after=%s, updated_at=%s WHERE id=%s",
+                         (status, message[:2000], run_after, now, job_id))
+        log = logger.warning if status == "queued" else logger.error
+        log("Job %s (%s, resource %s) attempt %s/%s: %s", job_id, kind, resource_id, attempts, max_attempts, message)
+
+    metrics.observe("job_seconds", time.perf_counter() - started, kind=kind, status=status)
+    metrics.inc("jobs_finished_total", kind=kind, status=status)
+    # Handlers run in other processes, so their signals are published here on their behalf
+    for topic, signal_payload in (result or {}).get("signals", []):
+        signals.publish(topic, **signal_payload)
+
+def _on_done(job, started):
+    def callback(future):
+        try:
+            _finish(job, future, started)
+        except Exception:
+            logger.exception("Could not record the outcome of job %s", job[0])
+        finally:
+            with _running_lock:
+                _running.pop(job[0], None)
+            _wake.set()
+    return callback
+
+# Function to work the queue until `stop` is set: claim due jobs whenever a worker process is free
+def work(stop=None, workers=JOB_WORKERS):
+    stop = stop or threading.Event()
+    # Spawned (not forked) workers: the app process runs threads that must not be copied mid-operation
+    context = multiprocessing.get_context("spawn")
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    last_maintenance = 0.0
+    try:
+        while not stop.is_set():
+            try:
+                if time.monotonic() - last_maintenance > JOB_LEASE_SECONDS / 10:
+                    last_maintenance = time.monotonic()
+                    requeue_expired()
+                    purge_finished()
+                with _running_lock:
+                    free = workers - len(_running)
+                for job in claim(free):
+                    started = time.perf_counter()
+                    with _running_lock:
+                        _running[job[0]] = started
+                    try:
+                        future = executor.submit(run_job, job[1], job[2], job[3])
+                    except BrokenProcessPool:
+                        # A worker process died and took the pool with it; start a fresh pool
+                        executor.shutdown(wait=False)
+                        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+                        future = executor.submit(run_job, job[1], job[2], job[3])
+                    future.add_done_callback(_on_done(job, started))
+            except Exception:
+                logger.exception("Job dispatcher iteration failed")
+            _wake.wait(JOB_POLL_INTERVAL)
+            _wake.clear()
+    finally:
+        executor.shutdown(wait=True)
+
+# Function to start working the queue in the background once per process (the app calls this on every rerun)
+def start():
+    global _dispatcher
+    if not JOB_RUN_IN_APP or _dispatcher is not None:
+        return
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = threading.Thread(target=work, name="job-dispatcher", daemon=True)
+            _dispatcher.start()
+
+# Function to get the newest job of each resource: {resource_id: {"status", "attempts", "last_error"}}
+def latest_jobs(resource_ids):
+    if not resource_ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(resource_ids))
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT resource_id, status, attempts, last_error FROM jobs "
+                       f"WHERE resource_id IN ({placeholders}) ORDER BY id", tuple(resource_ids))
+        # Rows come oldest first, so the newest job of each resource wins
+        return {resource_id: {"status": status, "attempts": attempts, "last_error": last_error}
+                for resource_id, status, attempts, last_error in cursor.fetchall()}
+    finally:
+        conn.close()
+
+# Function to count jobs by status
+def queue_stats():
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        stats = {status: 0 for status in ("queued", "running", "done", "failed", "rejected")}
+        stats.update(dict(cursor.fetchall()))
+    finally:
+        conn.close()
+    with _running_lock:
+        stats["running_here"] = len(_running)
+    return stats
+
+# Function to list the most recent failed and rejected jobs for the admin panel
+def problem_jobs(limit=20):
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, kind, resource_id, payload, status, attempts, last_error, updated_at FROM jobs "
+                       "WHERE status IN ('failed', 'rejected') ORDER BY id DESC LIMIT %s", (limit,))
+        return [{"id": job_id, "kind": kind, "resource_id": resource_id, "name": json.loads(payload or "{}").get("name"),
+                 "status": status, "attempts": attempts, "error": last_error, "updated_at": updated_at}
+                for job_id, kind, resource_id, payload, status, attempts, last_error, updated_at in cursor.fetchall()]
+    finally:
+        conn.close()
+
+# Function to give failed jobs a fresh set of attempts; returns how many were queued again
+def retry_failed():
+    with db.transaction() as cursor:
+        cursor.execute("UPDATE jobs SET status='queued', attempts=0, run_after=0, updated_at=%s WHERE status='failed'",
+                       (int(time.time()),))
+        count = cursor.rowcount
+    notify()
+    return count
+
+metrics.register_collector("jobs", queue_stats)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "work":
+        import schema
+        import state_backend
+        schema.ensure_schema()
+        # Replay this worker's signals (resource_processed, ...) to the app processes
+        if state_backend.get_backend().shared:
+            signals.set_bus(state_backend.get_backend())
+        try:
+            work()
+        except KeyboardInterrupt:
+            pass
+    elif command == "status":
+        print(queue_stats())
+    else:
+        sys.exit(f"Unknown command {command!r}; expected work or status")
@@ -0,0 +1,120 @@
+import bisect
+import os
+import re
+import threading
+import time
+from datetime import datetime
+import db
+import metrics
+import signals
+
+# Process-wide cache for the chat's calendar and classroom lookups. Both tables change
+# a few times a day, so instead of querying per message:
+#   - today's events are cached per date; a new day is simply a new key, so the cache
+#     rolls over at midnight and older dates are dropped
+#   - the whole classroom table is loaded once into a dict plus a sorted key list,
+#     which answers exact and prefix room lookups without touching the database; a
+#     second dict keyed without the block letters ("a204" -> "204") lets a bare room
+#     number find a room stored with its block, as the old substring match did
+# Admin writes publish classrooms_changed / calendar_changed, which drop the cached data.
+# Entries also expire after CACHE_TTL seconds, so writes made by another app process show
+# up even without a signal.
+
+CACHE_TTL = int(os.getenv("LOOKUP_CACHE_TTL", "300"))
+
+_lock = threading.Lock()
+_events = {}
+_classrooms = None
+# Bumped on invalidation so a load that raced with a write never stores stale rows
+_generation = {"calendar": 0, "classrooms": 0}
+_stats = {"calendar_hits": 0, "calendar_misses": 0, "classroom_hits": 0, "classroom_misses": 0}
+BLOCK_PREFIX_RE = re.compile(r"^[a-z]+(?=[0-9])")
+
+# Function to get the events for a date (default today), from the cache when possible
+def events_on(date=None):
+    date = date or datetime.now().strftime('%Y-%m-%d')
+    now = time.monotonic()
+    with _lock:
+        cached = _events.get(date)
+        if cached is not None and now - cached[0] < CACHE_TTL:
+            _stats["calendar_hits"] += 1
+            return cached[1]
+        _stats["calendar_misses"] += 1
+        generation = _generation["calendar"]
+
+    events = [row[0] for row in db.fetch_all("events_on_date", (date,))]
+    with _lock:
+        if generation == _generation["calendar"]:
+            # Keep only the date just loaded: yesterday's entry is dead weight after midnight
+            for stale_date in [key for key in _events if key != date]:
+                del _events[stale_date]
+            _events[date] = (now, events)
+    return events
+
+# Function to index details under a key, plus its sorted key list (first row wins for duplicate keys)
+def _index(pairs):
+    details_by_key = {}
+    for key, details in pairs:
+        details_by_key.setdefault(key, details)
+    return details_by_key, sorted(details_by_key)
+
+# Function to look up a key: exact match, then the first key with that prefix
+def _find(index, key):
+    details_by_key, keys = index
+    if key in details_by_key:
+        return details_by_key[key]
+    position = bisect.bisect_left(keys, key)
+    if position < len(keys) and keys[position].startswith(key):
+        return details_by_key[keys[position]]
+    return None
+
+# Function to load (or reuse) the classroom map: (loaded_at, room key index, room number index),
+# each index being ({key: details}, sorted keys)
+def _classroom_map():
+    global _classrooms
+    now = time.monotonic()
+    with _lock:
+        if _classrooms is not None and now - _classrooms[0] < CACHE_TTL:
+            _stats["classroom_hits"] += 1
+            return _classrooms
+        _stats["classroom_misses"] += 1
+        generation = _generation["classrooms"]
+
+    # Rows come in (room_key, id) order, so the first row wins for duplicate keys as before
+    rows = db.fetch_all("all_classrooms", ())
+    numbers = [(BLOCK_PREFIX_RE.sub("", room_key), details) for room_key, details in rows if BLOCK_PREFIX_RE.match(room_key)]
+    loaded = (now, _index(rows), _index(numbers))
+    with _lock:
+        if generation == _generation["classrooms"]:
+            _classrooms = loaded
+    return loaded
+
+# Function to find classroom details by normalized room key (exact, then prefix match), falling
+# back to the room number without its block letters, so "204" finds room "A-204"
+def classroom_details(room_key):
+    _, by_key, by_number = _classroom_map()
+    details = _find(by_key, room_key)
+    if details is None:
+        details = _find(by_number, room_key)
+    return details
+
+# Function to drop cached data for "calendar", "classrooms" or both
+def invalidate(table=None):
+    global _classrooms
+    with _lock:
+        if table in (None, "calendar"):
+            _events.clear()
+            _generation["calendar"] += 1
+        if table in (None, "classrooms"):
+            _classrooms = None
+            _generation["classrooms"] += 1
+
+def cache_stats():
+    with _lock:
+        return dict(_stats, cached_dates=len(_events), classrooms=len(_classrooms[1][0]) if _classrooms else 0)
+
+metrics.register_collector("lookup_cache", cache_stats,
+                           counters=("calendar_hits", "calendar_misses", "classroom_hits", "classroom_misses"))
+signals.subscribe("classrooms_changed", lambda **_: invalidate("classrooms"))
+signals.subscribe("calendar_changed", lambda **_: invalidate("calendar"))
+signals.subscribe("caches_stale", lambda **_: invalidate())
@@ -0,0 +1,248 @@
+import bisect
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+# Timing spans, counters and histograms for the hot paths, kept per process.
+#   - span("name") times a block into the span_seconds histogram and, inside a
+#     request("chat") block, into that request's structured log line
+#   - render() formats everything in the Prometheus text format; file_server.py
+#     serves it at /metrics
+#   - register_collector() exposes stats a module already keeps (cache hits, pool
+#     checkouts, ...) without counting them twice
+#   - profiler is an in-process sampling profiler the admin page can switch on
+# Request log lines go to the "metrics.requests" logger as JSON, and to
+# REQUEST_LOG_PATH as JSON lines when that is set.
+
+logger = logging.getLogger(__name__)
+request_logger = logging.getLogger(__name__ + ".requests")
+
+REQUEST_LOG_PATH = os.getenv("REQUEST_LOG_PATH")
+if REQUEST_LOG_PATH:
+    _handler = logging.FileHandler(REQUEST_LOG_PATH)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    request_logger.addHandler(_handler)
+    request_logger.setLevel(logging.INFO)
+
+PREFIX = "campus_buddy_"
+# Histogram bucket upper bounds in seconds, from sub-millisecond lookups to slow Gemini answers
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.005"))
+
+_lock = threading.Lock()
+# (name, sorted label items) -> value, and -> [per-bucket counts..., sum, count]
+_counters = {}
+_histograms = {}
+_collectors = []
+# The request being handled by this thread (or None outside request())
+_current_request = contextvars.ContextVar("metrics_request", default=None)
+
+# Function to add to a counter; names end in _total by convention
+def inc(name, amount=1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+# Function to record one observation (in seconds) in a histogram
+def observe(name, seconds, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        position = bisect.bisect_left(BUCKETS, seconds)
+        if position < len(BUCKETS):
+            histogram[position] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+# Context manager timing a block as span `name` (a plain class: spans wrap every
+# database statement, so they avoid the generator overhead of @contextmanager)
+class _Span:
+    __slots__ = ("name", "labels", "started")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        observe("span_seconds", elapsed, span=self.name, **self.labels)
+        trace = _current_request.get()
+        if trace is not None:
+            total, count = trace["spans"].get(self.name, (0.0, 0))
+            trace["spans"][self.name] = (total + elapsed, count + 1)
+
+def span(name, **labels):
+    return _Span(name, labels)
+
+# Context manager for one handled request: times it and logs one JSON line with its spans.
+# Nested request() blocks (respond() called from an instrumented caller) join the outer one.
+@contextmanager
+def request(kind, **fields):
+    trace = _current_request.get()
+    if trace is not None:
+        yield trace
+        return
+
+    trace = dict(fields, kind=kind, route=None, spans={})
+    token = _current_request.set(trace)
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield trace
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        _current_request.reset(token)
+        elapsed = time.perf_counter() - started
+        observe("request_seconds", elapsed, kind=kind, route=trace["route"] or "none")
+        # Skip building the line when nothing would record it
+        if request_logger.isEnabledFor(logging.INFO):
+            _log_request(trace, status, elapsed)
+
+def _log_request(trace, status, elapsed):
+    trace["request_id"] = uuid.uuid4().hex[:12]
+    trace["status"] = status
+    trace["duration_ms"] = round(elapsed * 1000, 3)
+    trace["spans"] = {name: {"ms": round(total * 1000, 3), "count": count}
+                      for name, (total, count) in trace["spans"].items()}
+    request_logger.info(json.dumps(trace, default=str))
+
+# Function to record which route answered the current chat message
+def set_route(route):
+    inc("chat_route_total", route=route)
+    trace = _current_request.get()
+    if trace is not None:
+        trace["route"] = route
+
+# Function to expose a stats dict under PREFIX + section + key; keys in `counters` are
+# cumulative and exported as counters, every other number as a gauge
+def register_collector(section, collect, counters=()):
+    _collectors.append((section, collect, set(counters)))
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+# Function to render every metric in the Prometheus text exposition format
+def render():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(values) for key, values in _histograms.items()}
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {PREFIX}{name} histogram")
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(BUCKETS, values):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {values[-1]}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {values[-2]}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {values[-1]}")
+
+    for section, collect, counter_keys in _collectors:
+        try:
+            stats = collect()
+        except Exception:
+            logger.exception("Metrics collector %s failed", section)
+            continue
+        for key, value in sorted(stats.items()):
+            if not isinstance(value, (int, float)):
+                continue
+            counter = key in counter_keys
+            name = f"{PREFIX}{section}_{key}" + ("_total" if counter else "")
+            lines.append(f"# TYPE {name} {'counter' if counter else 'gauge'}")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class SamplingProfiler:
+    # Stacks whose innermost frame is in one of these modules are parked threads, not work
+    IDLE_MODULES = ("threading.py", "selectors.py", "queue.py", "socketserver.py")
+
+    def __init__(self, interval=PROFILER_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    # Function to start sampling every thread's stack (clears earlier samples)
+    def start(self):
+        with self._lock:
+            if self.running():
+                return
+            self.samples.clear()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_thread = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                if stack[0].startswith(self.IDLE_MODULES):
+                    continue
+                with self._lock:
+                    self.samples[";".join(reversed(stack))] += 1
+
+    # Function to list the busiest functions: [(function, own samples, samples including callees)]
+    def top(self, limit=20):
+        own = Counter()
+        inclusive = Counter()
+        with self._lock:
+            samples = list(self.samples.items())
+        for stack, count in samples:
+            functions = stack.split(";")
+            own[functions[-1]] += count
+            for function in set(functions):
+                inclusive[function] += count
+        return [(function, own[function], count) for function, count in inclusive.most_common(limit)]
+
+    # Function to export the samples as collapsed stacks (input for flamegraph.pl / speedscope)
+    def collapsed(self):
+        with self._lock:
+            return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+profiler = SamplingProfiler()
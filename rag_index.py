@@ -0,0 +1,488 @@
+import json
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import metrics
+import signals
+from storage import get_storage
+
+# NumPy and pypdf are optional: without them retrieval is disabled and questions go to Gemini as before
+try:
+    import numpy as np
+except ImportError:
+    np = None
+# Without fcntl (Windows) only the index writers within one process are serialized
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Retrieval over the text of uploaded PDFs, for questions no intent rule answers.
+# Each PDF is split into overlapping word windows, and every chunk is embedded with a
+# hashing-trick bag of words/bigrams (no model download, CPU only). Vectors live in
+# immutable segments (a float32 .npy matrix, memory-mapped for search, plus the chunk
+# texts as JSON); manifest.json names the live segments and the rows each indexed
+# resource owns. A change appends one segment and swaps in a new manifest with a single
+# rename, under a file lock, so every worker sharing RAG_INDEX_DIR reads a consistent
+# index. Rows of deleted resources stay in their segment until dead rows outnumber live
+# ones or segments pile up; the live rows are then compacted into one segment. sync() only extracts
+# resources whose file_path is new or changed, and admin writes schedule a sync
+# through signals. A manifest naming a segment that no longer exists (a lost file) is
+# served without it; the next sync re-indexes the documents that lived in it.
+#
+#   python rag_index.py build            index every PDF resource not yet indexed
+#   python rag_index.py query "text"     show the top chunks for a question
+#   python rag_index.py stats
+
+logger = logging.getLogger(__name__)
+
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", "rag_index")
+DIMENSIONS = 1024
+CHUNK_WORDS = 160
+CHUNK_OVERLAP = 40
+TOP_K = 4
+# Chunks scoring below this share too few terms with the question to be worth sending
+MIN_SCORE = 0.15
+# Upper bound on retrieved text put into one prompt
+PROMPT_CONTEXT_CHARS = 3000
+# The live rows are compacted into one segment once dead rows outnumber them (and there are at
+# least COMPACT_MIN_DEAD_ROWS), or once appends have left more than MAX_SEGMENTS segments
+COMPACT_MIN_DEAD_ROWS = 1000
+MAX_SEGMENTS = 16
+# Times a load retries when a segment vanished under it (a concurrent compaction swapped
+# the manifest); past that the manifest itself is broken and its missing segments are dropped
+LOAD_RETRIES = 5
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "how", "i",
+    "in", "is", "it", "its", "me", "of", "on", "or", "please", "tell", "that", "the", "this", "to",
+    "was", "what", "when", "where", "which", "who", "why", "will", "with", "you", "your",
+}
+
+# Function to split text into lower-case terms, dropping stopwords
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+# Function to embed a batch of texts into L2-normalized hashed term vectors (one row per text)
+def embed(texts):
+    matrix = np.zeros((len(texts), DIMENSIONS), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        counts = {}
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            counts[feature] = counts.get(feature, 0) + 1
+        for feature, count in counts.items():
+            hashed = zlib.crc32(feature.encode())
+            # The top bit picks a sign so colliding features tend to cancel rather than add up
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            matrix[row, hashed % DIMENSIONS] += sign * (1.0 + math.log(count))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+# Function to split text into overlapping word windows
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    words = text.split()
+    step = chunk_words - overlap
+    return [" ".join(words[start:start + chunk_words]) for start in range(0, max(len(words) - overlap, 1), step)
+            if words[start:start + chunk_words]]
+
+# Function to map a blob path to the key of its cached text (None for legacy files, which can change in place)
+def _text_cache_key(file_path):
+    import blob_store
+    if not blob_store.is_blob_path(file_path):
+        return None
+    return os.path.join(blob_store.UPLOADS_DIR, ".text", os.path.splitext(os.path.basename(file_path))[0] + ".txt")
+
+# Function to extract the text of a PDF page by page (empty when pypdf is missing or the file is unreadable).
+# Text of blob files is cached next to them, so the upload job's extraction is reused by every sync.
+def extract_pdf_text(file_path):
+    files = get_storage()
+    cache_key = _text_cache_key(file_path)
+    if cache_key and files.exists(cache_key):
+        with files.open(cache_key) as f:
+            return f.read().decode("utf-8")
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        logger.warning("pypdf is not installed; skipping %s", file_path)
+        return ""
+    if not files.exists(file_path):
+        logger.warning("%s is missing; skipping", file_path)
+        return ""
+    try:
+        with metrics.span("pdf_extract"):
+            reader = PdfReader(files.local_path(file_path))
+            text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    except Exception:
+        logger.exception("Could not extract text from %s", file_path)
+        return ""
+    if cache_key:
+        files.write(cache_key, lambda target: target.write(text.encode("utf-8")))
+    return text
+
+
+class RagIndex:
+    def __init__(self, index_dir=INDEX_DIR):
+        self.index_dir = index_dir
+        self.manifest_path = os.path.join(index_dir, "manifest.json")
+        self._write_lock = threading.Lock()
+        self._manifest_stamp = None
+        # (segments, chunks, documents, idf, alive) swapped as one tuple so searches never see a half-written update
+        self._snapshot = self._load()
+
+    def _stamp(self):
+        try:
+            stat = os.stat(self.manifest_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"version": 0, "dimensions": DIMENSIONS, "segments": [], "documents": {}}
+
+    def _segment_path(self, name, extension):
+        return os.path.join(self.index_dir, name + extension)
+
+    # Function to open a manifest's segments: (memory-mapped vector matrices, chunk rows)
+    def _open_segments(self, manifest):
+        segments, chunks = [], []
+        for segment in manifest["segments"]:
+            segments.append(np.load(self._segment_path(segment["name"], ".npy"), mmap_mode="r"))
+            with open(self._segment_path(segment["name"], ".json"), encoding="utf-8") as f:
+                chunks.extend(json.load(f))
+        return segments, chunks
+
+    # Function to drop the segments of a manifest whose files are gone, with the documents in them
+    def _drop_missing_segments(self, manifest):
+        missing = {segment["name"] for segment in manifest["segments"]
+                   if not all(os.path.exists(self._segment_path(segment["name"], extension)) for extension in (".npy", ".json"))}
+        if missing:
+            logger.error("RAG index segments %s are missing; their documents will be indexed again", sorted(missing))
+            manifest["segments"] = [segment for segment in manifest["segments"] if segment["name"] not in missing]
+            manifest["documents"] = {resource_id: document for resource_id, document in manifest["documents"].items()
+                                     if document.get("segment") not in missing}
+        return manifest
+
+    # Function to open the on-disk index (segment vectors memory-mapped read-only)
+    def _load(self):
+        for attempt in range(LOAD_RETRIES):
+            stamp = self._stamp()
+            manifest = self._read_manifest()
+            try:
+                segments, chunks = self._open_segments(manifest)
+                break
+            except FileNotFoundError:
+                # A compaction in another process removed a segment after the manifest was read
+                time.sleep(0.01 * (attempt + 1))
+        else:
+            segments, chunks = self._open_segments(self._drop_missing_segments(manifest))
+
+        # Rows belong to the documents listed in the manifest; rows of removed documents are dead
+        first_row = _first_rows(manifest)
+        alive = np.zeros(len(chunks), dtype=bool)
+        for document in manifest["documents"].values():
+            if document["chunks"]:
+                start = first_row[document["segment"]] + document["offset"]
+                alive[start:start + document["chunks"]] = True
+
+        # Per-dimension inverse document frequency, so rare course terms outweigh common ones
+        document_frequency = np.zeros(DIMENSIONS, dtype=np.int64)
+        for segment, vectors in zip(manifest["segments"], segments):
+            start = first_row[segment["name"]]
+            document_frequency += np.count_nonzero(vectors[alive[start:start + len(vectors)]], axis=0)
+        idf = (np.log((int(alive.sum()) + 1) / (document_frequency + 1)) + 1).astype(np.float32)
+        self._manifest_stamp = stamp
+        return segments, chunks, manifest["documents"], idf, alive
+
+    # Function to pick up changes another process wrote since this one last loaded the index
+    def refresh(self):
+        if self._stamp() != self._manifest_stamp:
+            self._snapshot = self._load()
+
+    # Context manager serializing writers across the processes sharing INDEX_DIR
+    @contextmanager
+    def _file_lock(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        with open(os.path.join(self.index_dir, ".lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Closing the file releases the lock
+            yield
+
+    # Function to write a file under a unique temporary name, then move it into place
+    def _write_atomic(self, path, write):
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "wb") as f:
+                write(f)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    # Function to write a new immutable segment: the vectors and the [resource_id, text] of each row
+    def _write_segment(self, vectors, rows):
+        name = "seg-" + uuid.uuid4().hex
+        self._write_atomic(self._segment_path(name, ".npy"),
+                           lambda f: np.save(f, np.ascontiguousarray(vectors, dtype=np.float32)))
+        self._write_atomic(self._segment_path(name, ".json"),
+                           lambda f: f.write(json.dumps(rows).encode("utf-8")))
+        return {"name": name, "rows": len(rows)}
+
+    # Function to rewrite the live rows of the manifest's segments into one new segment
+    def _compact(self, manifest):
+        vectors, chunks = {}, {}
+        for segment in manifest["segments"]:
+            vectors[segment["name"]] = np.load(self._segment_path(segment["name"], ".npy"), mmap_mode="r")
+            with open(self._segment_path(segment["name"], ".json"), encoding="utf-8") as f:
+                chunks[segment["name"]] = json.load(f)
+        parts, rows = [], []
+        for document in manifest["documents"].values():
+            if not document["chunks"]:
+                continue
+            offset, count = document["offset"], document["chunks"]
+            parts.append(np.asarray(vectors[document["segment"]][offset:offset + count]))
+            rows.extend(chunks[document["segment"]][offset:offset + count])
+            document["offset"] = len(rows) - count
+        manifest["segments"] = []
+        if rows:
+            segment = self._write_segment(np.concatenate(parts), rows)
+            manifest["segments"].append(segment)
+            for document in manifest["documents"].values():
+                if document["chunks"]:
+                    document["segment"] = segment["name"]
+
+    # Function to change the indexed documents: drop `removed` resource ids, (re)index `added`
+    # as {resource_id: (name, file_path, chunk texts)} and rename `renamed` as {resource_id: name}.
+    # New vectors are appended as one new segment, and the manifest is swapped in with one
+    # rename, so readers see either the old index or the new one.
+    def apply_changes(self, removed=(), added=None, renamed=None):
+        added = added or {}
+        with self._write_lock, self._file_lock():
+            # Start from the latest index on disk, which another process may have written
+            self.refresh()
+            # Under the file lock no compaction runs, so a segment missing now is lost for good
+            manifest = self._drop_missing_segments(self._read_manifest())
+            documents = manifest["documents"]
+            for resource_id in removed:
+                documents.pop(str(resource_id), None)
+            for resource_id, name in (renamed or {}).items():
+                if str(resource_id) in documents:
+                    documents[str(resource_id)]["name"] = name
+
+            parts, rows = [], []
+            for resource_id, (name, file_path, texts) in added.items():
+                document = {"name": name, "file_path": file_path, "chunks": len(texts)}
+                if texts:
+                    document["offset"] = len(rows)
+                    parts.append(embed(texts))
+                    rows.extend([str(resource_id), text] for text in texts)
+                documents[str(resource_id)] = document
+            if rows:
+                segment = self._write_segment(np.concatenate(parts), rows)
+                manifest["segments"].append(segment)
+                for resource_id, (_, _, texts) in added.items():
+                    if texts:
+                        documents[str(resource_id)]["segment"] = segment["name"]
+
+            live_rows = sum(document["chunks"] for document in documents.values())
+            dead_rows = sum(segment["rows"] for segment in manifest["segments"]) - live_rows
+            if dead_rows > max(live_rows, COMPACT_MIN_DEAD_ROWS) or len(manifest["segments"]) > MAX_SEGMENTS:
+                self._compact(manifest)
+
+            manifest["version"] = manifest.get("version", 0) + 1
+            self._write_atomic(self.manifest_path, lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+            self._snapshot = self._load()
+
+            # Segments no manifest names any more: compacted away, or left by a writer that died
+            live_files = {segment["name"] + extension for segment in manifest["segments"] for extension in (".npy", ".json")}
+            for file_name in os.listdir(self.index_dir):
+                if file_name.startswith("seg-") and file_name not in live_files:
+                    os.remove(os.path.join(self.index_dir, file_name))
+
+    # Function to index one resource from its file (replacing any previous version)
+    def add_file(self, resource_id, name, file_path):
+        self.apply_changes(added={resource_id: (name, file_path, chunk_text(extract_pdf_text(file_path)))})
+
+    # Function to return the top-k chunks for each query: [[(score, name, text), ...], ...]
+    # All queries are scored in one matrix product per segment against the whole corpus.
+    def search_many(self, queries, k=TOP_K, min_score=MIN_SCORE):
+        segments, chunks, documents, idf, alive = self._snapshot
+        live = int(alive.sum())
+        if not live or not queries:
+            return [[] for _ in queries]
+        weighted = embed(queries) * idf
+        weighted /= np.maximum(np.linalg.norm(weighted, axis=1, keepdims=True), 1e-9)
+        scores = np.hstack([weighted @ np.asarray(vectors).T for vectors in segments])
+        scores[:, ~alive] = -np.inf
+        k = min(k, live)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for query_row, rows in enumerate(top):
+            ranked = sorted(rows, key=lambda row: -scores[query_row, row])
+            results.append([(float(scores[query_row, row]), documents[chunks[row][0]]["name"], chunks[row][1])
+                            for row in ranked if scores[query_row, row] >= min_score])
+        return results
+
+    def search(self, query, k=TOP_K, min_score=MIN_SCORE):
+        return self.search_many([query], k, min_score)[0]
+
+    def documents(self):
+        return dict(self._snapshot[2])
+
+    def stats(self):
+        segments, _, documents, _, alive = self._snapshot
+        rows = sum(len(vectors) for vectors in segments)
+        return {"documents": len(documents), "chunks": int(alive.sum()), "segments": len(segments),
+                "dead_chunks": rows - int(alive.sum()), "index_bytes": rows * DIMENSIONS * 4}
+
+
+# Function to map each segment of a manifest to the index of its first row in the whole index
+def _first_rows(manifest):
+    first_row, total = {}, 0
+    for segment in manifest["segments"]:
+        first_row[segment["name"]] = total
+        total += segment["rows"]
+    return first_row
+
+
+# Function to list the PDF resources that should be indexed: {id: (name, file_path)}
+def _pdf_resources():
+    # Imported here so the index can be built and benchmarked without a database
+    import db
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id, name, file_path FROM resources")
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return {str(resource_id): (name, file_path) for resource_id, name, file_path in rows
+            if file_path and file_path.lower().endswith(".pdf")}
+
+_index = None
+_index_lock = threading.Lock()
+# One background worker: extraction never runs on a chat or admin request
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-index")
+_sync_pending = threading.Event()
+_started = False
+
+def available():
+    return np is not None
+
+# Function to get the shared index for this process (None when NumPy is missing)
+def get_index():
+    global _index
+    if np is None:
+        return None
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = RagIndex()
+    return _index
+
+# Function to bring the index in line with the resources table; returns (added, removed) counts
+def sync():
+    index = get_index()
+    if index is None:
+        return 0, 0
+    # Another worker may already have indexed what changed
+    index.refresh()
+    wanted = _pdf_resources()
+    indexed = index.documents()
+    removed = [resource_id for resource_id in indexed if resource_id not in wanted]
+    added = {}
+    renamed = {}
+    for resource_id, (name, file_path) in wanted.items():
+        current = indexed.get(resource_id)
+        if current is None or current["file_path"] != file_path:
+            added[resource_id] = (name, file_path, chunk_text(extract_pdf_text(file_path)))
+        elif current["name"] != name:
+            # Renamed only: keep the vectors, change the name shown with the chunks
+            renamed[resource_id] = name
+    if removed or added or renamed:
+        index.apply_changes(removed, added, renamed)
+    return len(added) + len(renamed), len(removed)
+
+def _run_sync():
+    _sync_pending.clear()
+    try:
+        sync()
+    except Exception:
+        logger.exception("RAG index sync failed")
+
+# Function to queue a background sync; bursts of admin writes collapse into one
+def schedule_sync(**_):
+    if np is None or _sync_pending.is_set():
+        return
+    _sync_pending.set()
+    _executor.submit(_run_sync)
+
+# Function to index existing PDFs in the background once per process (the app calls this on every rerun)
+def start():
+    global _started
+    if not _started:
+        _started = True
+        schedule_sync()
+
+# Function to retrieve the top chunks for a question ([] when nothing relevant is indexed)
+def retrieve(question, k=TOP_K):
+    index = get_index()
+    if index is None:
+        return []
+    with metrics.span("rag_search"):
+        return index.search(question, k)
+
+# Function to build the prompt for the Gemini fallback, grounded in retrieved chunks when any match
+def grounded_prompt(question, k=TOP_K):
+    chunks = retrieve(question, k)
+    if not chunks:
+        return question
+    context = []
+    budget = PROMPT_CONTEXT_CHARS
+    for _, name, text in chunks:
+        excerpt = text[:budget]
+        context.append(f"[{name}] {excerpt}")
+        budget -= len(excerpt)
+        if budget <= 0:
+            break
+    return ("Answer the student's question using the course material excerpts below. "
+            "If they do not contain the answer, say so briefly and answer from general knowledge.\n\n"
+            + "\n\n".join(context) + f"\n\nQuestion: {question}")
+
+# New uploads are indexed once their background job has extracted the text (job_queue.py)
+signals.subscribe("resource_processed", schedule_sync)
+signals.subscribe("resource_updated", schedule_sync)
+signals.subscribe("resource_deleted", schedule_sync)
+signals.subscribe("resources_reloaded", schedule_sync)
+signals.subscribe("caches_stale", schedule_sync)
+
+if __name__ == "__main__":
+    if np is None:
+        sys.exit("NumPy is required for the RAG index")
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "build":
+        added, removed = sync()
+        print(f"Indexed {added} resources, removed {removed}; {get_index().stats()}")
+    elif command == "query":
+        for score, name, text in retrieve(" ".join(sys.argv[2:])):
+            print(f"{score:.3f} [{name}] {text[:200]}")
+    elif command == "stats":
+        print(get_index().stats())
+    else:
+        sys.exit(f"Unknown command {command!r}; expected build, query or stats")
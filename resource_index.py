@@ -0,0 +1,245 @@
+import bisect
+import heapq
+import itertools
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import signals
+
+# In-memory inverted index over resource names, one per category.
+# Replaces the per-query "fetch every row and score it in Python" fallback of
+# find_resource: tokens are normalized once when a resource is indexed and each
+# lookup only touches the posting lists of the query terms.
+# Each category has its own lock, and indexes are built without holding any shared
+# lock, so a slow (re)build of one category never blocks lookups in the others.
+
+# Letters and digits are split apart so "sem3" and "csm_semester_3" tokenize alike
+TOKEN_RE = re.compile(r"[a-z]+|\d+(?:st|nd|rd|th)?")
+ORDINAL_RE = re.compile(r"^(\d+)(?:st|nd|rd|th)$")
+
+ABBREVIATIONS = {
+    "sem": "semester",
+    "sems": "semester",
+    "semesters": "semester",
+    "yr": "year",
+    "yrs": "year",
+    "years": "year",
+    "timetables": "timetable",
+    "tt": "timetable",
+    "pdfs": "pdf",
+    "dept": "department",
+}
+
+# Filler words in chat queries that should not pull in unrelated resources
+STOPWORDS = {"a", "an", "the", "for", "of", "to", "me", "my", "i", "is", "please", "show", "give", "get", "want", "need"}
+
+# Prefix matching ("comp" -> "computer") only kicks in for reasonably long terms
+MIN_PREFIX_LENGTH = 3
+
+# Longer queries are truncated; the level walk in search() is exponential in the term count
+MAX_QUERY_TERMS = 8
+
+# Function to normalize free text into index tokens (sem -> semester, 3rd -> 3)
+def normalize_tokens(text):
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        ordinal = ORDINAL_RE.match(token)
+        if ordinal:
+            token = ordinal.group(1)
+        token = ABBREVIATIONS.get(token, token)
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class CategoryIndex:
+    def __init__(self, rows=()):
+        self.postings = {}
+        self.docs = {}
+        self._vocabulary = None
+        # Held by lookups and patches of this category only
+        self.lock = threading.Lock()
+        for res_id, res_name, res_path in rows:
+            self.add(res_id, res_name, res_path)
+
+    def add(self, res_id, res_name, res_path):
+        if res_id in self.docs:
+            self.remove(res_id)
+        tokens = set(normalize_tokens(res_name))
+        self.docs[res_id] = (res_name, res_path, tokens)
+        for token in tokens:
+            if token not in self.postings:
+                self.postings[token] = set()
+                self._vocabulary = None
+            self.postings[token].add(res_id)
+
+    def remove(self, res_id):
+        doc = self.docs.pop(res_id, None)
+        if doc is None:
+            return
+        for token in doc[2]:
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            ids.discard(res_id)
+            if not ids:
+                del self.postings[token]
+                self._vocabulary = None
+
+    # Sorted token list for prefix lookups; rebuilt lazily after the vocabulary changes
+    def vocabulary(self):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        return self._vocabulary
+
+    # Posting sets of every token equal to the term or (for longer terms) starting with it.
+    # The returned sets belong to the index and must not be mutated.
+    def matching_sets(self, term):
+        sets = []
+        ids = self.postings.get(term)
+        if ids:
+            sets.append(ids)
+        if len(term) >= MIN_PREFIX_LENGTH:
+            vocabulary = self.vocabulary()
+            position = bisect.bisect_right(vocabulary, term)
+            while position < len(vocabulary) and vocabulary[position].startswith(term):
+                sets.append(self.postings[vocabulary[position]])
+                position += 1
+        return sets
+
+    def matching_ids(self, term):
+        sets = self.matching_sets(term)
+        if len(sets) == 1:
+            return sets[0]
+        return set().union(*sets)
+
+    # Ranked lookup: one point per query term a resource matches, ties go to the oldest id.
+    # Resources matching j terms are exactly those in some intersection of j term sets, so
+    # levels are walked from "all terms" downwards and the large single-term sets are only
+    # touched when nothing matches more than one term.
+    def search(self, query, limit=5):
+        term_sets = []
+        terms = list(dict.fromkeys(normalize_tokens(query)))[:MAX_QUERY_TERMS]
+        for term in terms:
+            ids = self.matching_ids(term)
+            if ids:
+                term_sets.append(ids)
+        term_sets.sort(key=len)
+
+        results = []
+        seen = set()
+        for size in range(len(term_sets), 0, -1):
+            level = set()
+            for combo in itertools.combinations(term_sets, size):
+                level.update(combo[0].intersection(*combo[1:]))
+            level -= seen
+            for res_id in heapq.nsmallest(limit - len(results), level):
+                res_name, res_path, _ = self.docs[res_id]
+                results.append((size, res_id, res_name, res_path))
+            if len(results) >= limit:
+                break
+            seen |= level
+        return results
+
+
+_indexes = {}
+# Guards _indexes, _building and _build_locks only, and is never held while building or searching
+_lock = threading.Lock()
+# Category -> changes published while its index is being (re)built, replayed before the swap
+_building = {}
+# One builder per category; lookups in other categories never wait for it
+_build_locks = {}
+# Rebuilds after an invalidation run here, while lookups keep using the previous index
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="resource-index")
+
+# Function to load every resource of a category from the database
+# (db is imported here so the index and its benchmark work without a MySQL driver)
+def _load_rows(category):
+    from db import fetch_all
+    return fetch_all("resources_in_category", (category,))
+
+# Function to build a category's index outside the shared lock and swap it in when complete
+def _build(category, rebuild=False):
+    with _lock:
+        build_lock = _build_locks.setdefault(category, threading.Lock())
+    with build_lock:
+        index = _indexes.get(category)
+        if index is not None and not rebuild:
+            # Built by the thread this one waited for
+            return index
+        with _lock:
+            _building[category] = []
+        try:
+            index = CategoryIndex(_load_rows(category))
+        except BaseException:
+            with _lock:
+                _building.pop(category, None)
+            raise
+        with _lock:
+            # Writes published while the rows were read; re-applying one the rows already have is harmless
+            for change in _building.pop(category):
+                change(index)
+            _indexes[category] = index
+        return index
+
+# Function to get the index for a category, building it on first use
+def get_index(category):
+    index = _indexes.get(category)
+    if index is None:
+        index = _build(category)
+    return index
+
+# Function to rank resources in a category against a free-text query
+def search(category, query, limit=5):
+    index = get_index(category)
+    with index.lock:
+        return index.search(query, limit)
+
+# Function to return the file path of the best matching resource (or None)
+def lookup(category, query):
+    results = search(category, query, limit=1)
+    return results[0][3] if results else None
+
+# Function to rebuild a category index (or all of them) in the background; lookups keep
+# using the current index until the new one is swapped in
+def invalidate(category=None):
+    with _lock:
+        categories = list(_indexes) if category is None else [category] if category in _indexes else []
+    for stale_category in categories:
+        _executor.submit(_build, stale_category, True)
+
+# Function to apply change(index) to the built indexes of `categories` (every category when
+# None) and to any rebuild in progress, so the rebuilt index does not miss it
+def _patch(change, categories=None):
+    with _lock:
+        names = set(_indexes) | set(_building) if categories is None else set(categories)
+        indexes = [_indexes[name] for name in names if name in _indexes]
+        for name in names:
+            if name in _building:
+                _building[name].append(change)
+    for index in indexes:
+        with index.lock:
+            change(index)
+
+# Admin write hooks: patch already-built indexes in place instead of rebuilding them
+def _on_resource_added(id, category, name, file_path):
+    _patch(lambda index: index.add(id, name, file_path), [category])
+
+def _on_resource_updated(id, category, name, file_path):
+    # The resource may have moved from another category
+    _patch(lambda index: index.remove(id))
+    _patch(lambda index: index.add(id, name, file_path), [category])
+
+def _on_resource_deleted(id, category=None):
+    _patch(lambda index: index.remove(id))
+
+# Bulk imports reload whole categories rather than patching row by row
+def _on_resources_reloaded(categories):
+    for category in categories:
+        invalidate(category)
+
+signals.subscribe("resource_added", _on_resource_added)
+signals.subscribe("resource_updated", _on_resource_updated)
+signals.subscribe("resource_deleted", _on_resource_deleted)
+signals.subscribe("resources_reloaded", _on_resources_reloaded)
+signals.subscribe("caches_stale", lambda **_: invalidate())
@@ -0,0 +1,211 @@
+import re
+import sys
+import threading
+from datetime import datetime
+import db
+
+# Versioned schema migrations for the campus_buddy database, for MySQL/MariaDB and
+# the SQLite stand-in. Applied versions are recorded in schema_migrations, so running
+# `python schema.py migrate` repeatedly is safe.
+#
+#   python schema.py migrate        apply pending migrations
+#   python schema.py check-plans    EXPLAIN every hot query; exit 1 if any needs a full scan
+
+ROOM_KEYWORDS_RE = re.compile(r"^(?:class\s*room|room|class)\s*", re.IGNORECASE)
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+
+# Function to normalize a room number into the indexed lookup key ("Room A-204" -> "a204")
+def normalize_room_number(room_number):
+    return NON_ALNUM_RE.sub("", ROOM_KEYWORDS_RE.sub("", (room_number or "").strip()).lower())
+
+# Function to (re)compute room_key for every classroom row
+def _backfill_room_keys(cursor, dialect):
+    cursor.execute("SELECT id, room_number FROM classrooms")
+    rows = cursor.fetchall()
+    cursor.executemany("UPDATE classrooms SET room_key=%s WHERE id=%s",
+                       [(normalize_room_number(room_number), room_id) for room_id, room_number in rows])
+
+# Each step is SQL text, a per-dialect dict of SQL text, or a callable(cursor, dialect)
+MIGRATIONS = [
+    (1, "base tables", [
+        {
+            "mysql": "CREATE TABLE IF NOT EXISTS resources (id INT AUTO_INCREMENT PRIMARY KEY, category VARCHAR(255), name VARCHAR(255), file_path VARCHAR(255))",
+            "sqlite": "CREATE TABLE IF NOT EXISTS resources (id INTEGER PRIMARY KEY AUTOINCREMENT, category VARCHAR(255), name VARCHAR(255), file_path VARCHAR(255))",
+        },
+        {
+            "mysql": "CREATE TABLE IF NOT EXISTS schedules (id INT AUTO_INCREMENT PRIMARY KEY, type VARCHAR(255), name VARCHAR(255), details TEXT)",
+            "sqlite": "CREATE TABLE IF NOT EXISTS schedules (id INTEGER PRIMARY KEY AUTOINCREMENT, type VARCHAR(255), name VARCHAR(255), details TEXT)",
+        },
+        {
+            "mysql": "CREATE TABLE IF NOT EXISTS classrooms (id INT AUTO_INCREMENT PRIMARY KEY, room_number VARCHAR(50), details TEXT)",
+            "sqlite": "CREATE TABLE IF NOT EXISTS classrooms (id INTEGER PRIMARY KEY AUTOINCREMENT, room_number VARCHAR(50), details TEXT)",
+        },
+        {
+            "mysql": "CREATE TABLE IF NOT EXISTS calendar (id INT AUTO_INCREMENT PRIMARY KEY, date DATE, event TEXT)",
+            "sqlite": "CREATE TABLE IF NOT EXISTS calendar (id INTEGER PRIMARY KEY AUTOINCREMENT, date DATE, event TEXT)",
+        },
+    ]),
+    (2, "lookup indexes", [
+        # Category filter plus name prefix search (SQLite needs NOCASE for LIKE to use it)
+        {
+            "mysql": "CREATE INDEX idx_resources_category_name ON resources (category, name)",
+            "sqlite": "CREATE INDEX idx_resources_category_name ON resources (category, name COLLATE NOCASE)",
+        },
+        "CREATE INDEX idx_calendar_date ON calendar (date)",
+        # Normalized room key for exact and prefix lookups instead of LIKE '%x%'
+        {
+            "mysql": "ALTER TABLE classrooms ADD COLUMN room_key VARCHAR(50)",
+            "sqlite": "ALTER TABLE classrooms ADD COLUMN room_key VARCHAR(50) COLLATE NOCASE",
+        },
+        _backfill_room_keys,
+        "CREATE INDEX idx_classrooms_room_key ON classrooms (room_key)",
+        # Word search on resource names (MySQL/MariaDB only; SQLite relies on the prefix index)
+        {"mysql": "ALTER TABLE resources ADD FULLTEXT INDEX ft_resources_name (name)"},
+    ]),
+    (3, "admin keyset paging index", [
+        # Manage tab pages through one category in id order
+        "CREATE INDEX idx_resources_category_id ON resources (category, id)",
+    ]),
+    (4, "content-addressed blobs", [
+        # One row per stored file content; released_at is when ref_count last dropped (epoch seconds)
+        "CREATE TABLE IF NOT EXISTS blobs (digest CHAR(64) PRIMARY KEY, file_path VARCHAR(255), size BIGINT, "
+        "ref_count INT NOT NULL DEFAULT 0, released_at BIGINT)",
+        "CREATE INDEX idx_blobs_ref_count ON blobs (ref_count, released_at)",
+        "ALTER TABLE resources ADD COLUMN blob_digest CHAR(64)",
+        "CREATE INDEX idx_resources_blob_digest ON resources (blob_digest)",
+    ]),
+    (5, "background jobs", [
+        # Upload post-processing queue (job_queue.py); times are epoch seconds
+        {
+            "mysql": "CREATE TABLE IF NOT EXISTS jobs (id INT AUTO_INCREMENT PRIMARY KEY, kind VARCHAR(50) NOT NULL, "
+                     "resource_id INT, payload TEXT, status VARCHAR(20) NOT NULL DEFAULT 'queued', "
+                     "attempts INT NOT NULL DEFAULT 0, max_attempts INT NOT NULL DEFAULT 3, run_after BIGINT NOT NULL DEFAULT 0, "
+                     "locked_by VARCHAR(64), locked_at BIGINT, last_error TEXT, created_at BIGINT, updated_at BIGINT)",
+            "sqlite": "CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, kind VARCHAR(50) NOT NULL, "
+                      "resource_id INT, payload TEXT, status VARCHAR(20) NOT NULL DEFAULT 'queued', "
+                      "attempts INT NOT NULL DEFAULT 0, max_attempts INT NOT NULL DEFAULT 3, run_after BIGINT NOT NULL DEFAULT 0, "
+                      "locked_by VARCHAR(64), locked_at BIGINT, last_error TEXT, created_at BIGINT, updated_at BIGINT)",
+        },
+        # Claiming due jobs, and the Manage tab's per-resource status
+        "CREATE INDEX idx_jobs_status_run_after ON jobs (status, run_after)",
+        "CREATE INDEX idx_jobs_resource_id ON jobs (resource_id)",
+    ]),
+]
+
+# Function to run one migration step for the given dialect
+def _run_step(cursor, step, dialect):
+    if callable(step):
+        step(cursor, dialect)
+    elif isinstance(step, dict):
+        if dialect in step:
+            cursor.execute(step[dialect])
+    else:
+        cursor.execute(step)
+
+# Function to apply every migration not yet recorded in schema_migrations
+def migrate(conn=None, dialect=None):
+    dialect = dialect or db.DB_BACKEND
+    own_connection = conn is None
+    conn = conn or db.get_db_connection()
+    cursor = conn.cursor()
+    applied_versions = []
+    try:
+        cursor.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INT PRIMARY KEY, description VARCHAR(255), applied_at VARCHAR(32))")
+        cursor.execute("SELECT version FROM schema_migrations")
+        applied = {row[0] for row in cursor.fetchall()}
+
+        for version, description, steps in MIGRATIONS:
+            if version in applied:
+                continue
+            for step in steps:
+                _run_step(cursor, step, dialect)
+            cursor.execute("INSERT INTO schema_migrations (version, description, applied_at) VALUES (%s, %s, %s)",
+                           (version, description, datetime.now().isoformat(timespec="seconds")))
+            # MySQL commits DDL implicitly; committing per version keeps SQLite in step
+            conn.commit()
+            applied_versions.append(version)
+    finally:
+        if own_connection:
+            conn.close()
+    return applied_versions
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+# Function to apply pending migrations once per process (the app calls this on every rerun)
+def ensure_schema():
+    global _schema_ready
+    if not _schema_ready:
+        with _schema_lock:
+            if not _schema_ready:
+                migrate()
+                _schema_ready = True
+
+# Hot queries checked by check_query_plans, with representative parameters
+PLAN_CHECKS = [
+    ("resource_by_name_prefix", ("Class Timetables", db.like_prefix("csm semester"))),
+    ("resources_in_category", ("Class Timetables",)),
+    ("events_on_date", ("2025-03-28",)),
+    ("classroom_by_key", ("a204",)),
+    ("classroom_by_key_prefix", (db.like_prefix("a2"),)),
+    ("resource_by_fulltext", ("Class Timetables", "+csm* +semester*")),
+]
+
+# Admin page queries (admin_pages.PAGE_QUERIES) checked alongside the hot queries
+ADMIN_PLAN_CHECKS = [
+    (("resources", False), ("Class Timetables", 0, 26)),
+    (("classrooms", False), (0, 26)),
+    (("calendar", False), ("2025-01-01", "2025-01-01", "2025-01-01", 0, 26)),
+]
+
+# Function to EXPLAIN a hot query; returns (uses_index, plan text)
+def explain(cursor, sql, params, dialect):
+    if dialect == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        details = [row[3] for row in cursor.fetchall()]
+        # "SCAN <table>" without an index is a full table scan
+        full_scan = any(detail.startswith("SCAN") and "INDEX" not in detail for detail in details)
+        return not full_scan, "; ".join(details)
+
+    cursor.execute("EXPLAIN " + sql, params)
+    columns = [column[0] for column in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    full_scan = any(row.get("type") == "ALL" for row in rows)
+    return not full_scan, "; ".join(f"{row.get('table')}: type={row.get('type')} key={row.get('key')}" for row in rows)
+
+# Function to EXPLAIN every hot query and return [(name, uses_index, plan)]
+def check_query_plans(conn=None, dialect=None):
+    # Imported here because admin_pages itself imports schema
+    import admin_pages
+    dialect = dialect or db.DB_BACKEND
+    own_connection = conn is None
+    conn = conn or db.get_db_connection()
+    cursor = conn.cursor()
+    results = []
+    try:
+        for query_name, params in PLAN_CHECKS:
+            if "MATCH(" in db.PREPARED_QUERIES[query_name] and dialect != "mysql":
+                continue
+            uses_index, plan = explain(cursor, db.PREPARED_QUERIES[query_name], params, dialect)
+            results.append((query_name, uses_index, plan))
+        for page_query, params in ADMIN_PLAN_CHECKS:
+            uses_index, plan = explain(cursor, admin_pages.PAGE_QUERIES[page_query], params, dialect)
+            results.append((f"admin page {page_query[0]}", uses_index, plan))
+    finally:
+        if own_connection:
+            conn.close()
+    return results
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        versions = migrate()
+        print(f"Applied migrations: {versions}" if versions else "Schema is up to date.")
+    elif command == "check-plans":
+        failed = False
+        for query_name, uses_index, plan in check_query_plans():
+            print(f"{'ok  ' if uses_index else 'SCAN'} {query_name}: {plan}")
+            failed = failed or not uses_index
+        sys.exit(1 if failed else 0)
+    else:
+        sys.exit(f"Unknown command {command!r}; expected migrate or check-plans")
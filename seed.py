@@ -0,0 +1,79 @@
+import argparse
+import random
+import time
+from datetime import date, timedelta
+import db
+import schema
+
+# Seeds the database with synthetic campus data for benchmarks and query-plan checks.
+#   DB_BACKEND=sqlite SQLITE_PATH=/tmp/campus.sqlite3 python seed.py --resources 100000
+# Rows reference placeholder file paths; no files are written to uploads/.
+
+BRANCHES = ["CSE", "CSM", "CSIT", "ECE", "EEE", "MECH", "CIVIL", "MCA", "MBA", "IT", "Computer Science", "Data Science"]
+TIMETABLE_KINDS = ["Semester", "Sem", "Year", "Section"]
+SUBJECTS = ["DBMS", "SE", "WPAI", "COA", "FAI", "OS", "CN", "DAA", "TOC", "ML"]
+CATEGORIES = ["PDFs", "Class Timetables", "Event Schedules", "Exam Timetables"]
+BLOCKS = ["A", "B", "C", "D", "LH", "LAB"]
+EVENTS = ["Holiday", "Mid exams begin", "Tech fest", "Sports day", "Guest lecture", "Working Saturday"]
+
+# Function to generate (category, name, file_path) resource rows
+def resource_rows(count, rng):
+    rows = []
+    for position in range(count):
+        category = CATEGORIES[position % len(CATEGORIES)]
+        if category == "PDFs":
+            name = f"{rng.choice(SUBJECTS)} {rng.choice(['pdf', 'ppt', 'notes'])} unit {rng.randint(1, 5)}"
+            extension = ".pdf"
+        else:
+            name = f"{rng.choice(BRANCHES)} {rng.choice(TIMETABLE_KINDS)} {rng.randint(1, 8)}"
+            extension = ".jpg"
+        rows.append((category, name, f"uploads/{name.replace(' ', '_')}_{position}{extension}"))
+    return rows
+
+# Function to generate (room_number, details, room_key) classroom rows with unique room numbers
+def classroom_rows(count, rng):
+    rows = []
+    for position in range(count):
+        room_number = f"{BLOCKS[position % len(BLOCKS)]}-{100 + position}"
+        details = f"Floor {rng.randint(0, 4)}, capacity {rng.choice([30, 60, 90, 120])}, projector: {rng.choice(['yes', 'no'])}"
+        rows.append((room_number, details, schema.normalize_room_number(room_number)))
+    return rows
+
+# Function to generate (date, event) calendar rows, one per day starting today
+def calendar_rows(count, rng):
+    start = date.today()
+    return [((start + timedelta(days=offset)).isoformat(), rng.choice(EVENTS)) for offset in range(count)]
+
+# Function to migrate and bulk-insert synthetic rows in one transaction per table
+def seed(resources=1000, classrooms=200, calendar=365, seed_value=42, batch_size=5000):
+    rng = random.Random(seed_value)
+    schema.migrate()
+    conn = db.get_db_connection()
+    cursor = conn.cursor()
+    counts = {}
+    try:
+        for table, sql, rows in [
+            ("resources", "INSERT INTO resources (category, name, file_path) VALUES (%s, %s, %s)", resource_rows(resources, rng)),
+            ("classrooms", "INSERT INTO classrooms (room_number, details, room_key) VALUES (%s, %s, %s)", classroom_rows(classrooms, rng)),
+            ("calendar", "INSERT INTO calendar (date, event) VALUES (%s, %s)", calendar_rows(calendar, rng)),
+        ]:
+            conn.start_transaction()
+            for start in range(0, len(rows), batch_size):
+                cursor.executemany(sql, rows[start:start + batch_size])
+            conn.commit()
+            counts[table] = len(rows)
+    finally:
+        conn.close()
+    return counts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the campus_buddy database with synthetic data")
+    parser.add_argument("--resources", type=int, default=1000)
+    parser.add_argument("--classrooms", type=int, default=200)
+    parser.add_argument("--calendar", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed(args.resources, args.classrooms, args.calendar, args.seed)
+    print(f"Seeded {counts} in {time.perf_counter() - started:.2f} s")
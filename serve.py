@@ -0,0 +1,10 @@
+import streamlit as st
+import file_server
+
+# Entry point that also serves uploads on the app's own origin: streamlit run serve.py
+# (or any ASGI server, e.g. uvicorn serve:app). The app itself is app1.py, unchanged;
+# this adds file_server.py's /files/, /display/ and /thumbnails/ routes to the Streamlit
+# server under /uploads-files/, so chat attachments stream from disk without
+# FILE_SERVER_URL, a second port or Streamlit's in-memory download buttons.
+
+app = st.App("app1.py", routes=file_server.app_routes())
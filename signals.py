@@ -0,0 +1,90 @@
+import logging
+import threading
+import uuid
+
+# Minimal in-process publish/subscribe hooks. The admin panel publishes after it
+# commits a write; caches and indexes subscribe so they can patch themselves.
+#
+# Topics used in this app:
+#   resource_added    id, category, name, file_path
+#   resource_updated  id, category, name, file_path
+#   resource_deleted  id, category
+#   resource_processed  id, category, file_path (its upload job finished; job_queue.py)
+#   resources_reloaded  categories (bulk import; reload rather than patch)
+#   classrooms_changed  (no payload)
+#   calendar_changed    (no payload)
+#   caches_stale        (no payload; this worker missed events from other workers)
+#
+# With several app workers, set_bus() connects a shared event log (state_backend):
+# publish() also appends the event there, and poll(), called once per script run,
+# replays events published by other workers to this worker's subscribers.
+
+logger = logging.getLogger(__name__)
+
+_subscribers = {}
+_lock = threading.Lock()
+
+WORKER_ID = uuid.uuid4().hex
+_bus = None
+_bus_seq = 0
+_poll_lock = threading.Lock()
+
+# Function to register a callback for a topic
+def subscribe(topic, callback):
+    with _lock:
+        callbacks = _subscribers.setdefault(topic, [])
+        if callback not in callbacks:
+            callbacks.append(callback)
+
+# Function to run this worker's subscribers for a topic; one failing subscriber never blocks the rest
+def _dispatch(topic, payload):
+    with _lock:
+        callbacks = list(_subscribers.get(topic, ()))
+    for callback in callbacks:
+        try:
+            callback(**payload)
+        except Exception:
+            logger.exception("Subscriber %r failed for %s", callback, topic)
+
+# Function to notify every subscriber of a topic, on this worker and (through the bus) the others
+def publish(topic, **payload):
+    _dispatch(topic, payload)
+    if _bus is not None:
+        try:
+            _bus.publish_event({"topic": topic, "payload": payload, "origin": WORKER_ID})
+        except Exception:
+            logger.exception("Could not share %s with other workers", topic)
+
+# Function to connect the shared event log (a state backend with publish_event/events_since)
+def set_bus(bus):
+    global _bus, _bus_seq
+    with _poll_lock:
+        if bus is _bus:
+            return
+        _bus = bus
+        # Start from the current end of the log: caches built from now on are already fresh
+        _bus_seq = bus.events_since(0)[0] if bus is not None else 0
+
+# Function to replay events other workers published since the last poll
+def poll():
+    global _bus_seq
+    if _bus is None:
+        return
+    with _poll_lock:
+        try:
+            latest, events = _bus.events_since(_bus_seq)
+        except Exception:
+            logger.exception("Could not read events from other workers")
+            return
+        if events is None:
+            # Too far behind to replay: the caches are dropped and reading resumes at the end of the log
+            _bus_seq = max(_bus_seq, latest)
+        elif events:
+            # Only as far as the events actually read, so nothing published meanwhile is skipped
+            _bus_seq = events[-1]["seq"]
+    if events is None:
+        _dispatch("caches_stale", {})
+        return
+    for event in events:
+        if event.get("origin") != WORKER_ID:
+            _dispatch(event["topic"], event.get("payload") or {})
@@ -0,0 +1,310 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+# Per-session state (chat history, admin edit forms) kept outside the Streamlit process,
+# so any worker behind a load balancer can serve any session.
+#
+#   STATE_BACKEND=memory   in-process dicts (default; single worker)
+#   STATE_BACKEND=redis    Redis / Valkey / KeyDB at REDIS_URL, shared by all workers
+#   STATE_BACKEND=fake     FakeRedis: the Redis adapter over an in-process fake (tests, load tests)
+#
+# Sessions are identified by a random id kept in the page URL (?sid=...), so a browser
+# that reconnects to another worker keeps its conversation. The backend also carries a
+# short event log that signals.py uses to replay admin writes on the other workers.
+
+SESSION_TTL = int(os.getenv("STATE_SESSION_TTL", str(7 * 24 * 3600)))
+# Events kept for workers that fall behind; a worker further behind drops all its caches
+EVENT_LOG_SIZE = 1000
+
+# Numbers an event and appends it to the log in one atomic step, so a reader never sees the
+# sequence counter ahead of the log. The seq is spliced into the event's JSON text rather
+# than round-tripped through cjson, which turns empty lists into objects.
+# KEYS: counter, log; ARGV: event JSON object (non-empty), log size
+PUBLISH_EVENT_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('RPUSH', KEYS[2], '{"seq": ' .. seq .. ', ' .. string.sub(ARGV[1], 2))
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+return seq
+"""
+
+
+class InMemoryStateBackend:
+    # Not shared between processes, so there is nothing to replay across workers
+    shared = False
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._values = {}
+        self._lists = {}
+        self._written = {}
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    # Function to note a write and, every 1000 writes, drop keys idle for longer than ttl (as Redis EXPIRE would)
+    def _touch(self, key):
+        now = time.monotonic()
+        self._written[key] = now
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            for stale_key in [stale for stale, written in self._written.items() if now - written > self.ttl]:
+                self._values.pop(stale_key, None)
+                self._lists.pop(stale_key, None)
+                del self._written[stale_key]
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._values.get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+            self._touch(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._values.pop(key, None)
+            self._lists.pop(key, None)
+            self._written.pop(key, None)
+
+    def append(self, key, value):
+        with self._lock:
+            self._lists.setdefault(key, []).append(value)
+            self._touch(key)
+
+    # Function to read list items start..end inclusive (negative indexes count from the end, as in Redis)
+    def items(self, key, start=0, end=-1):
+        with self._lock:
+            values = self._lists.get(key, [])
+            end = len(values) + end if end < 0 else end
+            start = max(len(values) + start, 0) if start < 0 else start
+            return list(values[start:end + 1])
+
+    def length(self, key):
+        with self._lock:
+            return len(self._lists.get(key, []))
+
+    # Function to keep only list items start..end inclusive (Redis LTRIM semantics)
+    def trim(self, key, start, end):
+        with self._lock:
+            values = self._lists.get(key, [])
+            end = len(values) + end if end < 0 else end
+            start = max(len(values) + start, 0) if start < 0 else start
+            values[:] = values[start:end + 1]
+
+    def publish_event(self, event):
+        return 0
+
+    def events_since(self, seq):
+        return seq, []
+
+
+class RedisStateBackend:
+    shared = True
+
+    # client is a redis.Redis created with decode_responses=True (or FakeRedis)
+    def __init__(self, client, prefix="campus_buddy:", ttl=SESSION_TTL):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def get(self, key, default=None):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else default
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, json.dumps(value), ex=self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def append(self, key, value):
+        self.client.rpush(self.prefix + key, json.dumps(value))
+        self.client.expire(self.prefix + key, self.ttl)
+
+    def items(self, key, start=0, end=-1):
+        return [json.loads(value) for value in self.client.lrange(self.prefix + key, start, end)]
+
+    def length(self, key):
+        return self.client.llen(self.prefix + key)
+
+    def trim(self, key, start, end):
+        self.client.ltrim(self.prefix + key, start, end)
+
+    # Function to append an event to the shared log; returns its sequence number
+    def publish_event(self, event):
+        return int(self.client.eval(PUBLISH_EVENT_SCRIPT, 2, self.prefix + "events:seq", self.prefix + "events",
+                                    json.dumps(event), EVENT_LOG_SIZE))
+
+    # Function to get (highest seq read, events after seq); events is None when some were already trimmed away.
+    # Publishing is atomic, so the log holds every event up to the counter in order; the tail is
+    # read again in full when events published meanwhile pushed the wanted ones out of the window.
+    def events_since(self, seq):
+        latest = int(self.client.get(self.prefix + "events:seq") or 0)
+        if latest <= seq:
+            return seq, []
+        if latest - seq > EVENT_LOG_SIZE:
+            return latest, None
+        for count in (latest - seq + 16, EVENT_LOG_SIZE):
+            raw = self.client.lrange(self.prefix + "events", -min(count, EVENT_LOG_SIZE), -1)
+            events = [event for event in map(json.loads, raw) if event["seq"] > seq]
+            if events and events[0]["seq"] == seq + 1:
+                return events[-1]["seq"], events
+        return latest, None
+
+
+class FakeRedis:
+    # The subset of Redis commands RedisStateBackend uses, with Redis semantics and decoded strings
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def get(self, key):
+        with self._lock:
+            return self._live(key)
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = str(value)
+            if ex:
+                self._expires[key] = time.monotonic() + ex
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                removed += self._live(key) is not None
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return removed
+
+    def incr(self, key):
+        with self._lock:
+            value = int(self._live(key) or 0) + 1
+            self._data[key] = str(value)
+            return value
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if self._live(key) is None:
+                return False
+            self._expires[key] = time.monotonic() + seconds
+            return True
+
+    def rpush(self, key, *values):
+        with self._lock:
+            items = self._live(key)
+            if items is None:
+                items = self._data[key] = []
+            items.extend(str(value) for value in values)
+            return len(items)
+
+    def llen(self, key):
+        with self._lock:
+            return len(self._live(key) or [])
+
+    def lrange(self, key, start, end):
+        with self._lock:
+            items = self._live(key) or []
+            length = len(items)
+            start = max(length + start, 0) if start < 0 else start
+            end = length + end if end < 0 else end
+            return list(items[start:end + 1])
+
+    def ltrim(self, key, start, end):
+        with self._lock:
+            self._ltrim(key, start, end)
+            return True
+
+    def _ltrim(self, key, start, end):
+        items = self._live(key)
+        if items is not None:
+            length = len(items)
+            start = max(length + start, 0) if start < 0 else start
+            end = length + end if end < 0 else end
+            items[:] = items[start:end + 1]
+
+    # Only the adapter's own script is supported, run atomically under the lock like Redis would
+    def eval(self, script, numkeys, *keys_and_args):
+        if script != PUBLISH_EVENT_SCRIPT:
+            raise NotImplementedError("FakeRedis only runs PUBLISH_EVENT_SCRIPT")
+        (seq_key, log_key), (event, log_size) = keys_and_args[:numkeys], keys_and_args[numkeys:]
+        with self._lock:
+            seq = int(self._live(seq_key) or 0) + 1
+            self._data[seq_key] = str(seq)
+            items = self._live(log_key)
+            if items is None:
+                items = self._data[log_key] = []
+            items.append(f'{{"seq": {seq}, ' + event[1:])
+            self._ltrim(log_key, -int(log_size), -1)
+            return seq
+
+_backend = None
+_backend_lock = threading.Lock()
+
+# Function to create the backend named by STATE_BACKEND
+def create_backend():
+    kind = os.getenv("STATE_BACKEND", "memory")
+    if kind == "redis":
+        import redis
+        return RedisStateBackend(redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"), decode_responses=True))
+    if kind == "fake":
+        return RedisStateBackend(FakeRedis())
+    return InMemoryStateBackend()
+
+# Function to get the state backend shared by this process
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+# Function to make a new session id
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+class SessionState:
+    # One session's view of the backend: named values (admin forms) and lists (chat history)
+    def __init__(self, session_id, backend=None):
+        self.session_id = session_id
+        self.backend = backend or get_backend()
+
+    def _key(self, name):
+        return f"session:{self.session_id}:{name}"
+
+    def items(self, name, start=0, end=-1):
+        return self.backend.items(self._key(name), start, end)
+
+    def append(self, name, value):
+        self.backend.append(self._key(name), value)
+
+    def length(self, name):
+        return self.backend.length(self._key(name))
+
+    def trim(self, name, start, end):
+        self.backend.trim(self._key(name), start, end)
+
+    def get(self, name, default=None):
+        return self.backend.get(self._key(name), default)
+
+    def set(self, name, value):
+        self.backend.set(self._key(name), value)
+
+    def clear(self, name):
+        self.backend.delete(self._key(name))
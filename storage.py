@@ -0,0 +1,86 @@
+import os
+import tempfile
+import threading
+
+# File storage behind one small interface, so every app worker sees the same uploads.
+# Keys are the paths stored in the database (e.g. "uploads/blobs/ab/<digest>.pdf");
+# LocalStorage maps them under STORAGE_ROOT, which for a multi-worker deployment is a
+# volume shared by all workers (NFS, EFS, a Kubernetes ReadWriteMany claim, ...).
+# Writes go to a temporary file and are renamed into place, so a reader on another
+# worker never sees a half-written file.
+
+STORAGE_ROOT = os.getenv("STORAGE_ROOT", ".")
+
+
+class LocalStorage:
+    def __init__(self, root=STORAGE_ROOT):
+        self.root = os.path.abspath(root)
+
+    # Function to map a storage key to a path on this machine
+    def local_path(self, key):
+        return os.path.join(self.root, key)
+
+    def exists(self, key):
+        return os.path.isfile(self.local_path(key))
+
+    def size(self, key):
+        return os.path.getsize(self.local_path(key))
+
+    def modified(self, key):
+        return os.path.getmtime(self.local_path(key))
+
+    def open(self, key):
+        return open(self.local_path(key), "rb")
+
+    # Function to set a key's modification time to now; raises FileNotFoundError if it is gone
+    def touch(self, key):
+        os.utime(self.local_path(key))
+
+    # Function to write a file under a temporary key via writer(f); returns the temporary key
+    def write_temp(self, folder, writer):
+        os.makedirs(self.local_path(folder), exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(dir=self.local_path(folder), suffix=".part")
+        try:
+            with os.fdopen(descriptor, "wb") as target:
+                writer(target)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return os.path.join(folder, os.path.basename(temp_path))
+
+    # Function to atomically move a (temporary) key onto its final key
+    def move(self, source_key, key):
+        os.makedirs(os.path.dirname(self.local_path(key)), exist_ok=True)
+        os.replace(self.local_path(source_key), self.local_path(key))
+
+    # Function to write a key atomically via writer(f)
+    def write(self, key, writer):
+        self.move(self.write_temp(os.path.dirname(key), writer), key)
+
+    # Function to delete a key; returns the bytes freed (0 when it did not exist)
+    def delete(self, key):
+        try:
+            size = self.size(key)
+            os.remove(self.local_path(key))
+            return size
+        except FileNotFoundError:
+            return 0
+
+    # Function to list every key under a folder key
+    def walk(self, folder):
+        for directory, _, files in os.walk(self.local_path(folder)):
+            relative = os.path.relpath(directory, self.root)
+            for file_name in files:
+                yield os.path.normpath(os.path.join(relative, file_name))
+
+_storage = None
+_storage_lock = threading.Lock()
+
+# Function to get the storage shared by this process
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = LocalStorage()
+    return _storage
@@ -0,0 +1,20 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# The app modules live at the repository root (flat layout), one level up from tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules read their settings at import time, so point them at a throwaway SQLite stand-in,
+# file store and stub Gemini backend before any test imports them
+WORK_DIR = tempfile.mkdtemp(prefix="campus_tests_")
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+os.environ.setdefault("DB_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_PATH", os.path.join(WORK_DIR, "campus.sqlite3"))
+os.environ.setdefault("STORAGE_ROOT", WORK_DIR)
+os.environ.setdefault("RAG_INDEX_DIR", os.path.join(WORK_DIR, "rag_index"))
+os.environ.setdefault("GEMINI_BACKEND", "stub")
+os.environ.setdefault("STATE_BACKEND", "memory")
+os.environ.setdefault("JOB_RUN_IN_APP", "0")
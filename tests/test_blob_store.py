@@ -0,0 +1,47 @@
+import io
+import pytest
+import admin_actions
+import blob_store
+import db
+import schema
+from storage import get_storage
+
+# Content-addressed uploads on the SQLite stand-in: references, reuse and garbage collection.
+
+
+@pytest.fixture(autouse=True)
+def migrated():
+    schema.ensure_schema()
+
+
+def resource_path(resource_id):
+    conn = db.get_db_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT file_path FROM resources WHERE id=%s", (resource_id,))
+        return cursor.fetchone()[0]
+    finally:
+        conn.close()
+
+# The same bytes under another extension reuse the first upload's blob, which GC keeps
+def test_same_content_under_another_extension_shares_one_blob():
+    payload = b"same picture, two names"
+    first = admin_actions.add_resource("Event Schedules", "Poster A", io.BytesIO(payload), "a.jpg")
+    second = admin_actions.add_resource("Event Schedules", "Poster B", io.BytesIO(payload), "b.jpeg")
+
+    assert resource_path(second) == resource_path(first)
+    assert resource_path(first).endswith(".jpg")
+    assert not get_storage().exists(resource_path(first)[:-len(".jpg")] + ".jpeg")
+
+    blob_store.collect_garbage(grace_seconds=0)
+    assert get_storage().exists(resource_path(second))
+
+# A reference taken with another path (a concurrent first upload won the row) gets the recorded path back
+def test_acquire_returns_the_recorded_path():
+    payload = b"raced upload"
+    digest, path, size, _ = blob_store.store(io.BytesIO(payload), ".png")
+    with db.transaction() as cursor:
+        assert blob_store.acquire(cursor, digest, path, size) == path
+    with db.transaction() as cursor:
+        other = blob_store.blob_path(digest, ".webp")
+        assert blob_store.acquire(cursor, digest, other, size) == path
@@ -0,0 +1,59 @@
+import io
+import json
+import zipfile
+import pytest
+import bulk_import
+import schema
+
+# Bulk import input validation: anything malformed is reported as a ValueError, which the
+# admin panel shows as an error message instead of crashing the page.
+
+
+@pytest.fixture(autouse=True)
+def migrated():
+    schema.ensure_schema()
+
+
+# Function to build an in-memory ZIP from {member: bytes}
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for member, data in members.items():
+            archive.writestr(member, data)
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize("manifest", [
+    {"category": "PDFs", "name": "Notes", "file": "notes.pdf"},
+    ["PDFs,Notes,notes.pdf"],
+    [{"category": "PDFs", "name": "Notes", "file": "notes.pdf"}, "PDFs"],
+    "notes.pdf",
+])
+def test_json_manifest_that_is_not_a_list_of_objects(manifest):
+    archive = make_zip({"manifest.json": json.dumps(manifest), "notes.pdf": b"%PDF-1.4"})
+    with pytest.raises(ValueError, match="list of objects"):
+        bulk_import.import_resources_zip(archive)
+
+
+def test_json_manifest_that_does_not_parse():
+    archive = make_zip({"manifest.json": "[{\"category\": ", "notes.pdf": b"%PDF-1.4"})
+    with pytest.raises(ValueError, match="manifest.json could not be read"):
+        bulk_import.import_resources_zip(archive)
+
+
+def test_upload_that_is_not_a_zip():
+    with pytest.raises(ValueError, match="not a ZIP"):
+        bulk_import.import_resources_zip(io.BytesIO(b"%PDF-1.4 not an archive"))
+
+
+def test_csv_rows_with_extra_fields_keep_their_columns():
+    rows = bulk_import.read_csv_rows(io.BytesIO(b"room_number,details\nA-101,Lab,extra\n"))
+    assert rows == [{"room_number": "A-101", "details": "Lab"}]
+
+
+def test_valid_manifest_imports():
+    manifest = [{"Category": "PDFs", "Name": "Compiler notes", "File": "notes.pdf"}]
+    archive = make_zip({"manifest.json": json.dumps(manifest), "notes.pdf": b"%PDF-1.4 compiler"})
+    report = bulk_import.import_resources_zip(archive)
+    assert (report["imported"], report["errors"]) == (1, [])
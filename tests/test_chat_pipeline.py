@@ -0,0 +1,30 @@
+import pytest
+import admin_actions
+import chat_pipeline
+import schema
+
+# Answers from campus data (no AI): classroom lookups through the shared classroom map.
+
+
+@pytest.fixture(scope="module", autouse=True)
+def classrooms():
+    schema.ensure_schema()
+    admin_actions.add_classroom("A-204", "Block A, second floor, 60 seats")
+    admin_actions.add_classroom("Room 305", "Main block, third floor")
+
+
+@pytest.mark.parametrize("message, details", [
+    ("classroom A-204", "Block A, second floor, 60 seats"),
+    ("room a204", "Block A, second floor, 60 seats"),
+    ("room 204", "Block A, second floor, 60 seats"),
+    ("where is room 305", "Main block, third floor"),
+    ("classroom 30", "Main block, third floor"),
+])
+def test_classroom_details(message, details):
+    response, attachment = chat_pipeline.answer_from_campus_data(message)
+    assert details in response and attachment is None
+
+
+def test_unknown_classroom():
+    response, _ = chat_pipeline.answer_from_campus_data("room 999")
+    assert response == "Sorry, I couldn't find details for that classroom."
@@ -0,0 +1,32 @@
+import os
+import pytest
+import file_server
+
+# Which request paths the upload routes answer; generated folders and partial writes stay private.
+
+
+@pytest.fixture(autouse=True)
+def uploads():
+    for relative in ("blobs/ab/abcd.pdf", "blobs/ab/tmpx.part", ".text/blobs/ab/abcd.txt", "notes.pdf"):
+        path = os.path.join(file_server.UPLOADS_DIR, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4")
+
+
+@pytest.mark.parametrize("relative, served", [
+    ("blobs/ab/abcd.pdf", True),
+    ("notes.pdf", True),
+    ("blobs/ab/tmpx.part", False),
+    (".text/blobs/ab/abcd.txt", False),
+    ("blobs/../.text/blobs/ab/abcd.txt", False),
+    ("../campus.sqlite3", False),
+])
+def test_resolve(relative, served):
+    assert (file_server._resolve(relative) is not None) == served
+
+
+def test_blob_originals_are_immutable():
+    full_path, immutable = file_server._lookup("files", "blobs/ab/abcd.pdf")
+    assert full_path.endswith(os.path.join("blobs", "ab", "abcd.pdf")) and immutable
+    assert file_server._lookup("metrics", "blobs/ab/abcd.pdf") is None
@@ -0,0 +1,107 @@
+import threading
+import time
+import pytest
+from gemini_gateway import GeminiGateway, StubBackend, TTLCache, normalize_prompt
+
+# The Gemini gateway against StubBackend: response cache, coalescing of identical prompts,
+# and releasing the upstream stream once every reader has gone.
+
+
+# Function to wait (briefly) until condition() holds
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out waiting"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+# Responder that holds every upstream call until the test releases it
+def gated(release):
+    def respond(prompt):
+        release.wait(5)
+        return f"answer to {prompt}"
+    return respond
+
+
+def test_cache_entries_expire_after_ttl(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    cache = TTLCache(max_size=4, ttl=10)
+    cache.set("dbms", "answer")
+    now[0] += 9
+    assert cache.get("dbms") == "answer"
+    now[0] += 2
+    assert cache.get("dbms") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+
+
+def test_generate_coalesces_identical_prompts_then_caches(release):
+    backend = StubBackend(responder=gated(release))
+    gateway = GeminiGateway(backend, max_concurrency=2, timeout=5)
+    first = gateway.submit("What is DBMS?")
+    second = gateway.submit("what is dbms ")
+    assert second is first
+    release.set()
+    assert first.result(5) == "answer to What is DBMS?"
+    wait_for(lambda: gateway.stats()["in_flight"] == 0)
+    assert gateway.generate("WHAT IS DBMS") == "answer to What is DBMS?"
+    stats = gateway.stats()
+    assert (backend.calls, stats["coalesced"], stats["cache_hits"]) == (1, 1, 1)
+
+
+def test_concurrent_streams_share_one_upstream_call(release):
+    backend = StubBackend(responder=gated(release))
+    gateway = GeminiGateway(backend, max_concurrency=2, timeout=5)
+    answers = []
+    readers = [threading.Thread(target=lambda: answers.append("".join(gateway.stream("explain joins"))))
+               for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    wait_for(lambda: gateway.stats()["coalesced"] == 1)
+    release.set()
+    for reader in readers:
+        reader.join(5)
+    assert answers == ["answer to explain joins"] * 2
+    assert backend.calls == 1
+    assert gateway.cache.get(normalize_prompt("explain joins")) == "answer to explain joins"
+
+
+def test_abandoned_stream_releases_the_producer():
+    backend = StubBackend(responder=lambda prompt: "word " * 500, chunk_latency=0.01)
+    gateway = GeminiGateway(backend, max_concurrency=1, timeout=5)
+    chunks = gateway.stream("a long answer")
+    assert next(chunks) == "word "
+    started = time.monotonic()
+    chunks.close()
+    # The producer stops at its next chunk instead of draining the 5 s answer
+    wait_for(lambda: gateway.stats()["in_flight"] == 0, timeout=2)
+    assert time.monotonic() - started < 2
+    assert gateway.cache.get(normalize_prompt("a long answer")) is None
+
+
+def test_stream_given_up_before_its_slot_frees_never_calls_upstream(release):
+    backend = StubBackend(responder=gated(release))
+    gateway = GeminiGateway(backend, max_concurrency=1, timeout=5)
+    busy = gateway.submit("occupies the only slot")
+    with pytest.raises(TimeoutError):
+        "".join(gateway.stream("waits for the slot", timeout=0.05))
+    release.set()
+    busy.result(5)
+    wait_for(lambda: gateway.stats()["in_flight"] == 0)
+    assert backend.calls == 1
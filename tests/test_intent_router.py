@@ -0,0 +1,58 @@
+import pytest
+import intent_router
+from intent_router import (INTENT_CLASSROOM, INTENT_EDUCATIONAL, INTENT_LLM, INTENT_RESOURCE,
+                           INTENT_TODAYS_EVENTS)
+
+# Routing table for intent_router.route; benchmarks/bench_intent_router.py times the
+# router over the same messages.
+
+# message, expected intent, expected category, expected query (None = not checked)
+ROUTING_CORPUS = [
+    ("What are today's events?", INTENT_TODAYS_EVENTS, None, None),
+    ("any schedule for today", INTENT_TODAYS_EVENTS, None, None),
+    ("Today events", INTENT_TODAYS_EVENTS, None, None),
+    ("classroom 101", INTENT_CLASSROOM, None, "101"),
+    ("where is room 204", INTENT_CLASSROOM, None, "where is 204"),
+    ("class 3B", INTENT_CLASSROOM, None, "3b"),
+    ("exam timetable for cse 3rd sem", INTENT_RESOURCE, "Exam Timetables", "for cse 3rd sem"),
+    ("exam time table ece", INTENT_RESOURCE, "Exam Timetables", "ece"),
+    ("exam schedule mca", INTENT_RESOURCE, "Exam Timetables", "mca"),
+    ("examination dates", INTENT_RESOURCE, "Exam Timetables", "dates"),
+    ("class timetable csm semester 3", INTENT_RESOURCE, "Class Timetables", "csm semester 3"),
+    ("class schedule for mca", INTENT_RESOURCE, "Class Timetables", "for mca"),
+    ("timetable for class 3", INTENT_RESOURCE, "Class Timetables", "for class 3"),
+    ("room 101 timetable", INTENT_RESOURCE, "Class Timetables", "room 101"),
+    ("time table csit sem 1", INTENT_RESOURCE, "Class Timetables", "csit sem 1"),
+    ("event schedule for fest", INTENT_RESOURCE, "Event Schedules", "for fest"),
+    ("tech fest events", INTENT_RESOURCE, "Event Schedules", "tech fest"),
+    ("DBMS pdf", INTENT_RESOURCE, "PDFs", "dbms"),
+    ("send me the SE pdfs", INTENT_RESOURCE, "PDFs", "send me the se"),
+    ("holiday list", INTENT_RESOURCE, "Working Days & Holidays", "list"),
+    ("working days in march", INTENT_RESOURCE, "Working Days & Holidays", "in march"),
+    ("academic calendar", INTENT_RESOURCE, "Working Days & Holidays", "academic"),
+    ("mca semester 1", INTENT_EDUCATIONAL, "Class Timetables", "mca semester 1"),
+    ("cse mid exam", INTENT_EDUCATIONAL, "Exam Timetables", "cse mid exam"),
+    ("IT 2nd year", INTENT_EDUCATIONAL, "Class Timetables", "IT 2nd year"),
+    ("final test civil", INTENT_EDUCATIONAL, "Exam Timetables", "final test civil"),
+    ("what is DBMS?", INTENT_LLM, None, None),
+    ("explain it with an example", INTENT_LLM, None, None),
+    ("how do classes work in python", INTENT_LLM, None, None),
+    ("tell me about mushrooms", INTENT_LLM, None, None),
+]
+
+
+@pytest.mark.parametrize("message, intent, category, query", ROUTING_CORPUS)
+def test_route(message, intent, category, query):
+    result = intent_router.route(message)
+    assert (result.intent, result.category) == (intent, category)
+    if query is not None:
+        assert result.query == query
+
+# Punctuation between the tokens of a phrase still matches it, and is stripped with it
+@pytest.mark.parametrize("message, query", [
+    ("Exam-Time  table, for CSE!!", ", for cse!!"),
+    ("classroom: A-204", ": a-204"),
+    ("room room 5", "5"),
+])
+def test_query_keeps_text_around_the_phrase(message, query):
+    assert intent_router.route(message).query == query
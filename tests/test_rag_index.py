@@ -0,0 +1,49 @@
+import os
+import time
+import pytest
+
+np = pytest.importorskip("numpy")
+import rag_index
+
+# The segmented RAG index on disk: loading an index whose manifest names a lost segment.
+
+TEXTS = {
+    1: ("DBMS notes", ["normalization removes redundancy from relational tables"]),
+    2: ("Networks notes", ["tcp guarantees ordered delivery while udp does not"]),
+}
+
+
+# Function to index each document in its own segment; returns the index
+def build(index_dir):
+    index = rag_index.RagIndex(str(index_dir))
+    for resource_id, (name, texts) in TEXTS.items():
+        index.apply_changes(added={resource_id: (name, f"uploads/{resource_id}.pdf", texts)})
+    return index
+
+
+# Function to delete the vectors of the segment holding a document
+def lose_segment(index_dir, resource_id):
+    index = rag_index.RagIndex(str(index_dir))
+    segment = index._read_manifest()["documents"][str(resource_id)]["segment"]
+    os.remove(os.path.join(str(index_dir), segment + ".npy"))
+
+
+def test_missing_segment_is_dropped_instead_of_retried_forever(tmp_path):
+    build(tmp_path)
+    lose_segment(tmp_path, 1)
+    started = time.monotonic()
+    index = rag_index.RagIndex(str(tmp_path))
+    assert time.monotonic() - started < 2
+    assert set(index.documents()) == {"2"}
+    assert index.search("tcp and udp delivery")[0][1] == "Networks notes"
+
+
+def test_next_write_repairs_the_manifest(tmp_path):
+    build(tmp_path)
+    lose_segment(tmp_path, 1)
+    index = rag_index.RagIndex(str(tmp_path))
+    name, texts = TEXTS[1]
+    index.apply_changes(added={1: (name, "uploads/1.pdf", texts)})
+    reloaded = rag_index.RagIndex(str(tmp_path))
+    assert set(reloaded.documents()) == {"1", "2"}
+    assert reloaded.search("normalization of relational tables")[0][1] == "DBMS notes"
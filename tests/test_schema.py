@@ -0,0 +1,25 @@
+import pytest
+import db
+import schema
+import seed
+
+# EXPLAIN-based regression tests: every hot query and admin page query must be served by an
+# index on a migrated, seeded database (python schema.py check-plans runs the same checks).
+
+
+@pytest.fixture
+def seeded_database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "SQLITE_PATH", str(tmp_path / "plans.sqlite3"))
+    seed.seed(resources=500, classrooms=100, calendar=120)
+
+
+def test_migrate_is_idempotent(seeded_database):
+    assert schema.migrate() == []
+
+
+def test_query_plans_use_indexes(seeded_database):
+    results = schema.check_query_plans()
+    assert {name for name, _, _ in results} >= {"resource_by_name_prefix", "events_on_date", "classroom_by_key",
+                                                 "admin page resources", "admin page calendar"}
+    scans = [f"{name}: {plan}" for name, uses_index, plan in results if not uses_index]
+    assert not scans
@@ -0,0 +1,77 @@
+import pytest
+import signals
+import state_backend
+from state_backend import FakeRedis, RedisStateBackend
+
+# The shared event log (RedisStateBackend over FakeRedis) and its replay by signals.poll().
+
+
+@pytest.fixture
+def bus(monkeypatch):
+    # A short log, so falling behind it takes a handful of events
+    monkeypatch.setattr(state_backend, "EVENT_LOG_SIZE", 5)
+    backend = RedisStateBackend(FakeRedis())
+    yield backend
+    signals.set_bus(None)
+
+
+@pytest.fixture
+def received():
+    events = []
+    for topic in ("test_event", "caches_stale"):
+        signals.subscribe(topic, lambda topic=topic, **payload: events.append((topic, payload)))
+    return events
+
+
+# Function to publish an event as another worker would
+def publish_elsewhere(bus, number):
+    return bus.publish_event({"topic": "test_event", "payload": {"number": number}, "origin": "other-worker"})
+
+
+def test_events_since_returns_events_in_order(bus):
+    for number in range(1, 4):
+        assert publish_elsewhere(bus, number) == number
+    latest, events = bus.events_since(1)
+    assert latest == 3
+    assert [(event["seq"], event["payload"]["number"]) for event in events] == [(2, 2), (3, 3)]
+    assert bus.events_since(3) == (3, [])
+
+
+def test_events_since_reports_trimmed_events(bus):
+    for number in range(1, 8):
+        publish_elsewhere(bus, number)
+    # Events 1-2 fell out of the 5-event log
+    assert bus.events_since(0) == (7, None)
+    latest, events = bus.events_since(2)
+    assert (latest, [event["seq"] for event in events]) == (7, [3, 4, 5, 6, 7])
+
+
+def test_poll_replays_other_workers_events_once(bus, received):
+    signals.set_bus(bus)
+    publish_elsewhere(bus, 1)
+    # This worker's own events were already dispatched locally when published
+    signals.publish("test_event", number=2)
+    publish_elsewhere(bus, 3)
+    received.clear()
+    signals.poll()
+    signals.poll()
+    assert received == [("test_event", {"number": 1}), ("test_event", {"number": 3})]
+
+
+def test_poll_starts_at_the_end_of_the_log(bus, received):
+    publish_elsewhere(bus, 1)
+    signals.set_bus(bus)
+    signals.poll()
+    assert received == []
+
+
+def test_poll_drops_caches_when_too_far_behind(bus, received):
+    signals.set_bus(bus)
+    for number in range(1, 8):
+        publish_elsewhere(bus, number)
+    signals.poll()
+    assert received == [("caches_stale", {})]
+    # Reading resumes at the end of the log
+    publish_elsewhere(bus, 8)
+    signals.poll()
+    assert received[-1] == ("test_event", {"number": 8})
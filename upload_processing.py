@@ -0,0 +1,118 @@
+import io
+import os
+import shlex
+import subprocess
+import blob_store
+import db
+from job_queue import JobRejected
+from storage import get_storage
+
+# Post-processing of an uploaded resource, run by job_queue.py in a worker process
+# after the upload has returned:
+#   1. validation: the file exists, is not empty and its content matches its
+#      extension; with VIRUS_SCAN_COMMAND set (e.g. "clamdscan --no-summary") it is
+#      also scanned. A file that fails is removed and the job ends as rejected.
+#   2. images: the upload itself is kept untouched (it stays the download); an oversized
+#      timetable photo gets a downscaled/recompressed display copy next to it
+#      (blob_store.display_path), and the file server's thumbnail is generated ahead
+#      of the first view
+#   3. PDFs: the text is extracted (and cached) for the RAG index
+# The returned signals are published by the app process, which updates its indexes.
+
+# Leading bytes each extension's content must start with
+SIGNATURES = {
+    ".pdf": (b"%PDF-",),
+    ".jpg": (b"\xff\xd8\xff",),
+    ".jpeg": (b"\xff\xd8\xff",),
+    ".png": (b"\x89PNG\r\n\x1a\n",),
+}
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Longest side kept for uploaded images; phone photos of timetables are often 4000+ px
+IMAGE_MAX_SIDE = int(os.getenv("UPLOAD_IMAGE_MAX_SIDE", "2400"))
+JPEG_QUALITY = 85
+# A recompressed display copy is only kept when it saves at least this fraction
+MIN_SAVING = 0.1
+VIRUS_SCAN_COMMAND = os.getenv("VIRUS_SCAN_COMMAND")
+VIRUS_SCAN_TIMEOUT = 300
+
+# Function to check a stored file; raises ValueError with the reason when it must not be served
+def validate(file_path):
+    files = get_storage()
+    if not files.exists(file_path):
+        raise ValueError(f"{file_path} does not exist")
+    if files.size(file_path) == 0:
+        raise ValueError("the file is empty")
+
+    extension = os.path.splitext(file_path)[1].lower()
+    with files.open(file_path) as f:
+        head = f.read(16)
+    if extension in SIGNATURES and not head.startswith(SIGNATURES[extension]):
+        raise ValueError(f"the content is not a {extension[1:].upper()} file")
+
+    if VIRUS_SCAN_COMMAND:
+        # ClamAV convention: exit code 1 means a signature matched, anything else but 0 is a scanner error
+        scan = subprocess.run(shlex.split(VIRUS_SCAN_COMMAND) + [files.local_path(file_path)],
+                              capture_output=True, text=True, timeout=VIRUS_SCAN_TIMEOUT)
+        if scan.returncode == 1:
+            raise ValueError(f"virus scan: {scan.stdout.strip()[:500]}")
+        if scan.returncode != 0:
+            raise RuntimeError(f"virus scan failed ({scan.returncode}): {scan.stderr.strip()[:500]}")
+
+# Function to write a downscaled/recompressed display copy of an image; returns its path or None
+def optimize_image(file_path):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+
+    files = get_storage()
+    original_size = files.size(file_path)
+    extension = os.path.splitext(file_path)[1].lower()
+    with Image.open(files.local_path(file_path)) as image:
+        # Apply the camera's EXIF rotation before it is dropped by re-encoding
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+        buffer = io.BytesIO()
+        if extension == ".png":
+            image.save(buffer, "PNG", optimize=True)
+        else:
+            image.convert("RGB").save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    if buffer.tell() > original_size * (1 - MIN_SAVING):
+        return None
+    # Named after the original blob, so resources sharing the blob share the copy and GC removes both together
+    display_path = blob_store.display_path(file_path)
+    files.write(display_path, lambda target: target.write(buffer.getbuffer()))
+    return display_path
+
+# Function to delete a rejected resource and drop its blob reference
+def _remove_resource(resource_id):
+    with db.transaction() as cursor:
+        blob_store.release_for_resource(cursor, resource_id)
+        cursor.execute("DELETE FROM resources WHERE id=%s", (resource_id,))
+
+# Job handler: validate and process one uploaded resource; returns the signals to publish
+def process_upload(resource_id, payload):
+    row = db.fetch_one("resource_by_id", (resource_id,))
+    if row is None:
+        # Deleted before the job ran; nothing left to do
+        return {"signals": []}
+    category, name, file_path, _ = row
+
+    try:
+        validate(file_path)
+    except ValueError as error:
+        _remove_resource(resource_id)
+        raise JobRejected(f"{name}: {error}", [("resource_deleted", {"id": resource_id, "category": category})])
+
+    announcements = []
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in IMAGE_EXTENSIONS:
+        optimize_image(file_path)
+        import file_server
+        file_server.get_thumbnail(get_storage().local_path(file_path))
+    elif extension == ".pdf":
+        import rag_index
+        rag_index.extract_pdf_text(file_path)
+
+    announcements.append(("resource_processed", {"id": resource_id, "category": category, "file_path": file_path}))
+    return {"signals": announcements}